@@ -0,0 +1,173 @@
+import heapq
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+from django.db import connections
+
+from authenticate.models import Relation
+from common.pagination import (NEXT, CursorPage, CursorPaginator, InvalidCursor, clean_cursor_values, decode_cursor,
+                               encode_cursor)
+from .loaders import only_list_columns
+from .models import Article
+from .shards import group_by_shard, shard_for_article, shard_for_author, using_shard
+
+# フィードの1ページに表示する記事の件数
+FEED_PER_PAGE = 10
+# 2ページ目以降で投稿者の数がこれ以下の場合は投稿者ごとに取得して併合し,それ以外はデータベースで並び替える
+DEFAULT_FEED_MERGE_MAX_AUTHORS = 100
+# 1つの文にまとめる投稿者ごとのクエリの数
+DEFAULT_FEED_MERGE_CHUNK_SIZE = 100
+
+MERGE = 'merge'
+SQL = 'sql'
+
+ARTICLE_ORDERING = ('-created_at', '-id')
+
+
+def seek(queryset, values):
+    # (作成日時, 主キー)がvaluesより古い記事に絞り込む
+    if values is None:
+        return queryset
+    return queryset.filter(CursorPaginator(queryset, 1, ARTICLE_ORDERING).seek_filter(values, True))
+
+
+def author_queryset(author_id, limit, values=None):
+    # 1人の投稿者の記事を新しい順に最大limit件,(author, created_at)のインデックスの範囲走査のみで取得する
+    queryset = seek(using_shard(Article.objects.filter(author_id=author_id), shard_for_author(author_id)), values)
+    return queryset.order_by(*ARTICLE_ORDERING).values_list('author_id', 'created_at', 'id')[:limit]
+
+
+def fetch_author_streams(author_ids, limit, values=None):
+    """
+    投稿者の主キーごとに,新しい順に並んだ記事の(作成日時, 主キー)のリストの辞書を返す
+
+    投稿者ごとのLIMIT付きのクエリをUNION ALLで1つの文にまとめ,投稿者の数によらず1回の往復で取得する
+    投稿者ごとのクエリは最初の投稿者のクエリのSQLを投稿者の主キーのパラメータのみ置き換えて再利用する
+    SQLiteの複合SELECTの上限を超えない様に,FEED_MERGE_CHUNK_SIZE人ごとに文を分ける
+    記事を分散して保存している場合は,保存先ごとに文を分ける
+    """
+    streams = defaultdict(list)
+    for group in group_by_shard(author_ids, shard_for_author).values():
+        fetch_shard_streams(streams, group, limit, values)
+    return streams
+
+
+def fetch_shard_streams(streams, author_ids, limit, values=None):
+    # 同じデータベースに保存されている投稿者の記事を,streamsに追加する
+    queryset = author_queryset(author_ids[0], limit, values)
+    connection = connections[queryset.db]
+    field = Article._meta.get_field('created_at')
+    column = field.get_col(Article._meta.db_table)
+    converters = connection.ops.get_db_converters(column) + field.get_db_converters(connection)
+    chunk_size = getattr(settings, 'FEED_MERGE_CHUNK_SIZE', DEFAULT_FEED_MERGE_CHUNK_SIZE)
+
+    # WHERE句の最初のパラメータが投稿者の主キーとなる
+    sql, template_params = queryset.query.sql_with_params()
+    # LIMITを各投稿者のクエリに適用するため副問い合わせとする
+    part = 'SELECT * FROM ({}) feed'.format(sql)
+
+    for start in range(0, len(author_ids), chunk_size):
+        chunk = author_ids[start:start + chunk_size]
+        params = []
+        for author_id in chunk:
+            params += [author_id, *template_params[1:]]
+        with connection.cursor() as cursor:
+            cursor.execute(' UNION ALL '.join([part] * len(chunk)), params)
+            for author_id, created_at, pk in cursor.fetchall():
+                for converter in converters:
+                    created_at = converter(created_at, column, connection)
+                streams[author_id].append((created_at, pk))
+
+
+def merge_article_keys(author_ids, limit, values=None):
+    """
+    投稿者ごとに新しい順に取得した記事をヒープによって併合し,全体で新しい順に最大limit件を返す
+
+    各投稿者から取得するのは最大limit件であるため,データベースが読み込む行数は投稿者の記事の総数に依存しない
+    """
+    streams = fetch_author_streams(list(author_ids), limit, values)
+    return list(islice(heapq.merge(*streams.values(), reverse=True), limit))
+
+
+def sort_article_keys(author_ids, limit, values=None):
+    """
+    投稿者の記事をまとめて取得し,データベースで並び替えて新しい順に最大limit件を返す
+
+    記事を分散して保存している場合は,保存先ごとに並び替えた結果を併合する
+    """
+    results = []
+    for alias, group in group_by_shard(author_ids, shard_for_author).items():
+        queryset = seek(using_shard(Article.objects.filter(author_id__in=group), alias), values)
+        results.append(list(queryset.order_by(*ARTICLE_ORDERING).values_list('created_at', 'id')[:limit]))
+    return list(islice(heapq.merge(*results, reverse=True), limit))
+
+
+def newest_article_keys(author_ids, limit, values=None, strategy=None):
+    """
+    投稿者の記事の(作成日時, 主キー)を新しい順に最大limit件返す
+
+    strategyを指定しない場合は,benchmark_feedによる計測結果から次の様に決める
+    最初のページは作成日時のインデックスを新しい順に辿る事で早く打ち切る事が出来るため,データベースで並び替える
+    2ページ目以降はカーソルより古い全ての記事を並び替える事になるため,投稿者の数がFEED_MERGE_MAX_AUTHORS以下であれば
+    投稿者ごとに取得して併合する
+
+    Parameters
+    ----------
+    author_ids : list
+        投稿者の主キーのリスト
+    limit : int
+        返す最大の件数
+    values : list
+        カーソルに記録した(作成日時, 主キー),これより古い記事のみを返す
+    strategy : str
+        'merge' または 'sql'
+    """
+    author_ids = list(author_ids)
+    if not author_ids:
+        return []
+    if strategy is None:
+        max_authors = getattr(settings, 'FEED_MERGE_MAX_AUTHORS', DEFAULT_FEED_MERGE_MAX_AUTHORS)
+        strategy = MERGE if values is not None and len(author_ids) <= max_authors else SQL
+    if strategy == MERGE:
+        return merge_article_keys(author_ids, limit, values)
+    return sort_article_keys(author_ids, limit, values)
+
+
+def load_articles(keys):
+    # (作成日時, 主キー)の順番を保ったまま,投稿者を結合した記事を1回のクエリ(保存先ごと)で取得する
+    # 一覧には抜粋を表示するため,本文は読み込まない
+    articles = {}
+    for alias, pks in group_by_shard([pk for _, pk in keys], shard_for_article).items():
+        articles.update(only_list_columns(using_shard(Article.objects.all(), alias)).in_bulk(pks))
+    return [articles[pk] for _, pk in keys if pk in articles]
+
+
+def load_feed(user, cursor=None, per_page=FEED_PER_PAGE, strategy=None):
+    """
+    フォローしているユーザの記事を新しい順に1ページ分だけ取得する
+
+    タイムラインの行(articles.timeline)を利用せずに,フォローしているユーザごとの記事から組み立てる
+
+    Raises
+    ------
+    InvalidCursor
+        カーソルとして解釈する事が出来ない文字列が指定された場合に発生
+
+    Returns
+    -------
+    page : CursorPage
+        投稿者を結合した記事のページ
+    """
+    values = None
+    if cursor:
+        direction, values = decode_cursor(cursor)
+        if direction != NEXT:
+            raise InvalidCursor('cursor is invalid')
+        values = clean_cursor_values(Article, ARTICLE_ORDERING, values)
+
+    followee_ids = Relation.objects.filter(follower=user).values_list('followee_id', flat=True)
+    keys = newest_article_keys(followee_ids, per_page + 1, values, strategy)
+    rows = load_articles(keys[:per_page])
+    next_cursor = encode_cursor(NEXT, list(keys[per_page - 1])) if len(keys) > per_page else None
+    return CursorPage(rows, next_cursor, None)
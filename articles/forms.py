@@ -8,15 +8,13 @@ User = get_user_model()
 
 class SearchArticleForm(forms.Form):
     keyword = forms.CharField(max_length=100, required=False)
-
-    all_article_tag = Tag.objects.order_by('pk').all()
-    TAG_CHOICES = [(article_tag.pk, article_tag.tag)
-                   for article_tag in all_article_tag]
-    TAG_CHOICES.insert(0, ('all', '全てのタグ'))
-    tag = forms.ChoiceField(choices=TAG_CHOICES, required=False)
+    tag = forms.ChoiceField(required=False)
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
+        # タグの選択肢はクラスの定義時(アプリケーションの読み込み時)ではなく,フォームを作成する度に読み込む
+        self.fields['tag'].choices = [('all', '全てのタグ')] + [(article_tag.pk, article_tag.tag)
+                                                             for article_tag in Tag.objects.order_by('pk')]
         for field in self.fields.values():
             field.widget.attrs['class'] = 'form-control'
 
@@ -46,13 +44,18 @@ class FavoriteArticleForm(forms.Form):
     """
     username = forms.CharField(max_length=30, required=True)
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, user=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.user = user
         self.fields['username'].widget = forms.HiddenInput()
 
     def clean_username(self):
         username = self.cleaned_data['username']
 
+        # 送信したユーザ自身のユーザ名である場合は存在するため,データベースに問い合わせない
+        if self.user is not None and self.user.is_authenticated and username == self.user.username:
+            return username
+
         # ユーザ名に一致するユーザが存在しない場合はバリデーションエラーを発生させる
         if not User.objects.filter(username=username).exists():
             raise forms.ValidationError("user is not exist")
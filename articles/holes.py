@@ -0,0 +1,55 @@
+from django.template.loader import render_to_string
+
+from common.holes import register_hole
+from .models import Article
+from .shards import group_by_shard, shard_for_article, using_shard
+
+
+def get_favorite_state(request):
+    state = getattr(request, '_favorite_state', None)
+    if state is None:
+        state = request._favorite_state = {}
+    return state
+
+
+def resolve_favorite_state(request, article_pk, favorited):
+    """
+    他のクエリによって取得済みのお気に入りの状態を登録し,穴を埋める際にクエリを実行しない様にする
+    """
+    get_favorite_state(request)[article_pk] = favorited
+
+
+def prime_favorite_forms(request, args_list):
+    state = get_favorite_state(request)
+    article_pks = {args[0] for args in args_list} - state.keys()
+    if not article_pks:
+        return
+
+    favorited_pks = set()
+    # 記事を分散して保存している場合は,中間テーブルも記事の保存先ごとに取得する
+    for alias, pks in group_by_shard(article_pks, shard_for_article).items():
+        favorites = Article.favorite_users.through.objects.filter(user=request.user.pk, article__in=pks)
+        favorited_pks |= set(using_shard(favorites, alias).values_list('article', flat=True))
+    for article_pk in article_pks:
+        state[article_pk] = article_pk in favorited_pks
+
+
+@register_hole('favorite_form', prime=prime_favorite_forms)
+def favorite_form(request, article_pk):
+    """
+    閲覧しているユーザのお気に入りの状態に応じたお気に入りボタンを描画する
+    """
+    # articles.formsはクラスの定義時にタグを読み込むため,アプリケーションの読み込み時(ready)にはインポートしない
+    from .forms import FavoriteArticleForm
+
+    favorited = get_favorite_state(request)[article_pk]
+    context = {
+        'article_pk': article_pk,
+        'favorite_form': FavoriteArticleForm(request.GET or None,
+                                             initial=dict(username=request.user.username)),
+        # 既にお気に入り登録しているか否かでボタンに表示する値ととお気に入りフォームのvalue
+        # に設定される状態を示す文字列を決定する
+        'favorite_button_value': 'お気に入り済み' if favorited else 'お気に入りに追加',
+        'favorite_status': 'favorited' if favorited else 'notfavorited',
+    }
+    return render_to_string('articles/favorite_form.html', context, request=request)
@@ -0,0 +1,129 @@
+from django.contrib.auth import get_user_model
+from django.db.models import Exists, OuterRef, Prefetch
+from django.shortcuts import get_object_or_404
+
+from authenticate.models import Relation
+from common.pagination import CursorPaginator
+from users.follow_state import prime_follow_state
+from .models import Article, Comment
+from .shards import select_users, shard_for_article, sharding_enabled, using_shard
+
+User = get_user_model()
+
+# 記事ページに埋め込む・コメント一覧のエンドポイントから1回に返すコメントの件数
+COMMENTS_PER_PAGE = 20
+
+# 記事の一覧に表示する記事のカラム(本文の代わりに抜粋を表示する)と,投稿者のカラム(ユーザ名とアイコン)
+ARTICLE_LIST_FIELDS = ('title', 'excerpt', 'create_date', 'created_at', 'author')
+AUTHOR_LIST_FIELDS = ('username', 'icon', 'icon_renditions')
+
+
+def only_list_columns(queryset, with_author=True):
+    """
+    記事の一覧に表示するカラムのみを読み込むクエリセットを返す
+
+    本文(content)は読み込まずに,保存時に作成した抜粋(excerpt)を表示する
+    記事を分散して保存している場合は,投稿者を結合せずに別のクエリで取得する
+
+    Parameters
+    ----------
+    queryset : QuerySet
+        記事のクエリセット
+    with_author : bool
+        投稿者のユーザ名とアイコンを表示する一覧の場合はTrue
+    """
+    queryset = queryset.only(*ARTICLE_LIST_FIELDS)
+    if not with_author:
+        return queryset
+    if sharding_enabled():
+        return queryset.prefetch_related(Prefetch('author', queryset=User.objects.only(*AUTHOR_LIST_FIELDS)))
+    return queryset.select_related('author').only(*ARTICLE_LIST_FIELDS,
+                                                  *('author__' + field for field in AUTHOR_LIST_FIELDS))
+
+
+def load_comment_page(article_pk, cursor=None):
+    """
+    記事に対するコメントを投稿順に1ページ分だけ取得する
+
+    コメントの主キーをキーとしたキーセット方式でページ分割するため,
+    コメントの件数やページの深さに関わらず1回のクエリで取得する
+
+    Parameters
+    ----------
+    article_pk : int
+        記事の主キー
+    cursor : str
+        前のページのnext_cursor,Noneの場合は最初のページを取得する
+
+    Raises
+    ------
+    InvalidCursor
+        カーソルとして解釈する事が出来ない文字列が指定された場合に発生
+
+    Returns
+    -------
+    page : CursorPage
+        コメントの投稿者を結合したコメントのページ
+    """
+    queryset = select_users(using_shard(Comment.objects.filter(article_id=article_pk), shard_for_article(article_pk)),
+                            'comment_author')
+    return CursorPaginator(queryset, COMMENTS_PER_PAGE, ('id',)).page(cursor)
+
+
+def load_article_detail(pk, viewer):
+    """
+    記事ページの表示に必要なデータを決まった回数のクエリで取得する
+
+    1. 記事と投稿者,閲覧しているユーザのお気に入り・フォローの状態
+    2. 記事に付与されているタグ
+    3. 記事に対するコメントの最初のページとコメントの投稿者
+
+    記事を分散して保存している場合は,記事の保存先から読み込み,投稿者・フォローの状態は別のクエリで取得する
+
+    お気に入りの件数は記事が保持しているfavorite_countを利用する
+
+    Parameters
+    ----------
+    pk : int
+        記事の主キー
+    viewer : User
+        記事ページを閲覧しているユーザ(認証されていないユーザの場合もある)
+
+    Raises
+    ------
+    Http404
+        指定した記事が存在しない場合に発生
+
+    Returns
+    -------
+    article : Article
+        viewer_favorited・viewer_follows_author・comment_pageの属性を追加した記事
+    """
+    queryset = select_users(using_shard(Article.objects.all(), shard_for_article(pk)), 'author') \
+        .prefetch_related('tags')
+
+    if viewer.is_authenticated:
+        favorite_through = Article.favorite_users.through
+        queryset = queryset.annotate(
+            viewer_favorited=Exists(favorite_through.objects.filter(article=OuterRef('pk'), user=viewer.pk)))
+        # フォロー関係はユーザと同じデータベースにあるため,分散している場合はis_followタグから取得する
+        if not sharding_enabled():
+            queryset = queryset.annotate(viewer_follows_author=Exists(
+                Relation.objects.filter(follower=viewer.pk, followee=OuterRef('author'))))
+
+    article = get_object_or_404(queryset, pk=pk)
+    # 全てのコメントを読み込まない様に,最初のページのみを埋め込み残りはエンドポイントから取得する
+    article.comment_page = load_comment_page(article.pk)
+
+    if not viewer.is_authenticated:
+        article.viewer_favorited = False
+        article.viewer_follows_author = False
+        return article
+
+    # 投稿者に対するフォロー関係は取得済みであるため,is_followタグからクエリを実行しない様にする
+    resolver = prime_follow_state(viewer, [])
+    if hasattr(article, 'viewer_follows_author'):
+        resolver.resolve(article.author, article.viewer_follows_author)
+    else:
+        article.viewer_follows_author = resolver.is_follow(article.author)
+    return article
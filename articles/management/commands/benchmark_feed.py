@@ -0,0 +1,77 @@
+import datetime
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from articles.feed import FEED_PER_PAGE, MERGE, SQL, newest_article_keys
+from articles.models import Article
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'フォローしているユーザ数ごとに,投稿者ごとの取得とヒープによる併合とデータベースでの並び替えの処理時間を比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followees', nargs='+', type=int, default=[1, 10, 30, 100, 300, 1000],
+                            help='計測を行うフォローしているユーザ数')
+        parser.add_argument('--articles', type=int, default=200,
+                            help='1人のユーザが投稿する記事数の平均,ユーザごとの記事数は指数分布に従う')
+        parser.add_argument('--depth', type=int, default=10,
+                            help='最初のページに加えて計測を行うページの深さ')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='1つの条件につき取得を繰り返す回数')
+
+    def handle(self, *args, **options):
+        random_generator = random.Random(0)
+        per_page = FEED_PER_PAGE
+
+        # 計測のために作成したデータは全てロールバックする
+        with transaction.atomic():
+            authors = self.create_authors(max(options['followees']), options['articles'], random_generator)
+            self.stdout.write('{} authors, {} articles'.format(
+                len(authors), Article.objects.filter(author_id__in=authors).count()))
+
+            for count in sorted(options['followees']):
+                author_ids = random_generator.sample(authors, count)
+                # 深いページのカーソルは,その位置までの記事を並び替えて求める
+                keys = newest_article_keys(author_ids, per_page * options['depth'], strategy=SQL)
+                cursors = [('page 1', None)]
+                if len(keys) == per_page * options['depth']:
+                    cursors.append(('page {}'.format(options['depth'] + 1), list(keys[-1])))
+
+                for label, values in cursors:
+                    results = {}
+                    for strategy in (MERGE, SQL):
+                        started = time.perf_counter()
+                        for _ in range(options['repeat']):
+                            newest_article_keys(author_ids, per_page + 1, values, strategy=strategy)
+                        results[strategy] = (time.perf_counter() - started) / options['repeat']
+                    faster = min(results, key=results.get)
+                    self.stdout.write('{:>6} followees {:>8} merge {:9.3f}ms sql {:9.3f}ms -> {}'.format(
+                        count, label, results[MERGE] * 1000, results[SQL] * 1000, faster))
+
+            transaction.set_rollback(True)
+
+    def create_authors(self, count, articles_per_author, random_generator):
+        User.objects.bulk_create([User(username='benchmark_feed{}'.format(i),
+                                       email='benchmark_feed{}@test.com'.format(i))
+                                  for i in range(count)], batch_size=1000)
+        authors = list(User.objects.filter(username__startswith='benchmark_feed').values_list('pk', flat=True))
+
+        now = timezone.now()
+        articles = []
+        for author_id in authors:
+            for _ in range(int(random_generator.expovariate(1 / articles_per_author)) + 1):
+                articles.append(Article(author_id=author_id, title='benchmark_feed', content='benchmark_feed',
+                                        created_at=now - datetime.timedelta(
+                                            seconds=random_generator.randrange(86400 * 365))))
+            if len(articles) >= 10000:
+                Article.objects.bulk_create(articles)
+                articles = []
+        Article.objects.bulk_create(articles)
+        return authors
@@ -0,0 +1,86 @@
+import random
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from articles.models import Article
+from articles.search import ContainsSearchBackend, NgramSearchBackend, get_search_backend
+
+User = get_user_model()
+
+# ベンチマーク用の記事を作成するための日本語の語彙
+VOCABULARY = ['記事', '投稿', '検索', '日本語', 'ブログ', 'データベース', 'インデックス',
+              '転置', 'ユーザ', 'フォロー', 'お気に入り', 'コメント', 'タグ', '性能',
+              '計測', 'キャッシュ', 'ページ', '表示', '更新', '削除', 'Django', 'Python']
+
+# 一部の記事にのみ含める,検索結果の少ないキーワード
+RARE_KEYWORD = '全文検索エンジン'
+RARE_KEYWORD_INTERVAL = 1000
+
+
+class Command(BaseCommand):
+    help = '部分一致検索とN-gramの転置インデックスによる検索の処理時間を記事数ごとに比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[10000, 100000, 1000000],
+                            help='計測を行う記事数')
+        parser.add_argument('--words', type=int, default=20,
+                            help='1つの記事の本文に含める単語数')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='1つのキーワードにつき検索を繰り返す回数')
+        parser.add_argument('--keywords', nargs='+', default=[RARE_KEYWORD, '転置インデックス', 'キャッシュ'],
+                            help='検索に利用するキーワード')
+
+    def handle(self, *args, **options):
+        backends = [('contains', ContainsSearchBackend()), ('ngram', NgramSearchBackend())]
+        current_backend = get_search_backend()
+        if type(current_backend) not in (ContainsSearchBackend, NgramSearchBackend):
+            backends.append((type(current_backend).__name__, current_backend))
+
+        # 計測のために作成したデータは全てロールバックする
+        with transaction.atomic():
+            author = User.objects.create_user(username='benchmark_search_author',
+                                              email='benchmark_search_author@test.com',
+                                              password=None)
+            random_generator = random.Random(0)
+            article_count = 0
+            for size in sorted(options['sizes']):
+                self.create_articles(author, size - article_count, options['words'], random_generator)
+                article_count = size
+
+                for name, backend in backends:
+                    started = time.perf_counter()
+                    backend.rebuild(Article.objects.order_by('pk'))
+                    self.stdout.write('{:>9} articles {:>24} index build {:9.3f}s'.format(
+                        size, name, time.perf_counter() - started))
+
+                for keyword in options['keywords']:
+                    for name, backend in backends:
+                        elapsed = self.measure(backend, keyword, options['repeat'])
+                        self.stdout.write('{:>9} articles {:>24} {!r:>20} {:9.3f}ms'.format(
+                            size, name, keyword, elapsed * 1000))
+
+            transaction.set_rollback(True)
+
+    def create_articles(self, author, count, words, random_generator):
+        articles = []
+        for i in range(count):
+            content = 'の'.join(random_generator.choices(VOCABULARY, k=words))
+            if i % RARE_KEYWORD_INTERVAL == 0:
+                content += RARE_KEYWORD
+            articles.append(Article(author=author,
+                                    title=''.join(random_generator.choices(VOCABULARY, k=3)),
+                                    content=content))
+            if len(articles) >= 10000:
+                Article.objects.bulk_create(articles)
+                articles = []
+        Article.objects.bulk_create(articles)
+
+    def measure(self, backend, keyword, repeat):
+        # 1ページ分の記事を取得するまでの処理時間の平均を返す
+        started = time.perf_counter()
+        for _ in range(repeat):
+            list(backend.filter(Article.objects.all(), keyword)[:5])
+        return (time.perf_counter() - started) / repeat
@@ -0,0 +1,107 @@
+import datetime
+import random
+import statistics
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from articles.models import Article, TimelineEntry
+from articles.timeline import TIMELINE_PER_PAGE, fan_out_article, load_timeline
+from authenticate.models import Relation
+from common import counters
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = 'フォロワー数が偏ったユーザ群で,タイムラインへの書き込みと表示の処理時間をRelationとArticleの結合と比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000,
+                            help='作成するユーザ数')
+        parser.add_argument('--followees', type=int, default=50,
+                            help='1人のユーザがフォローするユーザ数の平均')
+        parser.add_argument('--exponent', type=float, default=1.1,
+                            help='フォローされる確率の偏り(Zipf分布の指数),大きいほど一部のユーザにフォロワーが集中する')
+        parser.add_argument('--articles', type=int, default=5,
+                            help='1人のユーザが投稿する記事数')
+        parser.add_argument('--fanout-limits', nargs='+', type=int, default=[100, 1000, 10 ** 9],
+                            help='書き込まずに表示時に取得するユーザのフォロワー数の下限')
+        parser.add_argument('--readers', type=int, default=200,
+                            help='表示の処理時間を計測するユーザ数')
+
+    def handle(self, *args, **options):
+        random_generator = random.Random(0)
+
+        # 計測のために作成したデータは全てロールバックする
+        with transaction.atomic():
+            users = self.create_users(options['users'])
+            self.create_relations(users, options['followees'], options['exponent'], random_generator)
+            article_pks = self.create_articles(users, options['articles'], random_generator)
+            counters.rebuild(*counters.get_models())
+
+            follower_counts = sorted(User.objects.filter(pk__in=[user.pk for user in users])
+                                     .values_list('follower_count', flat=True), reverse=True)
+            self.stdout.write('{} users, {} relations, {} articles'.format(
+                len(users), sum(follower_counts), len(article_pks)))
+            self.stdout.write('followers: max {} / p99 {} / median {}'.format(
+                follower_counts[0], follower_counts[len(follower_counts) // 100], statistics.median(follower_counts)))
+
+            readers = random_generator.sample(users, min(options['readers'], len(users)))
+            join_times = self.measure(lambda reader: list(
+                Article.objects.filter(author__follower_relations__follower=reader)
+                .select_related('author').order_by('-created_at', '-id')[:TIMELINE_PER_PAGE]), readers)
+            self.report('join', None, None, join_times)
+
+            for fanout_limit in sorted(options['fanout_limits']):
+                TimelineEntry.objects.all().delete()
+                started = time.perf_counter()
+                written = sum(fan_out_article(pk, fanout_limit=fanout_limit) for pk in article_pks)
+                write_time = time.perf_counter() - started
+
+                read_times = self.measure(lambda reader: list(load_timeline(reader, fanout_limit=fanout_limit)),
+                                          readers)
+                self.report('fan-out (limit {})'.format(fanout_limit), written, write_time, read_times)
+
+            transaction.set_rollback(True)
+
+    def create_users(self, count):
+        User.objects.bulk_create([User(username='benchmark_timeline{}'.format(i),
+                                       email='benchmark_timeline{}@test.com'.format(i))
+                                  for i in range(count)], batch_size=1000)
+        return list(User.objects.filter(username__startswith='benchmark_timeline').order_by('pk'))
+
+    def create_relations(self, users, followees, exponent, random_generator):
+        # 順位の指数乗に反比例する確率でフォローする相手を選ぶ事で,フォロワー数をべき分布に従わせる
+        weights = [1 / (rank + 1) ** exponent for rank in range(len(users))]
+        relations = []
+        for follower in users:
+            count = min(len(users) - 1, max(1, int(random_generator.expovariate(1 / followees))))
+            chosen = {followee.pk for followee in random_generator.choices(users, weights=weights, k=count)}
+            chosen.discard(follower.pk)
+            relations += [Relation(follower_id=follower.pk, followee_id=pk) for pk in chosen]
+        Relation.objects.bulk_create(relations, batch_size=10000)
+
+    def create_articles(self, users, per_user, random_generator):
+        now = timezone.now()
+        articles = [Article(author_id=user.pk, title='benchmark_timeline', content='benchmark_timeline',
+                            created_at=now - datetime.timedelta(seconds=random_generator.randrange(86400 * 30)))
+                    for user in users for _ in range(per_user)]
+        Article.objects.bulk_create(articles, batch_size=10000)
+        return list(Article.objects.filter(author_id__in=[user.pk for user in users]).values_list('pk', flat=True))
+
+    def measure(self, load, readers):
+        times = []
+        for reader in readers:
+            started = time.perf_counter()
+            load(reader)
+            times.append(time.perf_counter() - started)
+        return sorted(times)
+
+    def report(self, name, written, write_time, read_times):
+        write = '{:>9} rows {:8.2f}s'.format(written, write_time) if written is not None else ' ' * 23
+        self.stdout.write('{:>28} write {} read mean {:7.2f}ms p95 {:7.2f}ms'.format(
+            name, write, statistics.mean(read_times) * 1000, read_times[int(len(read_times) * 0.95)] * 1000))
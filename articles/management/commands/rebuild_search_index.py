@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS
+
+from articles.models import Article
+from articles.search import get_search_backend
+from articles.shards import get_shard_aliases
+
+
+class Command(BaseCommand):
+    help = '全ての記事から検索インデックスを再構築する'
+
+    def handle(self, *args, **options):
+        backend = get_search_backend()
+        # 記事を分散して保存している場合は,保存先ごとに記事と同じデータベースへ再構築する
+        for alias in get_shard_aliases() or [DEFAULT_DB_ALIAS]:
+            backend.rebuild(Article.objects.using(alias).order_by('pk'))
+        self.stdout.write(self.style.SUCCESS(
+            '{} の検索インデックスを再構築しました'.format(type(backend).__name__)))
@@ -0,0 +1,53 @@
+from django.db import DatabaseError, migrations, transaction
+
+
+def sqlite_supports_trigram(schema_editor):
+    """
+    SQLiteがFTS5とtrigramトークナイザ(3.34以降)に対応しているか否かを返す
+
+    FTS5は拡張として読み込まれる場合もあるため,バージョンではなく一時的な仮想テーブルを作成して確認する
+    """
+    try:
+        with transaction.atomic(using=schema_editor.connection.alias):
+            schema_editor.execute(
+                "CREATE VIRTUAL TABLE temp.articles_article_fts_probe USING fts5(title, tokenize = 'trigram')")
+            schema_editor.execute("DROP TABLE temp.articles_article_fts_probe")
+    except DatabaseError:
+        return False
+    return True
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    # 対応していない場合は仮想テーブルを作成せず,検索は部分一致検索を行う(articles.search.get_search_backend)
+    if vendor == 'sqlite' and sqlite_supports_trigram(schema_editor):
+        schema_editor.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS articles_article_fts "
+            "USING fts5(title, content, tokenize = 'trigram')")
+        schema_editor.execute(
+            "INSERT INTO articles_article_fts(rowid, title, content) "
+            "SELECT id, title, content FROM articles_article")
+    elif vendor == 'mysql':
+        schema_editor.execute(
+            "ALTER TABLE articles_article "
+            "ADD FULLTEXT INDEX articles_article_fulltext (title, content) WITH PARSER ngram")
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute("DROP TABLE IF EXISTS articles_article_fts")
+    elif vendor == 'mysql':
+        schema_editor.execute(
+            "ALTER TABLE articles_article DROP INDEX articles_article_fulltext")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0001_squashed_0002_alter_article_favorite_users'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
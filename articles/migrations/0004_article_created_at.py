@@ -0,0 +1,57 @@
+import datetime
+
+from django.db import migrations, models
+from django.utils import timezone
+
+# タグによる記事の絞り込みで利用する中間テーブルのインデックス
+TAGS_INDEX_NAME = 'articles_article_tags_tag_article_idx'
+
+
+def backfill_created_at(apps, schema_editor):
+    # 既存の記事は作成日の0時を作成日時とし,同じ日の記事はidによって並び替える
+    Article = apps.get_model('articles', 'Article')
+    articles = Article.objects.using(schema_editor.connection.alias)
+    for create_date in articles.values_list('create_date', flat=True).distinct():
+        created_at = timezone.make_aware(datetime.datetime.combine(create_date, datetime.time.min))
+        articles.filter(create_date=create_date).update(created_at=created_at)
+
+
+def create_tags_index(apps, schema_editor):
+    schema_editor.execute(
+        'CREATE INDEX {} ON articles_article_tags (tag_id, article_id)'.format(TAGS_INDEX_NAME))
+
+
+def drop_tags_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'mysql':
+        schema_editor.execute('DROP INDEX {} ON articles_article_tags'.format(TAGS_INDEX_NAME))
+    else:
+        schema_editor.execute('DROP INDEX {}'.format(TAGS_INDEX_NAME))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0003_articlengram'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='created_at',
+            field=models.DateTimeField(default=timezone.now),
+        ),
+        migrations.RunPython(backfill_created_at, migrations.RunPython.noop),
+        migrations.AlterModelOptions(
+            name='article',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['created_at', 'id'], name='article_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='article',
+            index=models.Index(fields=['author', 'created_at'], name='article_author_created_idx'),
+        ),
+        migrations.RunPython(create_tags_index, drop_tags_index),
+    ]
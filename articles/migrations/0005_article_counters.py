@@ -0,0 +1,51 @@
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, group_field):
+    return Coalesce(Subquery(queryset.order_by().values(group_field)
+                             .annotate(count=Count('pk')).values('count')), 0)
+
+
+def rebuild_counters(apps, schema_editor):
+    # 以降のマイグレーションで変わり得るcommon.countersには依存せず,この時点のモデルのみから件数を計算する
+    User = apps.get_model('authenticate', 'User')
+    Article = apps.get_model('articles', 'Article')
+    Comment = apps.get_model('articles', 'Comment')
+    Relation = apps.get_model('authenticate', 'Relation')
+    favorite_through = Article.favorite_users.through
+    using = schema_editor.connection.alias
+
+    User.objects.using(using).update(
+        follower_count=count_subquery(Relation.objects.filter(followee=OuterRef('pk')), 'followee'),
+        followee_count=count_subquery(Relation.objects.filter(follower=OuterRef('pk')), 'follower'),
+        article_count=count_subquery(Article.objects.filter(author=OuterRef('pk')), 'author'),
+        favorite_count=count_subquery(favorite_through.objects.filter(user=OuterRef('pk')), 'user'),
+    )
+    Article.objects.using(using).update(
+        favorite_count=count_subquery(favorite_through.objects.filter(article=OuterRef('pk')), 'article'),
+        comment_count=count_subquery(Comment.objects.filter(article=OuterRef('pk')), 'article'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0002_user_counters'),
+        ('articles', '0004_article_created_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='article',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(rebuild_counters, migrations.RunPython.noop),
+    ]
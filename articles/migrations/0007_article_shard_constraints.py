@@ -0,0 +1,40 @@
+# Generated by Django 3.2.25 on 2026-10-18 20:53
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('articles', '0006_timelineentry'),
+    ]
+
+    # 記事を分散して保存していない場合も外部キー制約を削除する,設定によって制約の有無を変えると
+    # 環境ごとにスキーマが異なり,SQLiteではテーブルを作り直す以降のマイグレーションで制約が失われるため
+    # 以降はデータベースが参照整合性を保証せず,ユーザの行を直接削除すると記事・コメント・お気に入りが残る
+    # (退会時はauthenticate.purgeが各保存先の行を先に削除し,記事の削除はDjangoのon_deleteによって関連する行を削除する)
+    operations = [
+        migrations.AlterField(
+            model_name='article',
+            name='author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='my_articles', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='article',
+            name='favorite_users',
+            field=models.ManyToManyField(blank=True, db_constraint=False, related_name='favorited_aritcles', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='comment',
+            name='comment_author',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='timelineentry',
+            name='article',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='articles.article'),
+        ),
+    ]
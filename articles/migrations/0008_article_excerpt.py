@@ -0,0 +1,27 @@
+from django.db import migrations, models
+from django.db.models.functions import Substr
+
+# 記事の一覧に表示する本文の先頭の文字数
+EXCERPT_LENGTH = 30
+
+
+def backfill_excerpt(apps, schema_editor):
+    # 既存の記事の抜粋を,記事を読み込まずに1回のUPDATEで作成する
+    Article = apps.get_model('articles', 'Article')
+    Article.objects.using(schema_editor.connection.alias).update(excerpt=Substr('content', 1, EXCERPT_LENGTH))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('articles', '0007_article_shard_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='article',
+            name='excerpt',
+            field=models.CharField(blank=True, default='', editable=False, max_length=30),
+        ),
+        migrations.RunPython(backfill_excerpt, migrations.RunPython.noop),
+    ]
@@ -1,11 +1,18 @@
 import datetime
 from django.db import models
 from django.contrib.auth import get_user_model
+from django.utils import timezone
+
+from common.counters import ARTICLE_COUNTERS, update_fields_without_counters
+from .shards import allocate_article_id, shard_for_author, sharding_enabled
 
 # Create your models here.
 
 User = get_user_model()
 
+# 記事の一覧に表示する本文の先頭の文字数
+EXCERPT_LENGTH = 30
+
 
 class Tag(models.Model):
     tag = models.CharField(max_length=100, blank=False, null=False, unique=True)
@@ -15,23 +22,58 @@ class Tag(models.Model):
 
 
 class Article(models.Model):
+    # 記事は投稿者と異なるデータベースに保存する場合がある(articles.shards)ため,外部キー制約を作成しない
+    # 分散していない場合も制約は無いため,ユーザを削除する前に所有する行を削除する(authenticate.purge)
     author = models.ForeignKey(User,
                                on_delete=models.CASCADE,
-                               related_name='my_articles')
+                               related_name='my_articles',
+                               db_constraint=False)
     title = models.CharField(max_length=1000)
     content = models.TextField(max_length=10000)
+    # 一覧で本文を読み込まない様に,保存時に本文の先頭を複製する
+    excerpt = models.CharField(max_length=EXCERPT_LENGTH, blank=True, default='', editable=False)
     create_date = models.DateField(default=datetime.date.today)
+    # 記事一覧の並び順を一意に決めるための作成日時
+    created_at = models.DateTimeField(default=timezone.now)
     tags = models.ManyToManyField(Tag, related_name='tagged_articles')
     favorite_users = models.ManyToManyField(User,
                                             blank=True,
-                                            related_name='favorited_aritcles')
+                                            related_name='favorited_aritcles',
+                                            db_constraint=False)
+    # 関連する行を数えずに表示するための件数(common.countersによって更新する)
+    favorite_count = models.PositiveIntegerField(default=0)
+    comment_count = models.PositiveIntegerField(default=0)
 
     class Meta:
-        ordering = ['-create_date']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='article_created_idx'),
+            models.Index(fields=['author', 'created_at'], name='article_author_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    def save(self, *args, **kwargs):
+        # 分散して保存する場合は投稿者から決まる保存先に保存する(Article.objects.create()はルータに記事を渡さない)
+        # 主キーから保存先を求められる様に,保存先の番号を含めた主キーを割り当てる
+        if sharding_enabled():
+            kwargs['using'] = shard_for_author(self.author_id)
+            if self.pk is None:
+                self.pk = allocate_article_id(self.author_id)
+                kwargs['force_insert'] = True
+        # 本文を読み込んでいない(deferした)場合は本文を変更していないため,抜粋を作り直さない
+        if 'content' not in self.get_deferred_fields():
+            self.excerpt = self.content[:EXCERPT_LENGTH]
+        # 本文のみを更新する場合も,作り直した抜粋を合わせて書き込む
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields'])
+            if 'content' in kwargs['update_fields']:
+                kwargs['update_fields'].add('excerpt')
+        # 件数はF式によって更新されるため,読み込んだ時点の値で上書きしない
+        kwargs['update_fields'] = update_fields_without_counters(self, ARTICLE_COUNTERS, **kwargs)
+        super().save(*args, **kwargs)
+
     def is_favorited(self, user):
         """
         Userオブジェクトである引数userが記事をお気に入りに登録しているか否かの状態を返す
@@ -62,10 +104,51 @@ class Article(models.Model):
 
 class Comment(models.Model):
     article = models.ForeignKey(Article, on_delete=models.CASCADE)
-    comment_author = models.ForeignKey(User, on_delete=models.CASCADE)
+    comment_author = models.ForeignKey(User, on_delete=models.CASCADE, db_constraint=False)
     content = models.TextField(max_length=1000)
     create_data = models.DateField(auto_now_add=True)
 
     def __str__(self):
         return 'comment by {} at {}'.format(self.comment_author,
                                             self.create_data)
+
+
+class ArticleNgram(models.Model):
+    """
+    記事のタイトル・本文から作成したN-gramの転置インデックス
+
+    gramとarticleの組によって,あるN-gramを含む記事の一覧(ポスティングリスト)を
+    インデックスから取得する事が出来る
+    """
+    gram = models.CharField(max_length=3)
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='+')
+
+    class Meta:
+        unique_together = ('gram', 'article')
+
+    def __str__(self):
+        return '{} in {}'.format(self.gram, self.article_id)
+
+
+class TimelineEntry(models.Model):
+    """
+    フォローしているユーザの記事を,投稿時にフォロワーごとに書き込んだタイムラインの行
+
+    ownerのタイムラインは(owner, created_at)のインデックスを辿るのみで取得する事が出来る
+    フォロワーの多いユーザの記事は書き込まずに,表示時に取得する(articles.timeline)
+    """
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # 記事はタイムラインと異なるデータベースに保存する場合がある(articles.shards)
+    article = models.ForeignKey(Article, on_delete=models.CASCADE, related_name='+', db_constraint=False)
+    author = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    # 記事の作成日時(Article.created_at)の複製
+    created_at = models.DateTimeField()
+
+    class Meta:
+        unique_together = ('owner', 'article')
+        indexes = [
+            models.Index(fields=['owner', 'created_at', 'article'], name='timeline_owner_created_idx'),
+        ]
+
+    def __str__(self):
+        return '{} for {}'.format(self.article_id, self.owner_id)
@@ -0,0 +1,45 @@
+import re
+import unicodedata
+
+WHITESPACE_PATTERN = re.compile(r'\s+')
+
+
+def normalize(text):
+    """
+    全角・半角や大文字・小文字の違いを吸収するために文字列を正規化する
+
+    Parameters
+    ----------
+    text : str
+        正規化する文字列
+
+    Returns
+    -------
+    normalized_text : str
+        NFKC正規化を行い,小文字に変換して連続する空白を1つにまとめた文字列
+    """
+    text = unicodedata.normalize('NFKC', text).lower()
+    return WHITESPACE_PATTERN.sub(' ', text).strip()
+
+
+def ngrams(text, n=2):
+    """
+    文字列に含まれるN-gramの集合を返す
+
+    日本語の様に単語が空白で区切られない文章でも利用出来る様に,
+    単語ではなく文字単位でN-gramを作成する
+
+    Parameters
+    ----------
+    text : str
+        N-gramを作成する文字列
+    n : int
+        1つのN-gramに含まれる文字数
+
+    Returns
+    -------
+    grams : set
+        N-gramの集合,正規化後の文字列がn文字未満の場合は空集合
+    """
+    text = normalize(text)
+    return {text[i:i + n] for i in range(len(text) - n + 1)}
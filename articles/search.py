@@ -0,0 +1,242 @@
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connection, connections
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
+from django.utils.module_loading import import_string
+
+from .models import ArticleNgram
+from .ngram import ngrams, normalize
+from .shards import get_shard_aliases, shard_for_article, using_shard
+
+# 記事検索のバックエンドを切り替えるための設定値
+# 'auto' の場合は利用しているデータベースに応じてバックエンドを選択する
+DEFAULT_SEARCH_BACKEND = 'auto'
+
+AUTO_SEARCH_BACKENDS = {
+    'sqlite': 'articles.search.SQLiteFTSSearchBackend',
+    'mysql': 'articles.search.MySQLFullTextSearchBackend',
+}
+
+FALLBACK_SEARCH_BACKEND = 'articles.search.ContainsSearchBackend'
+
+
+def article_db(article_pk):
+    # 検索インデックスは記事と同じデータベース(分散している場合は記事の保存先)に書き込む
+    return shard_for_article(article_pk) or DEFAULT_DB_ALIAS
+
+
+class ContainsSearchBackend:
+    """
+    title・contentに対する部分一致検索によって記事を検索するバックエンド
+
+    インデックスを持たないため全ての行を走査するが,どのデータベースでも動作するため
+    他のバックエンドが利用出来ない場合やキーワードが短すぎる場合のフォールバックとして利用する
+    """
+
+    def index(self, article):
+        pass
+
+    def remove(self, article_pk):
+        pass
+
+    def rebuild(self, queryset):
+        pass
+
+    def filter(self, queryset, keyword):
+        return queryset.filter(Q(title__contains=keyword)
+                               | Q(content__contains=keyword))
+
+
+class SQLiteFTSSearchBackend(ContainsSearchBackend):
+    """
+    SQLiteのFTS5仮想テーブル(trigramトークナイザ)を利用して記事を検索するバックエンド
+
+    trigramトークナイザは空白で区切られない日本語の文章にも利用出来るが,
+    3文字未満のキーワードにはマッチしないため,その場合は部分一致検索を行う
+    """
+    table_name = 'articles_article_fts'
+    min_keyword_length = 3
+
+    def index(self, article):
+        with connections[article_db(article.pk)].cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(self.table_name),
+                           [article.pk])
+            cursor.execute('INSERT INTO {}(rowid, title, content) VALUES (%s, %s, %s)'.format(self.table_name),
+                           [article.pk, article.title, article.content])
+
+    def remove(self, article_pk):
+        with connections[article_db(article_pk)].cursor() as cursor:
+            cursor.execute('DELETE FROM {} WHERE rowid = %s'.format(self.table_name),
+                           [article_pk])
+
+    def rebuild(self, queryset):
+        with connections[queryset.db].cursor() as cursor:
+            cursor.execute('DELETE FROM {}'.format(self.table_name))
+            cursor.executemany('INSERT INTO {}(rowid, title, content) VALUES (%s, %s, %s)'.format(self.table_name),
+                               queryset.values_list('pk', 'title', 'content').iterator())
+
+    def filter(self, queryset, keyword):
+        if len(keyword) < self.min_keyword_length:
+            return super().filter(queryset, keyword)
+
+        # キーワードをフレーズとして扱う事で,部分一致検索と同じ結果を返す
+        phrase = '"{}"'.format(keyword.replace('"', '""'))
+        matched_pks = RawSQL('SELECT rowid FROM {0} WHERE {0} MATCH %s'.format(self.table_name),
+                             [phrase])
+        return queryset.filter(pk__in=matched_pks)
+
+
+class MySQLFullTextSearchBackend(ContainsSearchBackend):
+    """
+    MySQLのFULLTEXTインデックス(ngramパーサ)を利用して記事を検索するバックエンド
+
+    インデックスはMySQLによって更新されるため,保存・削除時に行う処理は無い
+    ngramパーサのトークンサイズ(初期値は2)未満のキーワードは部分一致検索を行う
+    """
+    min_keyword_length = 2
+
+    def filter(self, queryset, keyword):
+        if len(keyword) < self.min_keyword_length:
+            return super().filter(queryset, keyword)
+
+        phrase = '"{}"'.format(keyword.replace('"', ''))
+        return queryset.extra(where=['MATCH(articles_article.title, articles_article.content) '
+                                     'AGAINST (%s IN BOOLEAN MODE)'],
+                              params=[phrase])
+
+
+class NgramSearchBackend(ContainsSearchBackend):
+    """
+    記事ごとのN-gram(初期値はbigram)の転置インデックスを利用して記事を検索するバックエンド
+
+    キーワードのN-gramそれぞれのポスティングリストの積集合を候補とし,
+    候補の記事に対してのみ部分一致検索を行う事で誤検出を取り除く
+    N-gramと同じくキーワード・タイトル・本文を正規化(articles.ngram.normalize)した上で部分一致を判定するため,
+    全角・半角や大文字・小文字,空白の違いを無視して検索する(N文字未満のキーワードは正規化せずに部分一致検索を行う)
+    記事の保存時には追加・削除されたN-gramのみを更新する
+    """
+    batch_size = 1000
+
+    @property
+    def n(self):
+        return getattr(settings, 'ARTICLE_SEARCH_NGRAM_SIZE', 2)
+
+    def article_grams(self, title, content):
+        return ngrams(title, self.n) | ngrams(content, self.n)
+
+    def index(self, article):
+        grams = self.article_grams(article.title, article.content)
+        article_ngrams = ArticleNgram.objects.using(article_db(article.pk))
+        indexed_grams = set(article_ngrams.filter(article=article)
+                            .values_list('gram', flat=True))
+
+        # 記事から無くなったN-gramを削除し,新しく含まれたN-gramのみを追加する
+        removed_grams = indexed_grams - grams
+        if removed_grams:
+            article_ngrams.filter(article=article, gram__in=removed_grams).delete()
+        article_ngrams.bulk_create(
+            [ArticleNgram(gram=gram, article=article) for gram in grams - indexed_grams],
+            batch_size=self.batch_size)
+
+    def remove(self, article_pk):
+        ArticleNgram.objects.using(article_db(article_pk)).filter(article_id=article_pk).delete()
+
+    def rebuild(self, queryset):
+        manager = ArticleNgram.objects.db_manager(queryset.db)
+        manager.all().delete()
+        postings = []
+        for pk, title, content in queryset.values_list('pk', 'title', 'content').iterator():
+            postings.extend(ArticleNgram(gram=gram, article_id=pk)
+                            for gram in self.article_grams(title, content))
+            if len(postings) >= self.batch_size:
+                manager.bulk_create(postings, batch_size=self.batch_size)
+                postings = []
+        manager.bulk_create(postings, batch_size=self.batch_size)
+
+    def filter(self, queryset, keyword):
+        grams = ngrams(keyword, self.n)
+        if not grams:
+            return super().filter(queryset, keyword)
+
+        # 全てのN-gramのポスティングリストに含まれる記事のみを候補とする
+        candidate_pks = (ArticleNgram.objects.filter(gram__in=grams)
+                         .values('article')
+                         .annotate(matched_grams=Count('gram'))
+                         .filter(matched_grams=len(grams))
+                         .values('article'))
+        candidates = queryset.filter(pk__in=candidate_pks)
+        # N-gramが1つの場合は正規化したキーワードがN-gramと一致するため,候補は全て一致する
+        keyword = normalize(keyword)
+        if len(keyword) == self.n:
+            return candidates
+
+        # 正規化した文字列の部分一致はデータベースで判定出来ないため,候補の記事のタイトル・本文を読み込んで判定する
+        matched_pks = []
+        for alias in get_shard_aliases() or [None]:
+            rows = using_shard(candidates, alias).values_list('pk', 'title', 'content').iterator()
+            matched_pks.extend(pk for pk, title, content in rows
+                               if keyword in normalize(title) or keyword in normalize(content))
+        return queryset.filter(pk__in=matched_pks)
+
+
+_backend_cache = {}
+# データベースごとに'auto'によって選択したバックエンド,テーブルの一覧を検索の度に取得しない様に記録する
+_auto_backend_paths = {}
+
+
+def get_auto_backend_path():
+    backend_path = AUTO_SEARCH_BACKENDS.get(connection.vendor, FALLBACK_SEARCH_BACKEND)
+    # FTS5・trigramトークナイザに対応していないSQLiteでは,マイグレーションが仮想テーブルを作成しない
+    if (backend_path == AUTO_SEARCH_BACKENDS['sqlite']
+            and SQLiteFTSSearchBackend.table_name not in connection.introspection.table_names()):
+        return FALLBACK_SEARCH_BACKEND
+    return backend_path
+
+
+def get_search_backend():
+    """
+    設定値ARTICLE_SEARCH_BACKENDに応じた検索バックエンドのインスタンスを返す
+
+    Returns
+    -------
+    backend : ContainsSearchBackend
+        'auto' の場合はデータベースの種類に応じたバックエンド,
+        対応していないデータベースやSQLiteの仮想テーブルが無い場合は部分一致検索を行うバックエンド
+    """
+    backend_path = getattr(settings, 'ARTICLE_SEARCH_BACKEND', DEFAULT_SEARCH_BACKEND)
+    if backend_path == 'auto':
+        database_name = connection.settings_dict['NAME']
+        if database_name not in _auto_backend_paths:
+            _auto_backend_paths[database_name] = get_auto_backend_path()
+        backend_path = _auto_backend_paths[database_name]
+
+    if backend_path not in _backend_cache:
+        _backend_cache[backend_path] = import_string(backend_path)()
+    return _backend_cache[backend_path]
+
+
+def search_articles(queryset, keyword=None, tag=None):
+    """
+    キーワードとタグによって記事のクエリセットを絞り込む
+
+    Parameters
+    ----------
+    queryset : QuerySet
+        絞り込み対象となる記事のクエリセット
+    keyword : str
+        タイトルまたは本文に含まれる文字列,空文字列やNoneの場合は絞り込みを行わない
+    tag : Tag
+        記事に付与されているタグ,Noneの場合は絞り込みを行わない
+
+    Returns
+    -------
+    queryset : QuerySet
+        絞り込みを行った記事のクエリセット
+    """
+    if keyword:
+        queryset = get_search_backend().filter(queryset, keyword)
+
+    if tag is not None:
+        queryset = queryset.filter(tags=tag)
+
+    return queryset
@@ -0,0 +1,231 @@
+import heapq
+import itertools
+import random
+import time
+from collections import defaultdict
+from itertools import islice
+
+from django.conf import settings
+
+# 投稿者ごとに分散して保存するモデル(記事と,記事に従属するコメント・N-gram・中間テーブル)
+SHARDED_MODELS = ('articles.article', 'articles.comment', 'articles.articlengram',
+                  'articles.article_tags', 'articles.article_favorite_users')
+# 全ての保存先に複製するモデル(記事との結合に利用する)
+REPLICATED_MODELS = ('articles.tag',)
+
+# 記事の主キーの構成 (作成時刻のミリ秒 | 連番 | 保存先の番号)
+SHARD_BITS = 10
+SEQUENCE_BITS = 12
+# 主キーの作成時刻の起点 (2021-01-01 00:00:00 UTC のミリ秒)
+ID_EPOCH = 1609459200000
+
+_sequence = itertools.count(random.randrange(1 << SEQUENCE_BITS))
+
+
+def get_shard_aliases():
+    return list(getattr(settings, 'ARTICLE_SHARDS', []))
+
+
+def sharding_enabled():
+    return bool(get_shard_aliases())
+
+
+def shard_index_for_author(author_id):
+    return author_id % len(get_shard_aliases())
+
+
+def shard_for_author(author_id):
+    """
+    投稿者の記事とコメントを保存するデータベースのエイリアスを返す
+
+    Returns
+    -------
+    alias : str
+        ARTICLE_SHARDSが設定されていない場合はNone(ルータに任せる)
+    """
+    if not sharding_enabled():
+        return None
+    return get_shard_aliases()[shard_index_for_author(author_id)]
+
+
+def shard_for_article(article_pk):
+    """
+    記事の主キーの下位ビットから,記事を保存しているデータベースのエイリアスを返す
+
+    Returns
+    -------
+    alias : str
+        ARTICLE_SHARDSが設定されていない場合はNone(ルータに任せる)
+    """
+    aliases = get_shard_aliases()
+    if not aliases:
+        return None
+    # URLから渡された任意の主キーに対しても,いずれかの保存先を返す
+    return aliases[(int(article_pk) & ((1 << SHARD_BITS) - 1)) % len(aliases)]
+
+
+def allocate_article_id(author_id):
+    """
+    保存先の番号を下位ビットに含めた記事の主キーを割り当てる
+
+    上位ビットを作成時刻とする事で,保存先ごとの連番に頼らずに全体で一意かつ概ね作成順の主キーとなる
+    """
+    millis = int(time.time() * 1000) - ID_EPOCH
+    sequence = next(_sequence) & ((1 << SEQUENCE_BITS) - 1)
+    return (millis << (SEQUENCE_BITS + SHARD_BITS)) | (sequence << SHARD_BITS) | shard_index_for_author(author_id)
+
+
+def model_label(model):
+    # データベースのキャッシュ等のモデルでないクラスのOptionsはlabel_lowerを持たない
+    return '{}.{}'.format(model._meta.app_label, model._meta.model_name)
+
+
+def shard_for_instance(instance):
+    # 記事は投稿者から,記事に従属する行は記事の主キーから保存先を求める
+    label = model_label(instance)
+    if label == 'articles.article':
+        return shard_for_author(instance.author_id) if instance.author_id is not None else None
+    if label in SHARDED_MODELS:
+        article_id = getattr(instance, 'article_id', None)
+        return shard_for_article(article_id) if article_id is not None else None
+    return None
+
+
+def using_shard(queryset, alias):
+    # 保存先が決まらない(分散していない)場合は,ルータ(レプリカへの振り分け)に任せる
+    return queryset if alias is None else queryset.using(alias)
+
+
+def group_by_shard(pks, shard_for):
+    """
+    主キーを保存先ごとに分ける
+
+    Returns
+    -------
+    groups : dict
+        {保存先のエイリアス: 主キーのリスト},分散していない場合は {None: 全ての主キー}
+    """
+    pks = list(pks)
+    if not sharding_enabled():
+        return {None: pks} if pks else {}
+    groups = defaultdict(list)
+    for pk in pks:
+        groups[shard_for(pk)].append(pk)
+    return groups
+
+
+def select_users(queryset, *fields):
+    # ユーザは保存先と異なるデータベースにあるため,分散している場合は結合せずに別のクエリで取得する
+    if sharding_enabled():
+        return queryset.prefetch_related(*fields)
+    return queryset.select_related(*fields)
+
+
+class ShardedQuerySet:
+    """
+    全ての保存先に同じクエリを発行し,並び替えキーによって併合した結果を返すクエリセットの代わり
+
+    各保存先から並び替え済みの先頭の行のみを取得してヒープによって併合するため,
+    保存先ごとに読み込む行数は要求されたページの末尾までとなる
+    ListView・Paginator・CursorPaginatorが利用する操作のみを提供し,並び替えキーは全て同じ向きとする
+
+    Parameters
+    ----------
+    querysets : list
+        保存先ごとのクエリセット
+    ordering : tuple
+        並び替えキーの組 (例: ('-created_at', '-id'))
+    """
+    ordered = True
+
+    def __init__(self, querysets, ordering):
+        if len({field.startswith('-') for field in ordering}) != 1:
+            raise ValueError('ordering must be in a single direction')
+        self.querysets = list(querysets)
+        self.ordering = tuple(ordering)
+        self.model = self.querysets[0].model
+
+    def filter(self, *args, **kwargs):
+        return ShardedQuerySet([queryset.filter(*args, **kwargs) for queryset in self.querysets], self.ordering)
+
+    def order_by(self, *ordering):
+        return ShardedQuerySet(self.querysets, ordering)
+
+    def count(self):
+        return sum(queryset.count() for queryset in self.querysets)
+
+    def exists(self):
+        return any(queryset.exists() for queryset in self.querysets)
+
+    def sort_key(self, row):
+        values = []
+        for field in self.ordering:
+            value = row
+            for attribute in field.lstrip('-').split('__'):
+                value = getattr(value, attribute)
+            values.append(value)
+        return values
+
+    def __getitem__(self, key):
+        if isinstance(key, int):
+            return self[key:key + 1][0]
+        start = key.start or 0
+        streams = [queryset.order_by(*self.ordering)[:key.stop] if key.stop is not None
+                   else queryset.order_by(*self.ordering) for queryset in self.querysets]
+        merged = heapq.merge(*streams, key=self.sort_key, reverse=self.ordering[0].startswith('-'))
+        return list(islice(merged, start, key.stop))
+
+    def __iter__(self):
+        return iter(self[0:None])
+
+    def __len__(self):
+        return self.count()
+
+
+def scatter(queryset, ordering):
+    """
+    記事のクエリセットを全ての保存先に発行するShardedQuerySetを返す
+
+    分散していない場合はクエリセットをそのまま返す
+    """
+    aliases = get_shard_aliases()
+    if not aliases:
+        return queryset
+    return ShardedQuerySet([queryset.using(alias) for alias in aliases], ordering)
+
+
+class ArticleShardRouter:
+    """
+    記事・コメント等のクエリをARTICLE_SHARDSのいずれかに振り分けるルータ
+
+    インスタンスのヒントから保存先を求められる場合(インスタンスの保存や関連マネージャ)のみ振り分け,
+    主キーや投稿者による絞り込みはarticles.shardsの関数によって呼び出し側が保存先を指定する
+    ユーザ・フォロー関係等はcommon.replicas.ReplicaRouterに任せるため,このルータより後に置く
+    """
+
+    def shard_from_hints(self, model, **hints):
+        if not sharding_enabled():
+            return None
+        instance = hints.get('instance')
+        if instance is None or model_label(model) not in SHARDED_MODELS + REPLICATED_MODELS:
+            return None
+        # 保存先から読み込んだ記事に関連する行は,同じ保存先から読み込む
+        if model_label(instance) in SHARDED_MODELS:
+            if instance._state.db in get_shard_aliases():
+                return instance._state.db
+            return shard_for_instance(instance)
+        return None
+
+    def db_for_read(self, model, **hints):
+        return self.shard_from_hints(model, **hints)
+
+    def db_for_write(self, model, **hints):
+        if model_label(model) in REPLICATED_MODELS:
+            return None
+        return self.shard_from_hints(model, **hints)
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # 記事の投稿者等はデータベースを跨いで関連付ける
+        if sharding_enabled() and {model_label(obj1), model_label(obj2)} & set(SHARDED_MODELS):
+            return True
+        return None
@@ -0,0 +1,65 @@
+from django.db import DEFAULT_DB_ALIAS
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from authenticate.models import Relation
+from .models import Article, Tag, TimelineEntry
+from .search import get_search_backend
+from .shards import get_shard_aliases, sharding_enabled
+from .tasks import fan_out
+from .timeline import backfill_timeline, remove_from_timeline
+
+
+@receiver(post_save, sender=Article)
+def index_article(sender, instance, raw=False, **kwargs):
+    # fixtureの読み込み時は検索インデックスを更新しない
+    if raw:
+        return
+    get_search_backend().index(instance)
+
+
+@receiver(post_delete, sender=Article)
+def remove_article_index(sender, instance, **kwargs):
+    get_search_backend().remove(instance.pk)
+
+
+@receiver(post_delete, sender=Article)
+def remove_timeline_entries(sender, instance, **kwargs):
+    # 分散して保存した記事の削除はタイムラインの行に連鎖しないため,タイムラインから取り除く
+    if sharding_enabled():
+        TimelineEntry.objects.filter(article_id=instance.pk).delete()
+
+
+@receiver(post_save, sender=Tag)
+def replicate_tag(sender, instance, using, raw=False, **kwargs):
+    # 記事をタグで絞り込める様に,タグを全ての保存先に複製する
+    if raw or using != DEFAULT_DB_ALIAS:
+        return
+    for alias in set(get_shard_aliases()) - {DEFAULT_DB_ALIAS}:
+        Tag.objects.using(alias).update_or_create(pk=instance.pk, defaults={'tag': instance.tag})
+
+
+@receiver(post_delete, sender=Tag)
+def remove_replicated_tag(sender, instance, using, **kwargs):
+    if using != DEFAULT_DB_ALIAS:
+        return
+    for alias in set(get_shard_aliases()) - {DEFAULT_DB_ALIAS}:
+        Tag.objects.using(alias).filter(pk=instance.pk).delete()
+
+
+@receiver(post_save, sender=Article)
+def fan_out_article(sender, instance, created, raw=False, **kwargs):
+    # フォロワーの数に比例する書き込みはリクエストの中では行わず,ジョブとして登録する
+    if created and not raw:
+        fan_out.delay(instance.pk)
+
+
+@receiver(post_save, sender=Relation)
+def backfill_followee_articles(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        backfill_timeline(instance.follower_id, instance.followee_id)
+
+
+@receiver(post_delete, sender=Relation)
+def remove_followee_articles(sender, instance, **kwargs):
+    remove_from_timeline(instance.follower_id, instance.followee_id)
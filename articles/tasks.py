@@ -0,0 +1,9 @@
+from jobs.queue import task
+
+from .timeline import fan_out_article
+
+
+@task(name='articles.fan_out_article')
+def fan_out(article_pk):
+    # 投稿された記事をフォロワーのタイムラインに書き込む
+    fan_out_article(article_pk)
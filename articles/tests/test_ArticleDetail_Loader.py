@@ -0,0 +1,79 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from authenticate.models import Relation
+from common.page_cache import get_page_cache
+from ..loaders import load_article_detail
+from ..models import Article, Comment, Tag
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False)
+class ArticleDetailLoaderTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='detail_loader_author',
+                                          email='detail_loader_author@test.com',
+                                          password='deta1l0123')
+        reader = User.objects.create_user(username='detail_loader_reader',
+                                          email='detail_loader_reader@test.com',
+                                          password='deta1l0123')
+        article = Article.objects.create(author=author,
+                                         title='detail_loader_title',
+                                         content='detail_loader_content')
+        for i in range(3):
+            article.tags.add(Tag.objects.create(tag='detail_loader_tag{}'.format(i)))
+        for i in range(10):
+            commenter = User.objects.create_user(username='detail_loader_commenter{}'.format(i),
+                                                 email='detail_loader_commenter{}@test.com'.format(i),
+                                                 password='deta1l0123')
+            Comment.objects.create(article=article, comment_author=commenter,
+                                   content='detail_loader_comment{}'.format(i))
+        article.favorite_users.add(reader)
+        Relation.objects.create(follower=reader, followee=author)
+
+    # 記事・タグ・コメントの最初のページとお気に入り・フォローの状態を3回のクエリで取得する
+    def test_success_load_in_three_queries(self):
+        reader = User.objects.get(username='detail_loader_reader')
+        article_pk = Article.objects.get(title='detail_loader_title').pk
+
+        with self.assertNumQueries(3):
+            article = load_article_detail(article_pk, reader)
+            self.assertEqual(article.author.username, 'detail_loader_author')
+            self.assertEqual(len(article.tags.all()), 3)
+            self.assertEqual([comment.comment_author.username for comment in article.comment_page],
+                             ['detail_loader_commenter{}'.format(i) for i in range(10)])
+            self.assertTrue(article.viewer_favorited)
+            self.assertTrue(article.viewer_follows_author)
+
+    # 認証されていないユーザの場合はお気に入り・フォローの状態は常にFalseとなる
+    def test_success_load_anonymous(self):
+        article_pk = Article.objects.get(title='detail_loader_title').pk
+        article = load_article_detail(article_pk, AnonymousUser())
+        self.assertFalse(article.viewer_favorited)
+        self.assertFalse(article.viewer_follows_author)
+
+    # 記事ページの表示に必要なクエリ数はコメント数に依存しない
+    def test_success_article_view_query_budget(self):
+        get_page_cache().clear()
+        article_pk = Article.objects.get(title='detail_loader_title').pk
+        url = reverse('articles:article', kwargs={'pk': article_pk})
+
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+
+        # 認証ユーザの場合はセッションとユーザ,お気に入りの状態の取得が加わる
+        self.client.force_login(User.objects.get(username='detail_loader_reader'))
+        with self.assertNumQueries(6):
+            response = self.client.get(url)
+        self.assertContains(response, 'message-status="favorited"')
+
+        # キャッシュしたシェルを利用する場合は記事・タグ・コメントを取得しない
+        with self.assertNumQueries(3):
+            response = self.client.get(url)
+        self.assertContains(response, 'message-status="favorited"')
@@ -0,0 +1,65 @@
+from unittest import skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase
+
+from ..models import Article, Tag
+
+User = get_user_model()
+
+
+class ArticleIndexQueryPlanTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='query_plan_tester',
+                                          email='query_plan_tester@test.com',
+                                          password='qu3ryplan')
+        tag = Tag.objects.create(tag='query_plan_tag')
+        for i in range(10):
+            article = Article.objects.create(author=author,
+                                             title='query_plan_title{}'.format(i),
+                                             content='query_plan_content{}'.format(i))
+            article.tags.add(tag)
+
+    # 記事一覧は作成日時のインデックスを利用し,並び替えのための一時的なB-Treeを作成しない
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_sqlite_article_list_uses_index(self):
+        plan = Article.objects.all()[:5].explain()
+        self.assertIn('article_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    # 投稿者ごとの記事一覧は投稿者と作成日時のインデックスを利用する
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_sqlite_author_article_list_uses_index(self):
+        author = User.objects.get(username='query_plan_tester')
+        plan = Article.objects.filter(author=author)[:5].explain()
+        self.assertIn('article_author_created_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+
+    # タグによる絞り込みは中間テーブルのタグと記事のインデックスを利用する
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    def test_sqlite_tag_article_list_uses_index(self):
+        tag = Tag.objects.get(tag='query_plan_tag')
+        plan = Article.objects.filter(tags=tag)[:5].explain()
+        self.assertIn('articles_article_tags_tag_article_idx', plan)
+
+    @skipUnless(connection.vendor == 'mysql', 'MySQL only')
+    def test_mysql_article_list_uses_index(self):
+        plan = Article.objects.all()[:5].explain()
+        self.assertIn('article_created_idx', plan)
+        self.assertNotIn('Using filesort', plan)
+
+    @skipUnless(connection.vendor == 'mysql', 'MySQL only')
+    def test_mysql_author_article_list_uses_index(self):
+        author = User.objects.get(username='query_plan_tester')
+        plan = Article.objects.filter(author=author)[:5].explain()
+        self.assertIn('article_author_created_idx', plan)
+        self.assertNotIn('Using filesort', plan)
+
+    @skipUnless(connection.vendor == 'mysql', 'MySQL only')
+    def test_mysql_tag_article_list_uses_index(self):
+        tag = Tag.objects.get(tag='query_plan_tag')
+        plan = Article.objects.filter(tags=tag)[:5].explain()
+        self.assertIn('articles_article_tags_tag_article_idx', plan)
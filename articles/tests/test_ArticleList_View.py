@@ -1,8 +1,11 @@
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from urllib.parse import urlencode
 
+from common.pagination import encode_cursor
 from ..models import Tag, Article
 
 User = get_user_model()
@@ -86,3 +89,57 @@ class ArticleListViewTest(TestCase):
                                             '?',
                                             urlencode(dict(keyword='not_exist_keyword'))]))
         self.assertEqual(response.status_code, 404)
+
+    # cursorを指定した場合は次のページへのカーソルを辿って記事一覧を取得する事が出来る
+    def test_success_cursor_pagination(self):
+        response = self.client.get(''.join([reverse('articles:articles'),
+                                            '?',
+                                            urlencode(dict(cursor=''))]))
+        self.assertEqual(response.status_code, 200)
+        page = response.context['page_obj']
+        self.assertTrue(page.has_next())
+
+        response2 = self.client.get(''.join([reverse('articles:articles'),
+                                             '?',
+                                             urlencode(dict(cursor=page.next_cursor))]))
+        self.assertEqual(response2.status_code, 200)
+        self.assertTrue(set(response.context['article_list']).isdisjoint(response2.context['article_list']))
+
+    # 不正なカーソルを指定した場合は404が返ってくる
+    def test_fail_invalid_cursor(self):
+        response = self.client.get(''.join([reverse('articles:articles'),
+                                            '?',
+                                            urlencode(dict(cursor='invalid'))]))
+        self.assertEqual(response.status_code, 404)
+
+        # 値の数は正しいが,並び替えキーの型に変換する事が出来ないカーソル
+        for values in ([1, 2], ['x', 'y']):
+            response = self.client.get(reverse('articles:articles'), {'cursor': encode_cursor('n', [values, 1])})
+            self.assertEqual(response.status_code, 404)
+            response = self.client.get(reverse('articles:articles'), {'cursor': encode_cursor('n', values)})
+            self.assertEqual(response.status_code, 404)
+
+        # データベースの整数の範囲を超える主キーを含むカーソル
+        response = self.client.get(reverse('articles:articles'),
+                                   {'cursor': encode_cursor('n', ['2021-01-01T00:00:00+00:00', 2 ** 70])})
+        self.assertEqual(response.status_code, 404)
+
+    # 記事一覧は本文を読み込まずに抜粋を表示し,投稿者のユーザ名とアイコンを同じクエリで取得する
+    @override_settings(PAGE_CACHE_ENABLED=False)
+    def test_success_list_without_content(self):
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(reverse('articles:articles'))
+        self.assertContains(response, 'test_content5')
+
+        article_queries = [query['sql'] for query in context.captured_queries
+                           if 'FROM "articles_article"' in query['sql']]
+        self.assertTrue(article_queries)
+        for sql in article_queries:
+            self.assertNotIn('"articles_article"."content"', sql)
+        # 記事・投稿者ごとのクエリを実行しない
+        self.assertFalse([query for query in context.captured_queries
+                          if query['sql'].startswith('SELECT') and 'FROM "authenticate_user"' in query['sql']
+                          and 'articles_article' not in query['sql']])
+        for article in response.context['article_list']:
+            self.assertEqual(article.get_deferred_fields() & {'content', 'excerpt', 'title'}, {'content'})
+            self.assertFalse(article.author.get_deferred_fields() & {'username', 'icon', 'icon_renditions'})
@@ -0,0 +1,75 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+
+from ..models import Article, ArticleNgram
+from ..ngram import ngrams
+from ..search import search_articles
+
+User = get_user_model()
+
+
+@override_settings(ARTICLE_SEARCH_BACKEND='articles.search.NgramSearchBackend',
+                   ARTICLE_SEARCH_NGRAM_SIZE=2)
+class ArticleNgramBackendTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='ngram_backend_tester',
+                                          email='ngram_backend_tester@test.com',
+                                          password='ngr4mtest')
+        Article.objects.create(author=author,
+                               title='東京の天気',
+                               content='今日の東京は晴れです')
+        Article.objects.create(author=author,
+                               title='京都の観光',
+                               content='東の空が晴れています')
+
+    def search_titles(self, keyword):
+        return set(search_articles(Article.objects.all(), keyword=keyword)
+                   .values_list('title', flat=True))
+
+    # 文字列を正規化した上でN-gramの集合を作成する
+    def test_ngrams(self):
+        self.assertEqual(ngrams('東京タワー'), {'東京', '京タ', 'タワ', 'ワー'})
+        self.assertEqual(ngrams('ＡＢc', 3), {'abc'})
+        self.assertEqual(ngrams('あ'), set())
+
+    # 記事の保存時にタイトル・本文のN-gramがインデックスに登録される
+    def test_success_index_on_save(self):
+        article = Article.objects.get(title='東京の天気')
+        indexed_grams = set(ArticleNgram.objects.filter(article=article)
+                            .values_list('gram', flat=True))
+        self.assertEqual(indexed_grams, ngrams(article.title) | ngrams(article.content))
+
+    # ポスティングリストの積集合から部分一致する記事のみを返す
+    def test_success_search(self):
+        self.assertEqual(self.search_titles('東京'), {'東京の天気'})
+        self.assertEqual(self.search_titles('晴れ'), {'東京の天気', '京都の観光'})
+        # 「東の」「の空」は両方の記事に含まれるが,「東の空」を含むのは一方のみ
+        self.assertEqual(self.search_titles('東の空'), {'京都の観光'})
+        self.assertEqual(self.search_titles('大阪'), set())
+        self.assertEqual(self.search_titles('京'), {'東京の天気', '京都の観光'})
+
+    # キーワード・タイトル・本文を同じく正規化して比較するため,全角・半角,大文字・小文字,空白の違いを無視する
+    def test_success_search_normalized(self):
+        author = User.objects.get(username='ngram_backend_tester')
+        Article.objects.create(author=author, title='Ｄｊａｎｇｏ  Tips', content='ＰｙｔｈｏｎのWeb   Framework')
+        self.assertEqual(self.search_titles('django tips'), {'Ｄｊａｎｇｏ  Tips'})
+        self.assertEqual(self.search_titles('ＷＥＢ framework'), {'Ｄｊａｎｇｏ  Tips'})
+        self.assertEqual(self.search_titles('py'), {'Ｄｊａｎｇｏ  Tips'})
+        self.assertEqual(self.search_titles('web tips'), set())
+
+    # 記事の更新時には差分のN-gramのみが更新され,削除時にはインデックスから取り除かれる
+    def test_success_incremental_update(self):
+        article = Article.objects.get(title='京都の観光')
+        article.content = '大阪は雨です'
+        article.save()
+
+        indexed_grams = set(ArticleNgram.objects.filter(article=article)
+                            .values_list('gram', flat=True))
+        self.assertEqual(indexed_grams, ngrams(article.title) | ngrams(article.content))
+        self.assertEqual(self.search_titles('大阪'), {'京都の観光'})
+        self.assertEqual(self.search_titles('晴れ'), {'東京の天気'})
+
+        article.delete()
+        self.assertFalse(ArticleNgram.objects.filter(article_id=article.pk).exists())
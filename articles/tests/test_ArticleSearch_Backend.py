@@ -0,0 +1,78 @@
+from unittest import mock, skipUnless
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+
+from ..models import Article, Tag
+from ..search import ContainsSearchBackend, SQLiteFTSSearchBackend, get_search_backend, search_articles
+
+User = get_user_model()
+
+
+class ArticleSearchBackendTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='search_backend_tester',
+                                          email='search_backend_tester@test.com',
+                                          password='s3archtest')
+        Article.objects.create(author=author,
+                               title='日本語の記事タイトル',
+                               content='全文検索のテストを行う本文')
+        Article.objects.create(author=author,
+                               title='english title',
+                               content='Full Text Search content')
+
+    def search_titles(self, keyword, tag=None):
+        return set(search_articles(Article.objects.all(), keyword=keyword, tag=tag)
+                   .values_list('title', flat=True))
+
+    # タイトル・本文に含まれる文字列によって記事を検索する事が出来る
+    def test_success_search(self):
+        self.assertEqual(self.search_titles('記事タイトル'), {'日本語の記事タイトル'})
+        self.assertEqual(self.search_titles('全文検索'), {'日本語の記事タイトル'})
+        self.assertEqual(self.search_titles('text search'), {'english title'})
+        self.assertEqual(self.search_titles('存在しない'), set())
+
+    # インデックスの最小文字数より短いキーワードでも検索する事が出来る
+    def test_success_search_short_keyword(self):
+        self.assertEqual(self.search_titles('記'), {'日本語の記事タイトル'})
+        self.assertEqual(self.search_titles('en'), {'english title'})
+
+    # 記事の更新・削除が検索結果に反映される
+    def test_success_sync_on_save_and_delete(self):
+        article = Article.objects.get(title='english title')
+        article.content = '更新された本文'
+        article.save()
+        self.assertEqual(self.search_titles('Full Text'), set())
+        self.assertEqual(self.search_titles('更新された'), {'english title'})
+
+        article.delete()
+        self.assertEqual(self.search_titles('更新された'), set())
+
+    # タグとキーワードを組み合わせて検索する事が出来る
+    def test_success_search_with_tag(self):
+        tag = Tag.objects.create(tag='search_backend_tag')
+        Article.objects.get(title='english title').tags.add(tag)
+
+        self.assertEqual(self.search_titles('title', tag=tag), {'english title'})
+        self.assertEqual(self.search_titles('記事タイトル', tag=tag), set())
+
+    # 設定値によって部分一致検索を行うバックエンドを選択する事が出来る
+    @override_settings(ARTICLE_SEARCH_BACKEND='articles.search.ContainsSearchBackend')
+    def test_success_select_fallback_backend(self):
+        self.assertIsInstance(get_search_backend(), ContainsSearchBackend)
+        self.assertEqual(self.search_titles('全文検索'), {'日本語の記事タイトル'})
+
+    # FTS5・trigramに対応していないSQLiteでは仮想テーブルが作成されず,'auto'は部分一致検索を行うバックエンドを選択する
+    @skipUnless(connection.vendor == 'sqlite', 'SQLite only')
+    @override_settings(ARTICLE_SEARCH_BACKEND='auto')
+    def test_success_auto_without_fts_table(self):
+        self.assertIsInstance(get_search_backend(), SQLiteFTSSearchBackend)
+
+        with mock.patch('articles.search._auto_backend_paths', {}), \
+                mock.patch.object(connection.introspection, 'table_names', return_value=['articles_article']):
+            backend = get_search_backend()
+            self.assertIs(type(backend), ContainsSearchBackend)
+            self.assertEqual(self.search_titles('全文検索'), {'日本語の記事タイトル'})
@@ -0,0 +1,197 @@
+import datetime
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from authenticate.purge import run_purge, start_purge
+from common import counters
+from common.tests.databases import ExtraSQLiteDatabasesMixin
+from ..models import Article, ArticleNgram, Comment, Tag
+from ..shards import ShardedQuerySet, shard_for_article, shard_for_author
+
+User = get_user_model()
+
+SHARDS = ['shard_test1', 'shard_test2']
+
+
+@override_settings(AXES_ENABLED=False, ARTICLE_SHARDS=SHARDS)
+class ArticleShardRouterTest(ExtraSQLiteDatabasesMixin, TestCase):
+    extra_databases = SHARDS
+
+    @classmethod
+    def setUpTestData(cls):
+        # 連続した主キーのユーザは異なる保存先に記事を保存する
+        cls.authors = [User.objects.create_user(username='shard_author{}'.format(i),
+                                                email='shard_author{}@test.com'.format(i), password='sh4rd1234')
+                       for i in range(2)]
+        cls.reader = User.objects.create_user(username='shard_reader', email='shard_reader@test.com',
+                                              password='sh4rd1234')
+
+    def setUp(self):
+        super().setUp()
+        self.tag = Tag.objects.create(tag='shard_tag')
+
+    def create_articles(self, count):
+        now = timezone.now()
+        return [Article.objects.create(author=self.authors[i % 2], title='shard_title{}'.format(i), content='shard',
+                                       created_at=now - datetime.timedelta(minutes=i))
+                for i in range(count)]
+
+    def stored_on(self, model, **filters):
+        return [alias for alias in ['default', *SHARDS] if model.objects.using(alias).filter(**filters).exists()]
+
+    # 記事は投稿者から決まる保存先にのみ保存され,主キーから保存先を求める事が出来る
+    def test_success_create_on_author_shard(self):
+        self.assertNotEqual(shard_for_author(self.authors[0].pk), shard_for_author(self.authors[1].pk))
+        self.assertEqual(self.stored_on(Tag, pk=self.tag.pk), ['default', *SHARDS])
+
+        for author in self.authors:
+            self.client.force_login(author)
+            self.client.post(reverse('settings:newarticle'),
+                             {'title': 'shard_new_' + author.username, 'content': 'shard', 'tags': [self.tag.pk]})
+            shard = shard_for_author(author.pk)
+            article = Article.objects.using(shard).get(title='shard_new_' + author.username)
+            self.assertEqual(shard_for_article(article.pk), shard)
+            self.assertEqual(self.stored_on(Article, pk=article.pk), [shard])
+            self.assertEqual(self.stored_on(Article.tags.through, article_id=article.pk), [shard])
+        self.assertEqual(User.objects.get(pk=self.authors[0].pk).article_count, 1)
+
+    # 記事一覧は全ての保存先の記事を新しい順に併合し,ページ番号・カーソルのいずれでもページ分割する
+    def test_success_list_merges_shards(self):
+        articles = self.create_articles(7)
+        expected = [article.title for article in articles]
+
+        response = self.client.get(reverse('articles:articles'))
+        self.assertIsInstance(response.context['paginator'].object_list, ShardedQuerySet)
+        self.assertEqual([article.title for article in response.context['article_list']], expected[:5])
+        self.assertEqual(response.context['paginator'].count, 7)
+        response = self.client.get(reverse('articles:articles'), {'page': 2})
+        self.assertEqual([article.title for article in response.context['article_list']], expected[5:])
+
+        response = self.client.get(reverse('articles:articles'), {'cursor': ''})
+        next_cursor = response.context['page_obj'].next_cursor
+        response = self.client.get(reverse('articles:articles'), {'cursor': next_cursor})
+        self.assertEqual([article.title for article in response.context['article_list']], expected[5:])
+
+        # タグによる絞り込みは各保存先に複製したタグと結合する
+        articles[1].tags.add(self.tag)
+        response = self.client.get(reverse('articles:articles'), {'tag': self.tag.pk})
+        self.assertEqual([article.title for article in response.context['article_list']], [articles[1].title])
+
+    # 投稿者の記事一覧は投稿者の保存先のみから読み込む
+    def test_success_author_list_reads_one_shard(self):
+        self.create_articles(4)
+        author = self.authors[0]
+        shard = shard_for_author(author.pk)
+
+        response = self.capture_queries(self.client.get, reverse('users:articles',
+                                                                 kwargs={'username': author.username}))
+        self.assertEqual(len(response.context['article_list']), 2)
+        self.assertGreater(self.count_queries(shard, 'articles_article'), 0)
+        for alias in set(self.captured) - {shard}:
+            self.assertEqual(self.count_queries(alias, 'articles_article'), 0)
+
+    # 記事ページ・コメント・お気に入りは記事の保存先の行を読み書きする
+    def test_success_comment_and_favorite(self):
+        article = self.create_articles(1)[0]
+        shard = shard_for_article(article.pk)
+        self.client.force_login(self.reader)
+
+        self.client.post(reverse('articles:comments', kwargs={'pk': article.pk}), {'content': 'shard_comment'})
+        self.assertEqual(self.stored_on(Comment, article_id=article.pk), [shard])
+        response = self.client.post(reverse('articles:favorite', kwargs={'pk': article.pk}),
+                                    {'username': self.reader.username}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.json()['data']['status'], 'favorited')
+        self.assertEqual(self.stored_on(Article.favorite_users.through, article_id=article.pk), [shard])
+
+        stored = Article.objects.using(shard).get(pk=article.pk)
+        self.assertEqual((stored.comment_count, stored.favorite_count), (1, 1))
+        self.assertEqual(User.objects.get(pk=self.reader.pk).favorite_count, 1)
+
+        response = self.client.get(reverse('articles:article', kwargs={'pk': article.pk}))
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'お気に入り済み')
+        self.assertEqual([comment.content for comment in response.context['article'].comment_page],
+                         ['shard_comment'])
+
+        response = self.client.get(reverse('users:favorites', kwargs={'username': self.reader.username}))
+        self.assertEqual([favorite.pk for favorite in response.context['article_list']], [article.pk])
+
+        # 一括での追加・削除も各記事の保存先の中間テーブルを書き換える
+        other = self.create_articles(2)[1]
+        response = self.client.post(reverse('articles:bulk_favorite'),
+                                    json.dumps({'favorite': [other.pk], 'unfavorite': [article.pk]}),
+                                    content_type='application/json')
+        self.assertEqual([result['status'] for result in response.json()['data']['results']],
+                         ['favorited', 'notfavorited'])
+        self.assertEqual(self.stored_on(Article.favorite_users.through, user_id=self.reader.pk),
+                         [shard_for_article(other.pk)])
+        self.assertEqual(User.objects.get(pk=self.reader.pk).favorite_count, 1)
+
+    # 作者は記事の保存先の記事を削除し,お気に入りに追加していたユーザの件数も減らす
+    def test_success_delete_article(self):
+        article = self.create_articles(1)[0]
+        article.favorite_users.add(self.reader)
+        User.objects.filter(pk=self.reader.pk).update(favorite_count=1)
+
+        self.client.force_login(self.reader)
+        response = self.client.post(reverse('settings:deletearticle', kwargs={'pk': article.pk}))
+        self.assertEqual(response.status_code, 403)
+
+        self.client.force_login(self.authors[0])
+        self.client.post(reverse('settings:deletearticle', kwargs={'pk': article.pk}))
+        self.assertEqual(self.stored_on(Article, pk=article.pk), [])
+        self.assertEqual(self.stored_on(Article.favorite_users.through, article_id=article.pk), [])
+        self.assertEqual(User.objects.get(pk=self.reader.pk).favorite_count, 0)
+
+        # 存在しない主キーもいずれかの保存先から探し,見つからない場合は404を返す
+        response = self.client.get(reverse('articles:article', kwargs={'pk': article.pk}))
+        self.assertEqual(response.status_code, 404)
+
+    # 退会したユーザの記事・コメント・お気に入りは,他の投稿者の保存先にある行も含めて削除し件数を減らす
+    @override_settings(USER_PURGE_BATCH_SIZE=1)
+    def test_success_purge_user(self):
+        leaver = self.authors[0]
+        own, other = self.create_articles(2)
+        other_shard = shard_for_article(other.pk)
+        own.comment_set.create(comment_author=self.reader, content='shard_comment')
+        other.comment_set.create(comment_author=leaver, content='shard_comment')
+        own.favorite_users.add(self.reader)
+        other.favorite_users.add(leaver)
+        Article.objects.using(other_shard).filter(pk=other.pk).update(comment_count=1, favorite_count=1)
+        User.objects.filter(pk=self.reader.pk).update(favorite_count=1)
+
+        start_purge(leaver)
+        self.assertTrue(run_purge(leaver.pk))
+        through = Article.favorite_users.through
+        for model, filters in [(Article, {'author_id': leaver.pk}), (ArticleNgram, {'article_id': own.pk}),
+                               (Comment, {'comment_author_id': leaver.pk}), (Comment, {'article_id': own.pk}),
+                               (through, {'user_id': leaver.pk}), (through, {'article_id': own.pk})]:
+            self.assertEqual(self.stored_on(model, **filters), [])
+        stored = Article.objects.using(other_shard).get(pk=other.pk)
+        self.assertEqual((stored.comment_count, stored.favorite_count), (0, 0))
+        self.assertEqual(User.objects.get(pk=self.reader.pk).favorite_count, 0)
+        self.assertFalse(User.objects.filter(pk=leaver.pk).exists())
+
+    # 件数の再計算・検証は,全ての保存先の記事・お気に入りを数えてユーザの件数とする
+    def test_success_rebuild_counters(self):
+        articles = self.create_articles(3)
+        for article in articles:
+            article.favorite_users.add(self.reader)
+        articles[1].comment_set.create(comment_author=self.reader, content='shard_comment')
+        User.objects.update(article_count=5, favorite_count=5)
+
+        mismatches = counters.verify(*counters.get_models())
+        self.assertEqual((mismatches['authenticate.User.article_count'],
+                          mismatches['authenticate.User.favorite_count']), (3, 3))
+        self.assertEqual(mismatches['articles.Article.favorite_count'], 3)
+
+        counters.rebuild(*counters.get_models())
+        self.assertFalse(any(counters.verify(*counters.get_models()).values()))
+        self.assertEqual([User.objects.get(pk=author.pk).article_count for author in self.authors], [2, 1])
+        self.assertEqual(User.objects.get(pk=self.reader.pk).favorite_count, 3)
+        stored = Article.objects.using(shard_for_article(articles[1].pk)).get(pk=articles[1].pk)
+        self.assertEqual((stored.favorite_count, stored.comment_count), (1, 1))
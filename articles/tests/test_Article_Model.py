@@ -2,7 +2,7 @@ from django.contrib.auth import get_user_model
 from django.core.exceptions import ObjectDoesNotExist
 from django.test import TestCase
 
-from ..models import Tag, Article
+from ..models import EXCERPT_LENGTH, Tag, Article
 
 User = get_user_model()
 
@@ -82,3 +82,25 @@ class ArticleTest(TestCase):
         # favorite_usersから削除した場合はFalseが返される
         article.favorite_users.remove(user)
         self.assertFalse(article.is_favorited(user))
+
+    # 保存時に本文の先頭を抜粋として保存し,本文を読み込まずに保存した場合は抜粋を変更しない
+    def test_success_excerpt(self):
+        article = self.create_article()
+        article.content = 'あ' * 40
+        article.save()
+        self.assertEqual(Article.objects.get(pk=article.pk).excerpt, 'あ' * EXCERPT_LENGTH)
+
+        article.content = '短い本文'
+        article.save()
+        self.assertEqual(Article.objects.get(pk=article.pk).excerpt, '短い本文')
+
+        deferred = Article.objects.defer('content').get(pk=article.pk)
+        deferred.title = 'deferred'
+        deferred.save()
+        stored = Article.objects.get(pk=article.pk)
+        self.assertEqual((stored.title, stored.content, stored.excerpt), ('deferred', '短い本文', '短い本文'))
+
+        # 本文のみを更新する場合も抜粋を書き込む
+        stored.content = '本文のみ'
+        stored.save(update_fields=['content'])
+        self.assertEqual(Article.objects.get(pk=article.pk).excerpt, '本文のみ')
@@ -0,0 +1,59 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from ..models import Article
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False)
+class BulkFavoriteViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='bulk_fav_user', email='bulk_fav_user@test.com',
+                                            password='bu1kfav0')
+        author = User.objects.create_user(username='bulk_fav_author', email='bulk_fav_author@test.com',
+                                          password='bu1kfav0')
+        cls.articles = [Article.objects.create(author=author, title='bulk_fav_title{}'.format(i), content='bulk_fav')
+                        for i in range(3)]
+
+    def setUp(self):
+        self.client.force_login(self.user)
+
+    def post_bulk(self, payload):
+        return self.client.post(reverse('articles:bulk_favorite'), json.dumps(payload),
+                                content_type='application/json')
+
+    # 複数の記事をまとめてお気に入りに追加・削除し,記事ごとの結果と件数を返す
+    def test_success_bulk_favorite(self):
+        pks = [article.pk for article in self.articles]
+        response = self.post_bulk({'favorite': pks[:2] + [0]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['data']['results'],
+                         [{'item': pks[0], 'status': 'favorited'}, {'item': pks[1], 'status': 'favorited'},
+                          {'item': 0, 'status': 'notfound'}])
+        self.assertEqual(set(self.user.favorited_aritcles.values_list('pk', flat=True)), set(pks[:2]))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.favorite_count, 2)
+
+        response = self.post_bulk({'favorite': pks[1:], 'unfavorite': pks[:1]})
+        self.assertEqual([result['status'] for result in response.json()['data']['results']],
+                         ['favorited', 'favorited', 'notfavorited'])
+        self.assertEqual(set(self.user.favorited_aritcles.values_list('pk', flat=True)), set(pks[1:]))
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.favorite_count, 2)
+        self.assertEqual([Article.objects.get(pk=pk).favorite_count for pk in pks], [0, 1, 1])
+
+        # お気に入りの一覧のキャッシュが無効化される
+        response = self.client.get(reverse('users:favorites', kwargs={'username': self.user.username}))
+        self.assertEqual(len(response.context['article_list']), 2)
+
+    # 記事の主キー以外を指定した場合は400を返す
+    def test_fail_invalid_request(self):
+        for payload in ({'favorite': ['1']}, {'favorite': [True]}, {'like': [1]}, {'favorite': [2 ** 70]},
+                        {'unfavorite': [-2 ** 70]}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post_bulk(payload).status_code, 400)
@@ -0,0 +1,86 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+from django.urls import reverse
+
+from common.pagination import encode_cursor
+from ..loaders import COMMENTS_PER_PAGE
+from ..models import Article, Comment
+
+User = get_user_model()
+
+
+class CommentListViewTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='comment_list_tester',
+                                          email='comment_list_test@test.com',
+                                          password='c0mment1ist')
+        article = Article.objects.create(author=author,
+                                         title='comment_list_test_title',
+                                         content='comment_list_test_content')
+        Article.objects.create(author=author,
+                               title='comment_list_empty_title',
+                               content='comment_list_empty_content')
+        Comment.objects.bulk_create([
+            Comment(article=article, comment_author=author, content='comment_list_comment{}'.format(i))
+            for i in range(COMMENTS_PER_PAGE * 2 + 1)
+        ])
+
+    def fetch(self, title, **params):
+        article = Article.objects.get(title=title)
+        return self.client.get(reverse('articles:comments', kwargs={'pk': article.pk}), params)
+
+    # 記事ページには最初のページのコメントのみが埋め込まれる
+    def test_success_embed_first_page(self):
+        article = Article.objects.get(title='comment_list_test_title')
+        response = self.client.get(reverse('articles:article', kwargs={'pk': article.pk}))
+        self.assertContains(response, 'class="article-comment"', count=COMMENTS_PER_PAGE)
+        self.assertContains(response, 'comments-more')
+
+    # ログインしていなくてもカーソルを辿って全てのコメントを投稿順にJSONで取得する事が出来る
+    def test_success_fetch_all_pages_json(self):
+        contents = []
+        cursor = None
+        for _ in range(3):
+            params = {'format': 'json'}
+            if cursor:
+                params['cursor'] = cursor
+            response = self.fetch('comment_list_test_title', **params)
+            self.assertEqual(response.status_code, 200)
+            data = response.json()['data']
+            contents.extend(comment['content'] for comment in data['comments'])
+            cursor = data['next_cursor']
+
+        self.assertIsNone(cursor)
+        self.assertEqual(contents, ['comment_list_comment{}'.format(i) for i in range(COMMENTS_PER_PAGE * 2 + 1)])
+
+    # HTMLの断片を取得する事が出来,最後のページには次のページのボタンが含まれない
+    def test_success_fetch_html_fragment(self):
+        response = self.fetch('comment_list_test_title', format='html')
+        self.assertContains(response, 'class="article-comment"', count=COMMENTS_PER_PAGE)
+        self.assertNotContains(response, '<html')
+
+        response = self.fetch('comment_list_empty_title', format='html')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'comments-more')
+
+    # 1ページの取得に必要なクエリ数はコメント数に依存しない
+    def test_success_query_budget(self):
+        article = Article.objects.get(title='comment_list_test_title')
+        url = reverse('articles:comments', kwargs={'pk': article.pk})
+        with self.assertNumQueries(1):
+            self.client.get(url, {'format': 'json'})
+
+    # 存在しない記事や不正なカーソルを指定した場合は404を返す
+    def test_fail_fetch(self):
+        response = self.client.get(reverse('articles:comments', kwargs={'pk': 0}), {'format': 'json'})
+        self.assertEqual(response.status_code, 404)
+
+        response = self.fetch('comment_list_test_title', format='json', cursor='invalid')
+        self.assertEqual(response.status_code, 404)
+
+        response = self.fetch('comment_list_test_title', format='json', cursor=encode_cursor('n', ['x']))
+        self.assertEqual(response.status_code, 404)
+        response = self.fetch('comment_list_test_title', format='json', cursor=encode_cursor('n', [2 ** 70]))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,80 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+
+from authenticate.models import Relation
+from ..feed import MERGE, SQL, load_feed, newest_article_keys
+from ..models import Article
+
+User = get_user_model()
+
+
+class FeedMergeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='feed_reader', email='feed_reader@test.com',
+                                              password='f33dmerge')
+        cls.authors = [User.objects.create_user(username='feed_author{}'.format(i),
+                                                email='feed_author{}@test.com'.format(i), password='f33dmerge')
+                       for i in range(3)]
+        now = timezone.now()
+        # 投稿者ごとに作成日時が交互になる様に記事を作成する,同じ作成日時の記事も含める
+        for i in range(12):
+            Article.objects.create(author=cls.authors[i % 3], title='feed_title{}'.format(i), content='feed',
+                                   created_at=now - datetime.timedelta(minutes=i // 2))
+        for author in cls.authors[:2]:
+            Relation.objects.create(follower=cls.reader, followee=author)
+
+    def expected_keys(self, author_ids):
+        return list(Article.objects.filter(author_id__in=author_ids).order_by('-created_at', '-id')
+                    .values_list('created_at', 'id'))
+
+    # 併合とデータベースでの並び替えのいずれでも,新しい順に同じ記事を返す
+    def test_success_strategies_match(self):
+        author_ids = [author.pk for author in self.authors]
+        expected = self.expected_keys(author_ids)
+        for strategy in (MERGE, SQL):
+            with self.subTest(strategy=strategy):
+                self.assertEqual(newest_article_keys(author_ids, 5, strategy=strategy), expected[:5])
+                self.assertEqual(newest_article_keys(author_ids, 5, values=list(expected[4]), strategy=strategy),
+                                 expected[5:10])
+
+    # 併合では投稿者ごとのクエリをUNION ALLでまとめ,投稿者の数に関わらず1回のクエリを実行する
+    @override_settings(FEED_MERGE_CHUNK_SIZE=2)
+    def test_success_query_count(self):
+        author_ids = [author.pk for author in self.authors]
+        with CaptureQueriesContext(connection) as queries:
+            newest_article_keys(author_ids[:2], 5, strategy=MERGE)
+        self.assertEqual(len(queries), 1)
+        self.assertIn('UNION ALL', queries[0]['sql'])
+        # 1つの文にまとめる投稿者の数を超える場合は文を分ける
+        with self.assertNumQueries(2):
+            newest_article_keys(author_ids, 5, strategy=MERGE)
+
+    # 2ページ目以降で投稿者の数が上限以下の場合のみ併合する
+    @override_settings(FEED_MERGE_MAX_AUTHORS=2)
+    def test_success_choose_strategy(self):
+        values = list(self.expected_keys([author.pk for author in self.authors])[4])
+        cases = [(self.authors[:2], None, False), (self.authors[:2], values, True), (self.authors, values, False)]
+        for authors, cursor_values, merged in cases:
+            with self.subTest(authors=len(authors), cursor=cursor_values is not None):
+                with CaptureQueriesContext(connection) as queries:
+                    newest_article_keys([author.pk for author in authors], 5, cursor_values)
+                self.assertEqual('UNION ALL' in queries[0]['sql'], merged)
+
+    # フォローしているユーザの記事のみをカーソルによってページ分割して返す
+    def test_success_load_feed(self):
+        expected = [pk for _, pk in self.expected_keys([author.pk for author in self.authors[:2]])]
+        pks = []
+        cursor = None
+        while True:
+            page = load_feed(self.reader, cursor, per_page=3)
+            pks += [article.pk for article in page]
+            if not page.has_next():
+                break
+            cursor = page.next_cursor
+        self.assertEqual(pks, expected)
@@ -0,0 +1,122 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from authenticate.models import Relation
+from common import counters
+from common.pagination import encode_cursor
+from jobs.queue import run_pending_jobs
+from ..models import Article, TimelineEntry
+from ..timeline import fan_out_article, load_timeline
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False, TIMELINE_FANOUT_BATCH_SIZE=2)
+class TimelineViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='timeline_reader', email='timeline_reader@test.com',
+                                              password='t1meline')
+        cls.author = User.objects.create_user(username='timeline_author', email='timeline_author@test.com',
+                                              password='t1meline')
+        cls.stranger = User.objects.create_user(username='timeline_stranger',
+                                                email='timeline_stranger@test.com', password='t1meline')
+        cls.fans = [User.objects.create_user(username='timeline_fan{}'.format(i),
+                                             email='timeline_fan{}@test.com'.format(i), password='t1meline')
+                    for i in range(4)]
+
+    def create_article(self, author, title, minutes):
+        return Article.objects.create(author=author, title=title, content=title,
+                                      created_at=timezone.now() - datetime.timedelta(minutes=minutes))
+
+    def follow(self, follower, followee):
+        Relation.objects.create(follower=follower, followee=followee)
+        counters.followed(follower.pk, followee.pk, 1)
+
+    # 投稿された記事はジョブによって全てのフォロワーのタイムラインに書き込まれる
+    def test_success_fan_out_on_write(self):
+        for fan in self.fans:
+            self.follow(fan, self.author)
+        article = self.create_article(self.author, 'timeline_fan_out', 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+
+        run_pending_jobs()
+        self.assertEqual(set(TimelineEntry.objects.filter(article=article).values_list('owner_id', flat=True)),
+                         {fan.pk for fan in self.fans})
+        # 再び実行しても重複して書き込まない
+        self.assertEqual(fan_out_article(article.pk), 4)
+        self.assertEqual(TimelineEntry.objects.filter(article=article).count(), 4)
+
+    # フォローした際に最近の記事が書き込まれ,フォローを解除した際に取り除かれる
+    def test_success_backfill_and_remove(self):
+        self.create_article(self.author, 'timeline_backfill', 0)
+        self.follow(self.reader, self.author)
+        self.assertEqual(TimelineEntry.objects.filter(owner=self.reader).count(), 1)
+
+        Relation.objects.get(follower=self.reader, followee=self.author).delete()
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.reader).exists())
+
+    # フォローしているユーザの記事のみを新しい順に表示し,カーソルによってページを送る
+    def test_success_view(self):
+        self.follow(self.reader, self.author)
+        for i in range(12):
+            self.create_article(self.author, 'timeline_title{}'.format(i), i)
+        self.create_article(self.stranger, 'timeline_stranger_title', 0)
+        run_pending_jobs()
+
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('articles:timeline'))
+        self.assertEqual(response.status_code, 200)
+        titles = [article.title for article in response.context['article_list']]
+        self.assertEqual(titles, ['timeline_title{}'.format(i) for i in range(10)])
+
+        response = self.client.get(reverse('articles:timeline'), {'cursor': response.context['page_obj'].next_cursor})
+        self.assertEqual([article.title for article in response.context['article_list']],
+                         ['timeline_title10', 'timeline_title11'])
+        self.assertFalse(response.context['page_obj'].has_next())
+
+    # フォロワーの多いユーザの記事は書き込まずに,表示時に書き込まれた記事と合わせて取得する
+    def test_success_pull_popular_author(self):
+        self.follow(self.reader, self.author)
+        self.follow(self.reader, self.stranger)
+        for fan in self.fans:
+            self.follow(fan, self.stranger)
+        for i in range(3):
+            self.create_article(self.author, 'timeline_pushed{}'.format(i), i * 2)
+            self.create_article(self.stranger, 'timeline_pulled{}'.format(i), i * 2 + 1)
+
+        with override_settings(TIMELINE_FANOUT_LIMIT=3):
+            run_pending_jobs()
+            self.assertFalse(TimelineEntry.objects.filter(author=self.stranger).exists())
+
+            page = load_timeline(self.reader, per_page=4)
+            self.assertEqual([article.title for article in page],
+                             ['timeline_pushed0', 'timeline_pulled0', 'timeline_pushed1', 'timeline_pulled1'])
+            with self.assertNumQueries(4):
+                page = load_timeline(self.reader, page.next_cursor, per_page=4)
+                self.assertEqual([article.title for article in page], ['timeline_pushed2', 'timeline_pulled2'])
+                self.assertEqual([article.author.username for article in page],
+                                 ['timeline_author', 'timeline_stranger'])
+
+    # ログインしていない状態ではアクセスする事が出来ない
+    def test_fail_access(self):
+        response = self.client.get(reverse('articles:timeline'))
+        self.assertEqual(response.status_code, 302)
+
+    # 不正なカーソルが指定された場合は404を返す
+    def test_fail_invalid_cursor(self):
+        self.client.force_login(self.reader)
+        response = self.client.get(reverse('articles:timeline'), {'cursor': 'invalid'})
+        self.assertEqual(response.status_code, 404)
+
+        # 値の数は正しいが,並び替えキーの型に変換する事が出来ないカーソル
+        response = self.client.get(reverse('articles:timeline'), {'cursor': encode_cursor('n', ['x', 'y'])})
+        self.assertEqual(response.status_code, 404)
+        # データベースの整数の範囲を超える主キーを含むカーソル
+        response = self.client.get(reverse('articles:timeline'),
+                                   {'cursor': encode_cursor('n', ['2021-01-01T00:00:00+00:00', 2 ** 70])})
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,157 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+
+from authenticate.models import Relation
+from common.pagination import (NEXT, CursorPage, CursorPaginator, InvalidCursor, clean_cursor_values, decode_cursor,
+                               encode_cursor)
+from .feed import fetch_author_streams, load_articles, newest_article_keys
+from .models import Article, TimelineEntry
+from .shards import shard_for_article, using_shard
+
+# タイムラインの1ページに表示する記事の件数
+TIMELINE_PER_PAGE = 10
+# フォロワー数がこれを超えるユーザの記事はタイムラインに書き込まずに,表示時に取得する
+DEFAULT_TIMELINE_FANOUT_LIMIT = 10000
+# 1回のINSERTで書き込むフォロワーの数
+DEFAULT_TIMELINE_FANOUT_BATCH_SIZE = 1000
+# フォローした際にタイムラインに書き込む,フォローしたユーザの最近の記事の件数
+DEFAULT_TIMELINE_BACKFILL = 20
+
+ENTRY_ORDERING = ('-created_at', '-article_id')
+
+User = get_user_model()
+
+
+def get_fanout_limit(fanout_limit=None):
+    if fanout_limit is not None:
+        return fanout_limit
+    return getattr(settings, 'TIMELINE_FANOUT_LIMIT', DEFAULT_TIMELINE_FANOUT_LIMIT)
+
+
+def fan_out_article(article_pk, fanout_limit=None):
+    """
+    記事を投稿したユーザの全てのフォロワーのタイムラインに記事を書き込む
+
+    フォロワーはフォロワーの主キーによるキーセット方式で一定の件数ずつ取得して書き込むため,
+    フォロワー数に関わらずメモリの使用量は一定となる
+    フォロワー数がTIMELINE_FANOUT_LIMITを超えるユーザの記事は書き込まない
+
+    Returns
+    -------
+    count : int
+        書き込んだタイムラインの行数
+    """
+    # 記事は投稿者と異なるデータベースに保存する場合があるため,投稿者のフォロワー数は別に取得する
+    article = using_shard(Article.objects.filter(pk=article_pk), shard_for_article(article_pk)) \
+        .values('author_id', 'created_at').first()
+    if article is None:
+        return 0
+    follower_count = User.objects.filter(pk=article['author_id']).values_list('follower_count', flat=True).first()
+    if follower_count is None or follower_count > get_fanout_limit(fanout_limit):
+        return 0
+
+    batch_size = getattr(settings, 'TIMELINE_FANOUT_BATCH_SIZE', DEFAULT_TIMELINE_FANOUT_BATCH_SIZE)
+    followers = Relation.objects.filter(followee_id=article['author_id']).order_by('follower_id')
+    count = 0
+    last_follower_id = 0
+    while True:
+        follower_ids = list(followers.filter(follower_id__gt=last_follower_id)
+                            .values_list('follower_id', flat=True)[:batch_size])
+        # 同じ記事を再び書き込んだ場合(ジョブの再実行)は無視する
+        TimelineEntry.objects.bulk_create([TimelineEntry(owner_id=follower_id, article_id=article_pk,
+                                                         author_id=article['author_id'],
+                                                         created_at=article['created_at'])
+                                           for follower_id in follower_ids], ignore_conflicts=True)
+        count += len(follower_ids)
+        if len(follower_ids) < batch_size:
+            return count
+        last_follower_id = follower_ids[-1]
+
+
+def backfill_timeline(follower_pk, followee_pk, fanout_limit=None):
+    """
+    フォローしたユーザの最近の記事をフォローしたユーザのタイムラインに書き込む
+    """
+    backfill_timelines(follower_pk, [followee_pk], fanout_limit)
+
+
+def backfill_timelines(follower_pk, followee_pks, fanout_limit=None):
+    """
+    フォローした複数のユーザの最近の記事をフォローしたユーザのタイムラインにまとめて書き込む
+
+    フォローしたユーザごとの最近の記事はarticles.feedによって1つの文で取得し,1回のINSERTで書き込む
+    """
+    followee_pks = list(Relation.objects.filter(follower_id=follower_pk, followee_id__in=followee_pks,
+                                                followee__follower_count__lte=get_fanout_limit(fanout_limit))
+                        .values_list('followee_id', flat=True))
+    if not followee_pks:
+        return
+    backfill = getattr(settings, 'TIMELINE_BACKFILL', DEFAULT_TIMELINE_BACKFILL)
+    streams = fetch_author_streams(followee_pks, backfill)
+    TimelineEntry.objects.bulk_create([TimelineEntry(owner_id=follower_pk, article_id=article_pk,
+                                                     author_id=followee_pk, created_at=created_at)
+                                       for followee_pk, keys in streams.items()
+                                       for created_at, article_pk in keys], ignore_conflicts=True)
+
+
+def remove_from_timeline(follower_pk, followee_pk):
+    # フォローを解除したユーザの記事をタイムラインから取り除く
+    remove_from_timelines(follower_pk, [followee_pk])
+
+
+def remove_from_timelines(follower_pk, followee_pks):
+    # フォローを解除した複数のユーザの記事をまとめてタイムラインから取り除く
+    TimelineEntry.objects.filter(owner_id=follower_pk, author_id__in=followee_pks).delete()
+
+
+def load_timeline(user, cursor=None, per_page=TIMELINE_PER_PAGE, fanout_limit=None):
+    """
+    フォローしているユーザの記事を新しい順に1ページ分だけ取得する
+
+    書き込まれたタイムラインの行と,フォロワーの多いフォローしているユーザの記事(articles.feed)を
+    それぞれ(作成日時, 主キー)のキーセット方式で1ページ分ずつ取得してから並べ替える
+
+    Parameters
+    ----------
+    user : User
+        タイムラインを表示するユーザ
+    cursor : str
+        前のページのnext_cursor,Noneの場合は最初のページを取得する
+    per_page : int
+        1ページに含める記事の件数
+    fanout_limit : int
+        書き込まずに表示時に取得するユーザのフォロワー数の下限,Noneの場合はTIMELINE_FANOUT_LIMIT
+
+    Raises
+    ------
+    InvalidCursor
+        カーソルとして解釈する事が出来ない文字列が指定された場合に発生
+
+    Returns
+    -------
+    page : CursorPage
+        投稿者を結合した記事のページ
+    """
+    values = None
+    if cursor:
+        direction, values = decode_cursor(cursor)
+        if direction != NEXT:
+            raise InvalidCursor('cursor is invalid')
+        values = clean_cursor_values(TimelineEntry, ENTRY_ORDERING, values)
+
+    # 記事は分散して保存する場合があるため,タイムラインの行からは(作成日時, 主キー)のみを取得する
+    entries = TimelineEntry.objects.filter(owner=user)
+    if values is not None:
+        entries = entries.filter(CursorPaginator(entries, per_page, ENTRY_ORDERING).seek_filter(values, True))
+    keys = list(entries.order_by(*ENTRY_ORDERING).values_list('created_at', 'article_id')[:per_page + 1])
+
+    # フォロワーが多いため書き込まれていないユーザの記事は,投稿者ごとのインデックスから取得して併合する
+    pulled_authors = list(Relation.objects.filter(follower=user,
+                                                  followee__follower_count__gt=get_fanout_limit(fanout_limit))
+                          .values_list('followee_id', flat=True))
+    if pulled_authors:
+        keys = sorted(set(keys) | set(newest_article_keys(pulled_authors, per_page + 1, values)), reverse=True)
+
+    rows = load_articles(keys[:per_page])
+    next_cursor = encode_cursor(NEXT, list(keys[per_page - 1])) if len(keys) > per_page else None
+    return CursorPage(rows, next_cursor, None)
@@ -1,11 +1,14 @@
 from django.urls import path
 
-from .views import ArticleView, ArticleListView, FavoriteArticleView, PostCommentView
+from .views import (ArticleView, ArticleListView, BulkFavoriteArticleView, FavoriteArticleView, PostCommentView,
+                    TimelineView)
 
 app_name = 'articles'
 
 urlpatterns = [
     path('', ArticleListView.as_view(), name='articles'),
+    path('timeline', TimelineView.as_view(), name='timeline'),
+    path('bulk/favorite', BulkFavoriteArticleView.as_view(), name='bulk_favorite'),
     path('<int:pk>', ArticleView.as_view(), name='article'),
     path('<int:pk>/comments', PostCommentView.as_view(), name='comments'),
     path('<int:pk>/favorite', FavoriteArticleView.as_view(), name='favorite'),
@@ -1,27 +1,47 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.contrib.auth.models import AnonymousUser
 from django.core.exceptions import ObjectDoesNotExist
-from django.db.models import Q
-from django.http import Http404, HttpResponseBadRequest
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from django.db.models.signals import m2m_changed
+from django.http import Http404, HttpResponse, HttpResponseBadRequest
 from django.http.response import JsonResponse
 from django.shortcuts import get_object_or_404, redirect
-from django.views.generic import FormView, CreateView, DetailView, ListView
-from django.shortcuts import render
-
-
+from django.template.loader import render_to_string
+from django.views.generic import FormView, CreateView, DetailView, ListView, TemplateView, View
+
+
+from authenticate.icons import icon_url
+from common import counters
+from common.bulk import BulkJsonMixin
+from common.conditional import ConditionalGetMixin
+from common.page_cache import (ARTICLES_TAG, TAGS_TAG, USERS_TAG, AnonymousPageCacheMixin,
+                               HolePunchedPageCacheMixin, article_tag, user_tag)
+from common.pagination import CachedCountPaginator, CursorPaginationMixin, InvalidCursor
+from common.replicas import ReplicaReadMixin
+from common.toggles import delete_rows, insert_rows, toggle_row
 from users.forms import FollowForm
 from .forms import FavoriteArticleForm, PostCommentForm, SearchArticleForm
+from .holes import resolve_favorite_state
+from .loaders import load_article_detail, load_comment_page, only_list_columns
 from .models import Article, Tag
+from .search import search_articles
+from .shards import group_by_shard, scatter, shard_for_article, using_shard
+from .timeline import load_timeline
 
 # Create your views here.
 
 User = get_user_model()
 
 
-class ArticleListView(ListView):
+class ArticleListView(ReplicaReadMixin, ConditionalGetMixin, AnonymousPageCacheMixin, CursorPaginationMixin,
+                      ListView):
     template_name = 'articles/articles.html'
     model = Article
     paginate_by = 5
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ('-created_at', '-id')
 
     def fetch_get_parameter(self, parameter_name):
         if type(parameter_name) is not str or parameter_name == "":
@@ -33,13 +53,14 @@ class ArticleListView(ListView):
         return self.request.GET.get(parameter_name)
 
     def get_queryset(self):
-        queryset = super().get_queryset()
+        # 記事を分散して保存している場合は,全ての保存先で絞り込んだ結果を並び替えキーによって併合する
+        return scatter(only_list_columns(self.search_queryset(super().get_queryset())), self.cursor_ordering)
 
-        # キーワードをURLパラメータから抽出
+    def search_queryset(self, queryset):
+        # キーワードをURLパラメータから抽出し,検索インデックスを利用して絞り込む
         try:
             keyword = self.fetch_get_parameter("keyword")
-            queryset = queryset.filter(Q(title__contains=keyword)
-                                       | Q(content__contains=keyword))
+            queryset = search_articles(queryset, keyword=keyword)
         except KeyError:
             pass
 
@@ -65,43 +86,71 @@ class ArticleListView(ListView):
             queryset = queryset.filter(tags=-1)
             return queryset
 
-        queryset = queryset.filter(tags=tag)
-        return queryset
+        return search_articles(queryset, tag=tag)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         # 記事一覧を取得する,検索結果が何も無い場合は 404 を返す
         article_list = context['article_list']
-        if article_list.first() is None:
+        if not article_list:
             raise Http404('指定したキーワードとタグを含む記事は存在しませんでした')
 
         context['form'] = SearchArticleForm
         return context
 
+    def get_etag_tags(self):
+        # 記事の一覧と検索フォームのタグの選択肢,記事の投稿者のプロフィールを表示する
+        return [ARTICLES_TAG, TAGS_TAG, USERS_TAG]
+
+    def get_page_cache_tags(self, context):
+        # 記事の一覧と検索フォームのタグの選択肢,記事の投稿者のプロフィールを表示する
+        return [ARTICLES_TAG, TAGS_TAG] + [user_tag(article.author_id) for article in context['article_list']]
+
+
+class TimelineView(LoginRequiredMixin, TemplateView):
+    """
+    フォローしているユーザの記事を新しい順に表示するタイムライン
+    """
+    template_name = 'articles/timeline.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        try:
+            page = load_timeline(self.request.user, self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('不正なカーソルが指定されました')
+
+        context['article_list'] = page.object_list
+        context['page_obj'] = page
+        context['is_paginated'] = page.has_other_pages()
+        return context
+
 
-class ArticleView(DetailView):
+class ArticleView(ReplicaReadMixin, ConditionalGetMixin, HolePunchedPageCacheMixin, DetailView):
     template_name = 'articles/article.html'
     model = Article
 
+    def get_object(self, queryset=None):
+        # シェルは全ての認証ユーザで共有するため,閲覧しているユーザに依存する状態は取得しない
+        if self.hole_shell:
+            return load_article_detail(self.kwargs['pk'], AnonymousUser())
+
+        # 記事・タグ・コメントとお気に入り・フォローの状態を決まった回数のクエリで取得する
+        article = load_article_detail(self.kwargs['pk'], self.request.user)
+        if self.request.user.is_authenticated:
+            resolve_favorite_state(self.request, article.pk, article.viewer_favorited)
+        return article
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
         context['comment_form'] = PostCommentForm
 
-        context['favorite_form'] = FavoriteArticleForm
-        # 既にお気に入り登録しているか否かでボタンに表示する値ととお気に入りフォームのvalue
-        # に設定される状態を示す文字列を決定する
-        context['favorite_button_value'] = 'お気に入り済み' \
-            if self.object.is_favorited(self.request.user) else 'お気に入りに追加'
-        context['favorite_status'] = 'favorited' \
-            if self.object.is_favorited(self.request.user) else 'notfavorited'
-
         # 認証されていないユーザの場合は現時点のデータを返す
         if not self.request.user.is_authenticated:
             return context
 
-        # 認証ユーザの場合はFavoriteArticleFormに現在のユーザ名を設定
         username = self.request.user.username
         initial_form_dict = dict(follower=username)
         follow_form = FollowForm(initial=initial_form_dict)
@@ -109,35 +158,85 @@ class ArticleView(DetailView):
 
         return context
 
+    def get_etag_tags(self):
+        # 記事とコメント,記事・コメントの投稿者のプロフィールを表示する
+        return [article_tag(self.kwargs['pk']), USERS_TAG]
+
+    def get_page_cache_tags(self, context):
+        # 記事とコメント,記事・コメントの投稿者のプロフィールを表示する
+        article = context['article']
+        author_ids = {article.author_id} | {comment.comment_author_id for comment in article.comment_page}
+        return [article_tag(article.pk)] + [user_tag(author_id) for author_id in author_ids]
+
+
+class CommentListView(View):
+    """
+    記事に対するコメントを1ページずつ返すエンドポイント
+
+    URLパラメータformatが'json'の場合はJSON,'html'の場合は記事ページに挿入するHTMLの断片を返し,
+    次のページはURLパラメータcursorに前のレスポンスのnext_cursorを指定して取得する
+    """
+    formats = ('json', 'html')
+    fragment_template_name = 'articles/comments.html'
+
     def get(self, request, *args, **kwargs):
-        if not self.request.user.is_authenticated:
-            return super().get(request, *args, **kwargs)
+        article_id = self.kwargs['pk']
+        cursor = request.GET.get('cursor')
+        try:
+            page = load_comment_page(article_id, cursor)
+        except InvalidCursor:
+            raise Http404('不正なカーソルが指定されました')
 
-        # 認証ユーザの場合はFavoriteArticleFormに現在のユーザ名を設定
-        username = self.request.user.username
-        initial_form_dict = dict(username=username)
-        favorite_form = FavoriteArticleForm(request.GET or None,
-                                            initial=initial_form_dict)
-        self.object = self.get_object()
-        context = self.get_context_data(object=self.object)
-        context['favorite_form'] = favorite_form
+        # 最初のページが空の場合のみ記事が存在するかを確認する
+        if not page.object_list and not cursor:
+            get_object_or_404(using_shard(Article.objects.only('pk'), shard_for_article(article_id)), pk=article_id)
 
-        return render(request, self.template_name, context)
+        if request.GET['format'] == 'html':
+            html = render_to_string(self.fragment_template_name,
+                                    {'article_pk': article_id, 'comment_page': page},
+                                    request=request)
+            return HttpResponse(html)
+
+        json_response = {
+            'data': {
+                'comments': [self.serialize(comment) for comment in page],
+                'next_cursor': page.next_cursor,
+            }
+        }
+        return JsonResponse(json_response)
+
+    def serialize(self, comment):
+        author = comment.comment_author
+        return {
+            'id': comment.pk,
+            'author': author.username,
+            'author_icon': icon_url(author, 25),
+            'content': comment.content,
+            'create_date': comment.create_data,
+        }
 
 
 class PostCommentView(LoginRequiredMixin, CreateView):
     template_name = ''
     form_class = PostCommentForm
 
+    def dispatch(self, request, *args, **kwargs):
+        # コメント一覧の取得はログインしていなくても行う事が出来る
+        if request.method == 'GET' and request.GET.get('format') in CommentListView.formats:
+            return CommentListView.as_view()(request, *args, **kwargs)
+        return super().dispatch(request, *args, **kwargs)
+
     def form_valid(self, form):
         article_id = self.kwargs['pk']
-        article = get_object_or_404(Article, pk=article_id)
+        article = get_object_or_404(using_shard(Article.objects.all(), shard_for_article(article_id)), pk=article_id)
         author = User.objects.get(pk=self.request.user.pk)
 
         comment = form.save(commit=False)
         comment.article = article
         comment.comment_author = author
-        comment.save()
+        with transaction.atomic():
+            comment.save()
+            counters.commented(article.pk, 1)
         return redirect('articles:article', pk=article_id)
 
     # GETリクエストされた場合はとりあえずリダイレクトさせる
@@ -150,6 +249,12 @@ class FavoriteArticleView(LoginRequiredMixin, FormView):
     form_class = FavoriteArticleForm
     template_name = 'base/blank.html'
 
+    def get_form_kwargs(self):
+        # 送信してきたユーザ自身のユーザ名の存在確認を省略するために,フォームにユーザを渡す
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
     def post(self, request, *args, **kwargs):
         form = self.get_form()
         if form.is_valid():
@@ -162,25 +267,30 @@ class FavoriteArticleView(LoginRequiredMixin, FormView):
         if not self.request.is_ajax:
             raise HttpResponseBadRequest()
 
-        # 送信されてきたユーザ名を取得し,送信してきたユーザと同じであるか確認する
-        username = form.cleaned_data['username']
-        user = User.objects.get(username=username)
-        if self.request.user != user:
-            raise HttpResponseBadRequest()
+        # 送信されてきたユーザ名が送信してきたユーザと同じであるか確認する
+        if self.request.user.username != form.cleaned_data['username']:
+            return HttpResponseBadRequest()
+        user = self.request.user
 
-        # 更新対象のArticleオブジェクトを取得
+        # 更新対象の記事は存在のみを確認する,中間テーブルは記事の保存先にある
         article_id = self.kwargs['pk']
-        article = get_object_or_404(Article, pk=article_id)
-
-        # お気に入りユーザとして登録していない場合は追加を行い,
-        # 既にお気に入りユーザとして登録している場合は削除を行い,状態を保存して更新する
-        if article.favorite_users.filter(username=username).exists():
-            article.favorite_users.remove(user)
-            status = 'notfavorited'
-        else:
-            article.favorite_users.add(user)
-            status = 'favorited'
-        article.save()
+        shard = shard_for_article(article_id)
+        if not using_shard(Article.objects.filter(pk=article_id), shard).exists():
+            raise Http404("その記事は存在しません")
+
+        # お気に入りユーザとして登録していない場合は中間テーブルに行を追加し,
+        # 既にお気に入りユーザとして登録している場合は削除する,記事の行は更新しない
+        # 同時に送信された場合でも,実際に行を変更したリクエストのみが件数を増減させる
+        through = Article.favorite_users.through
+        with transaction.atomic():
+            favorited, changed = toggle_row(through, using=shard, article_id=article_id, user_id=user.pk)
+            if changed:
+                counters.favorited(user.pk, article_id, 1 if favorited else -1)
+                # 中間テーブルを直接変更するため,キャッシュの無効化を行う受信側にm2m_changedを送信する
+                m2m_changed.send(sender=through, instance=user, model=Article, reverse=True,
+                                 action='post_add' if favorited else 'post_remove', pk_set={article_id},
+                                 using=shard or through.objects.db)
+        status = 'favorited' if favorited else 'notfavorited'
 
         # 処理の結果を格納するJSONオブジェクトを返す
         json_response = {
@@ -193,3 +303,52 @@ class FavoriteArticleView(LoginRequiredMixin, FormView):
     def form_invalid(self, form):
         # 正しく無いデータが送信されてきた場合は500を返す
         return JsonResponse({}, status=500)
+
+
+class BulkFavoriteArticleView(LoginRequiredMixin, BulkJsonMixin, View):
+    """
+    複数の記事のお気に入りへの追加・削除を1回のリクエストで行う
+
+    {"favorite": [記事の主キー, ...], "unfavorite": [記事の主キー, ...]} を受け取り,記事ごとに
+    'favorited'・'notfavorited'・'notfound'(存在しない)のいずれかを返す
+    """
+    bulk_actions = ('favorite', 'unfavorite')
+    bulk_item_type = int
+
+    def apply_bulk(self, items):
+        user = self.request.user
+        article_ids = items['favorite'] + items['unfavorite']
+        through = Article.favorite_users.through
+        found, created, removed = set(), [], []
+
+        with transaction.atomic():
+            # 同じユーザの一括操作を直列化し,ロックを取得してからお気に入りの状態を確認する
+            # ロックを取得しない1件ずつの切り替えと同時に行われても件数がずれない様に,件数は実際に作成・削除した行から求める
+            list(User.objects.select_for_update().filter(pk=user.pk).values_list('pk'))
+            for alias, pks in group_by_shard(article_ids, shard_for_article).items():
+                # 記事の存在と現在お気に入りに追加しているかを1回のクエリ(分散している場合は保存先ごと)で取得する
+                targets = dict(using_shard(Article.objects.filter(pk__in=pks), alias)
+                               .annotate(favorited=Exists(through.objects.filter(article=OuterRef('pk'), user=user)))
+                               .values_list('pk', 'favorited'))
+                found.update(targets)
+
+                rows = [through(article_id=article_id, user_id=user.pk)
+                        for article_id in items['favorite'] if article_id in targets and not targets[article_id]]
+                shard_created = [row.article_id for row in insert_rows(through, rows, using=alias)]
+                unfavorited = [article_id for article_id in items['unfavorite'] if targets.get(article_id)]
+                shard_removed = delete_rows(through, 'article_id', unfavorited, using=alias, user_id=user.pk)
+
+                # 中間テーブルを直接変更するため,キャッシュの無効化を行う受信側に行を変更した保存先のm2m_changedを送信する
+                for action, changed in (('post_add', shard_created), ('post_remove', shard_removed)):
+                    if changed:
+                        m2m_changed.send(sender=through, instance=user, model=Article, reverse=True,
+                                         action=action, pk_set=set(changed), using=alias or through.objects.db)
+                created += shard_created
+                removed += shard_removed
+            counters.favorited_many(user.pk, created, 1)
+            counters.favorited_many(user.pk, removed, -1)
+
+        statuses = {article_id: 'favorited' for article_id in items['favorite']}
+        statuses.update({article_id: 'notfavorited' for article_id in items['unfavorite']})
+        return [{'item': article_id, 'status': statuses[article_id] if article_id in found else 'notfound'}
+                for article_id in article_ids]
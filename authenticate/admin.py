@@ -2,7 +2,7 @@ from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
 from django.contrib.auth.forms import UserChangeForm, UserCreationForm
 from django.utils.translation import gettext_lazy as _
-from .models import User, Relation
+from .models import User, Relation, UserPurge
 
 # Register your models here.
 
@@ -43,5 +43,11 @@ class UserAdmin(UserAdmin):
     filter_horizontal = ('groups', 'user_permissions',)
 
 
+class UserPurgeAdmin(admin.ModelAdmin):
+    list_display = ('username', 'user_id', 'step', 'batches', 'started_at', 'finished_at')
+    readonly_fields = ('user_id', 'username', 'step', 'deleted', 'batches', 'started_at', 'finished_at')
+
+
 admin.site.register(User, UserAdmin)
 admin.site.register(Relation)
+admin.site.register(UserPurge, UserPurgeAdmin)
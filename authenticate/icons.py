@@ -0,0 +1,128 @@
+import posixpath
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image
+
+# 一覧で25px,プロフィールで100pxで表示するため,それぞれの2倍の解像度の画像も作成する
+DEFAULT_ICON_RENDITION_SIZES = (25, 50, 100, 200)
+# WebPに対応していないブラウザのためにPNGも作成する
+ICON_RENDITION_FORMATS = ('webp', 'png')
+
+
+def get_rendition_sizes():
+    return tuple(getattr(settings, 'ICON_RENDITION_SIZES', DEFAULT_ICON_RENDITION_SIZES))
+
+
+def rendition_key(size, image_format):
+    return '{}.{}'.format(size, image_format)
+
+
+def rendition_name(icon_name, size, image_format):
+    """
+    元の画像と同じディレクトリに保存するサイズ・形式ごとの画像のファイル名を返す
+
+    例: media/images/icon.png -> media/images/icon.25x25.webp
+    """
+    directory, filename = posixpath.split(icon_name)
+    stem = posixpath.splitext(filename)[0]
+    return posixpath.join(directory, '{0}.{1}x{1}.{2}'.format(stem, size, image_format))
+
+
+def render_renditions(data, sizes, formats=ICON_RENDITION_FORMATS):
+    """
+    画像を中央で正方形に切り抜き,サイズ・形式ごとに縮小した画像を作成する
+
+    Djangoの設定やモデルには依存しない
+
+    Parameters
+    ----------
+    data : bytes
+        元の画像のデータ
+    sizes : tuple
+        作成する画像の一辺の長さ(px)
+    formats : tuple
+        作成する画像の形式
+
+    Returns
+    -------
+    renditions : list
+        (一辺の長さ, 形式, 画像のデータ) のリスト
+    """
+    with Image.open(BytesIO(data)) as image:
+        image = image.convert('RGBA')
+        side = min(image.size)
+        left = (image.width - side) // 2
+        top = (image.height - side) // 2
+        square = image.crop((left, top, left + side, top + side))
+
+    renditions = []
+    for size in sizes:
+        resized = square.resize((size, size), Image.LANCZOS)
+        for image_format in formats:
+            output = BytesIO()
+            if image_format == 'webp':
+                resized.save(output, 'webp', quality=80, method=4)
+            else:
+                resized.save(output, image_format, optimize=True)
+            renditions.append((size, image_format, output.getvalue()))
+    return renditions
+
+
+def generate_icon_renditions(user):
+    """
+    ユーザのアイコンから縮小した画像を作成し,元の画像と同じストレージに保存する
+
+    画像の縮小はCPUを占有するため,リクエストの中ではなくジョブ(authenticate.tasks)として実行する
+
+    Parameters
+    ----------
+    user : User
+        アイコンを更新したユーザ
+
+    Returns
+    -------
+    renditions : dict
+        {'<一辺の長さ>.<形式>': 保存したファイル名} の辞書,User.icon_renditionsに保存する
+    """
+    icon = user.icon
+    storage = icon.storage
+    with storage.open(icon.name, 'rb') as icon_file:
+        data = icon_file.read()
+
+    renditions = {}
+    for size, image_format, content in render_renditions(data, get_rendition_sizes()):
+        name = rendition_name(icon.name, size, image_format)
+        # 同じ名前のファイルが存在する場合はストレージによって別の名前で保存される
+        renditions[rendition_key(size, image_format)] = storage.save(name, ContentFile(content))
+    return renditions
+
+
+def delete_renditions(storage, names):
+    """
+    アイコンの変更によって表示されなくなった縮小画像のファイルをストレージから削除する
+    """
+    for name in names:
+        storage.delete(name)
+
+
+def pick_rendition(user, size, image_format):
+    """
+    表示するサイズ以上で最も小さい画像のファイル名を返す,作成されていない場合はNoneを返す
+    """
+    renditions = user.icon_renditions or {}
+    for rendition_size in sorted(get_rendition_sizes()):
+        if rendition_size >= size and rendition_key(rendition_size, image_format) in renditions:
+            return renditions[rendition_key(rendition_size, image_format)]
+    return None
+
+
+def icon_url(user, size, image_format='png'):
+    """
+    表示するサイズに適した画像のURLを返す,縮小した画像が無い場合は元の画像のURLを返す
+
+    URLはアイコンを保存したストレージから取得する(ファイルシステム以外のストレージではMEDIA_URLと異なる)
+    """
+    name = pick_rendition(user, size, image_format) or user.icon.name
+    return user.icon.storage.url(name)
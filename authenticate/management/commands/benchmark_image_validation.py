@@ -0,0 +1,65 @@
+import time
+import tracemalloc
+import warnings
+from io import BytesIO
+
+from django import forms
+from django.core.exceptions import ValidationError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from PIL import Image
+
+from settings.images import HeaderOnlyImageField
+
+
+class Command(BaseCommand):
+    help = 'forms.ImageFieldとヘッダのみを検証するHeaderOnlyImageFieldの処理時間とメモリ使用量を画像の大きさごとに比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', nargs='+', type=int, default=[1024, 2048, 4096],
+                            help='計測に利用する正方形の画像の一辺の長さ(px)')
+        parser.add_argument('--formats', nargs='+', default=['PNG', 'JPEG'],
+                            help='計測に利用する画像の形式')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='1つの画像につき検証を繰り返す回数')
+
+    def handle(self, *args, **options):
+        # 上限を設けずに比較するため,アップロードサイズと画素数の上限は十分に大きくする
+        fields = [
+            ('ImageField', forms.ImageField()),
+            ('HeaderOnlyImageField', HeaderOnlyImageField(max_upload_size=2 ** 40)),
+        ]
+        for image_format in options['formats']:
+            for size in options['sizes']:
+                data = self.create_image(size, image_format)
+                for name, field in fields:
+                    elapsed, peak = self.measure(field, data, image_format, options['repeat'])
+                    self.stdout.write('{:>5} {:>5}px {:>8.1f}KB {:>22} {:9.3f}ms {:9.1f}KB'.format(
+                        image_format, size, len(data) / 1024, name, elapsed * 1000, peak / 1024))
+
+    def create_image(self, size, image_format):
+        # 圧縮の効かないノイズの画像とする
+        output = BytesIO()
+        Image.effect_noise((size, size), 64).convert('RGB').save(output, image_format)
+        return output.getvalue()
+
+    def measure(self, field, data, image_format, repeat):
+        """
+        1回の検証に掛かる平均の処理時間(秒)と最大のメモリ使用量(バイト)を返す
+        """
+        elapsed = 0
+        peak = 0
+        for _ in range(repeat):
+            upload = SimpleUploadedFile('benchmark.{}'.format(image_format.lower()), data)
+            tracemalloc.start()
+            start = time.perf_counter()
+            try:
+                with warnings.catch_warnings():
+                    warnings.simplefilter('ignore', Image.DecompressionBombWarning)
+                    field.clean(upload)
+            except ValidationError:
+                pass
+            elapsed += time.perf_counter() - start
+            peak = max(peak, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+        return elapsed / repeat, peak
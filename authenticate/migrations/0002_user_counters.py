@@ -0,0 +1,31 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='follower_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='follower count'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='followee_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='followee count'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='article_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='article count'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='favorite_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='favorite count'),
+        ),
+    ]
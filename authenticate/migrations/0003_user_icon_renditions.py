@@ -0,0 +1,16 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('authenticate', '0002_user_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='icon_renditions',
+            field=models.JSONField(blank=True, default=dict, verbose_name='user icon renditions'),
+        ),
+    ]
@@ -2,7 +2,6 @@ from django.apps import apps
 from django.contrib.auth.hashers import make_password
 from django.core.exceptions import ObjectDoesNotExist
 from django.db import models
-from django.core.mail import send_mail
 from django.contrib.auth.models import PermissionsMixin, UserManager
 from django.contrib.auth.base_user import AbstractBaseUser
 from django.db.models.deletion import CASCADE
@@ -11,6 +10,8 @@ from django.utils import timezone
 from django.contrib.auth.validators import UnicodeUsernameValidator
 from django.urls.base import reverse
 
+from common.counters import USER_COUNTERS, update_fields_without_counters
+
 
 class UserManager(UserManager):
     use_in_migrations = True
@@ -57,9 +58,16 @@ class User(AbstractBaseUser, PermissionsMixin):
     first_name = models.CharField(_('first name'), max_length=150, blank=True)
     last_name = models.CharField(_('last name'), max_length=150, blank=True)
     icon = models.ImageField(_('user icon'), upload_to='media/images', default='media/images/default.png')
+    # アイコンを縮小した画像のファイル名(authenticate.iconsによって作成する)
+    icon_renditions = models.JSONField(_('user icon renditions'), default=dict, blank=True)
     profile_message = models.TextField(_('user profile message'), max_length=1000, blank=True)
     followers = models.ManyToManyField('User', through='Relation', through_fields=('followee', 'follower'), related_name='+')
     followees = models.ManyToManyField('User', through='Relation', through_fields=('follower', 'followee'), related_name='+')
+    # 関連する行を数えずに表示するための件数(common.countersによって更新する)
+    follower_count = models.PositiveIntegerField(_('follower count'), default=0)
+    followee_count = models.PositiveIntegerField(_('followee count'), default=0)
+    article_count = models.PositiveIntegerField(_('article count'), default=0)
+    favorite_count = models.PositiveIntegerField(_('favorite count'), default=0)
     is_staff = models.BooleanField(
         _('staff status'),
         default=False,
@@ -85,6 +93,11 @@ class User(AbstractBaseUser, PermissionsMixin):
         verbose_name = _('user')
         verbose_name_plural = _('users')
 
+    def save(self, *args, **kwargs):
+        # 件数はF式によって更新されるため,読み込んだ時点の値で上書きしない
+        kwargs['update_fields'] = update_fields_without_counters(self, USER_COUNTERS, **kwargs)
+        super().save(*args, **kwargs)
+
     def clean(self):
         super().clean()
         self.email = self.__class__.objects.normalize_email(self.email)
@@ -102,7 +115,9 @@ class User(AbstractBaseUser, PermissionsMixin):
 
     def email_user(self, subject, message, from_email=None, **kwargs):
         """Send an email to this user."""
-        send_mail(subject, message, from_email, [self.email], **kwargs)
+        # メールの送信はSMTPサーバの応答を待つため,ジョブとして登録してすぐに戻る
+        from .tasks import send_user_email
+        send_user_email.delay(self.pk, subject, message, from_email, **kwargs)
 
     def get_absolute_url(self):
         return reverse('register:register')
@@ -129,3 +144,24 @@ class Relation(models.Model):
 
     class Meta:
         unique_together = ('follower', 'followee')
+
+
+class UserPurge(models.Model):
+    """
+    退会したユーザが所有する行の削除の進捗(authenticate.purgeによって更新する)
+
+    ユーザの行は最後に削除するため,ユーザへの外部キーではなく主キーの値を保持する
+    """
+    user_id = models.BigIntegerField(unique=True)
+    username = models.CharField(max_length=30)
+    # 次に削除を行う段階(authenticate.purge.PURGE_STEPSの名前)
+    step = models.CharField(max_length=30, default='followees')
+    # 段階ごとに削除した行数
+    deleted = models.JSONField(default=dict, blank=True)
+    batches = models.PositiveIntegerField(default=0)
+    started_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    def __str__(self):
+        return '{} ({})'.format(self.username, self.step)
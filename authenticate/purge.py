@@ -0,0 +1,253 @@
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from articles.shards import get_shard_aliases, shard_for_author, using_shard
+from common import counters
+from common.page_cache import article_tag, invalidate_tags, user_favorites_tag
+from common.pagination import bump_count_generation
+
+# 1回のトランザクションで削除する最大の行数
+DEFAULT_USER_PURGE_BATCH_SIZE = 500
+# 1つのジョブで削除を行う最大の秒数,これを過ぎた場合は続きを新しいジョブとして登録する
+DEFAULT_USER_PURGE_TIME_BUDGET = 60
+
+
+def get_models():
+    from .models import UserPurge
+
+    return counters.get_models() + (UserPurge,)
+
+
+def purge_followees(user_pk, batch_size):
+    # フォローしていたユーザのフォロワー数を減らす
+    User, _, _, Relation, _ = get_models()
+    rows = list(Relation.objects.filter(follower_id=user_pk).values_list('pk', 'followee_id')[:batch_size])
+    counters.add_grouped(User, 'follower_count', Counter(followee_id for _, followee_id in rows).items())
+    counters.add(User.objects.filter(pk=user_pk), 'followee_count', -len(rows))
+    Relation.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+    return len(rows)
+
+
+def purge_followers(user_pk, batch_size):
+    # フォローされていたユーザのフォロー数を減らす
+    User, _, _, Relation, _ = get_models()
+    rows = list(Relation.objects.filter(followee_id=user_pk).values_list('pk', 'follower_id')[:batch_size])
+    counters.add_grouped(User, 'followee_count', Counter(follower_id for _, follower_id in rows).items())
+    counters.add(User.objects.filter(pk=user_pk), 'follower_count', -len(rows))
+    Relation.objects.filter(pk__in=[pk for pk, _ in rows]).delete()
+    return len(rows)
+
+
+def purge_on_shards(user_pk, batch_size, purge_shard):
+    """
+    記事を保存している全てのデータベースから,合わせてbatch_size件までの行を削除する
+
+    他のユーザの記事に付いた行(お気に入り・コメント)は記事の保存先にあるため,分散している場合は全ての保存先を順に削除する
+    """
+    deleted = 0
+    for alias in get_shard_aliases() or [None]:
+        if deleted >= batch_size:
+            break
+        deleted += purge_shard(user_pk, batch_size - deleted, alias)
+    return deleted
+
+
+def delete_favorites(rows, alias):
+    """
+    お気に入りの中間テーブルの行を削除する,中間テーブルの行の削除ではm2m_changedが送信されないため,
+    一覧の件数とキャッシュしたページの無効化を直接行う
+    """
+    _, Article, _, _, _ = get_models()
+    through = Article.favorite_users.through
+    using_shard(through.objects.filter(pk__in=[pk for pk, _, _ in rows]), alias).delete()
+    bump_count_generation(through._meta.db_table)
+    invalidate_tags(*{user_favorites_tag(user_id) for _, user_id, _ in rows},
+                    *{article_tag(article_id) for _, _, article_id in rows})
+
+
+def purge_shard_favorites(user_pk, batch_size, alias):
+    User, Article, _, _, _ = get_models()
+    rows = list(using_shard(Article.favorite_users.through.objects.filter(user_id=user_pk), alias)
+                .values_list('pk', 'user_id', 'article_id')[:batch_size])
+    counters.add_grouped(Article, 'favorite_count', Counter(article_id for _, _, article_id in rows).items(),
+                         using=alias)
+    counters.add(User.objects.filter(pk=user_pk), 'favorite_count', -len(rows))
+    delete_favorites(rows, alias)
+    return len(rows)
+
+
+def purge_favorites(user_pk, batch_size):
+    # お気に入りに追加していた記事のお気に入り数を減らす
+    return purge_on_shards(user_pk, batch_size, purge_shard_favorites)
+
+
+def purge_shard_comments(user_pk, batch_size, alias):
+    _, Article, Comment, _, _ = get_models()
+    rows = list(using_shard(Comment.objects.filter(comment_author_id=user_pk), alias)
+                .exclude(article__author_id=user_pk).values_list('pk', 'article_id')[:batch_size])
+    counters.add_grouped(Article, 'comment_count', Counter(article_id for _, article_id in rows).items(),
+                         using=alias)
+    using_shard(Comment.objects.filter(pk__in=[pk for pk, _ in rows]), alias).delete()
+    return len(rows)
+
+
+def purge_comments(user_pk, batch_size):
+    # 他のユーザの記事に投稿していたコメントの件数を減らす
+    return purge_on_shards(user_pk, batch_size, purge_shard_comments)
+
+
+def purge_article_comments(user_pk, batch_size):
+    # 投稿していた記事に付いたコメント,記事と同じく投稿者の保存先にある
+    _, Article, Comment, _, _ = get_models()
+    alias = shard_for_author(user_pk)
+    rows = list(using_shard(Comment.objects.filter(article__author_id=user_pk), alias)
+                .values_list('pk', 'article_id')[:batch_size])
+    counters.add_grouped(Article, 'comment_count', Counter(article_id for _, article_id in rows).items(),
+                         using=alias)
+    using_shard(Comment.objects.filter(pk__in=[pk for pk, _ in rows]), alias).delete()
+    return len(rows)
+
+
+def purge_article_favorites(user_pk, batch_size):
+    # 投稿していた記事をお気に入りに追加していた他のユーザのお気に入り数を減らす
+    User, Article, _, _, _ = get_models()
+    alias = shard_for_author(user_pk)
+    rows = list(using_shard(Article.favorite_users.through.objects.filter(article__author_id=user_pk), alias)
+                .values_list('pk', 'user_id', 'article_id')[:batch_size])
+    counters.add_grouped(User, 'favorite_count', Counter(user_id for _, user_id, _ in rows).items())
+    counters.add_grouped(Article, 'favorite_count', Counter(article_id for _, _, article_id in rows).items(),
+                         using=alias)
+    delete_favorites(rows, alias)
+    return len(rows)
+
+
+def purge_timeline(user_pk, batch_size):
+    # 自身のタイムライン
+    from articles.models import TimelineEntry
+
+    pks = list(TimelineEntry.objects.filter(owner_id=user_pk).values_list('pk', flat=True)[:batch_size])
+    TimelineEntry.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def purge_article_timeline(user_pk, batch_size):
+    # フォロワーのタイムラインに書き込まれた記事,記事の削除と共に削除すると1回の削除が記事数×フォロワー数の行となる
+    from articles.models import TimelineEntry
+
+    pks = list(TimelineEntry.objects.filter(author_id=user_pk).values_list('pk', flat=True)[:batch_size])
+    TimelineEntry.objects.filter(pk__in=pks).delete()
+    return len(pks)
+
+
+def purge_articles(user_pk, batch_size):
+    # コメント・お気に入り・タイムラインを削除した後の記事は,タグの中間テーブルと検索インデックスのみが連鎖的に削除される
+    User, Article, _, _, _ = get_models()
+    alias = shard_for_author(user_pk)
+    pks = list(using_shard(Article.objects.filter(author_id=user_pk), alias).values_list('pk', flat=True)[:batch_size])
+    using_shard(Article.objects.filter(pk__in=pks), alias).delete()
+    counters.add(User.objects.filter(pk=user_pk), 'article_count', -len(pks))
+    return len(pks)
+
+
+def purge_user_row(user_pk, batch_size):
+    # 所有する行を削除した後のユーザは,連鎖的に削除される行がほとんど無い
+    User, _, _, _, _ = get_models()
+    _, deleted = User.objects.filter(pk=user_pk).delete()
+    return deleted.get(User._meta.label, 0)
+
+
+# 削除を行う順番,各段階は削除した行数がbatch_size未満になった時点で完了とする
+PURGE_STEPS = (
+    ('followees', purge_followees),
+    ('followers', purge_followers),
+    ('favorites', purge_favorites),
+    ('comments', purge_comments),
+    ('article_comments', purge_article_comments),
+    ('article_favorites', purge_article_favorites),
+    ('timeline', purge_timeline),
+    ('article_timeline', purge_article_timeline),
+    ('articles', purge_articles),
+    ('user', purge_user_row),
+)
+
+
+def next_step(step):
+    names = [name for name, _ in PURGE_STEPS]
+    index = names.index(step) + 1
+    return names[index] if index < len(names) else None
+
+
+def start_purge(user):
+    """
+    ユーザを無効にし,データの削除の進捗を記録する行を作成する
+
+    トランザクションの中で呼び出し,削除を行うジョブと同時にコミットする
+    """
+    _, _, _, _, UserPurge = get_models()
+    user.is_active = False
+    user.save(update_fields=['is_active'])
+    purge, _ = UserPurge.objects.get_or_create(user_id=user.pk, defaults={'username': user.username})
+    return purge
+
+
+def run_purge(user_pk, batch_size=None, time_budget=None):
+    """
+    退会したユーザが所有する行を一定の行数ずつ削除する
+
+    各バッチは主キーのみを読み込んで削除し,件数の更新と進捗の記録と共に
+    1つのトランザクションでコミットする(途中の状態でも件数は実際の行数と一致する),そのためユーザの投稿数に関わらずメモリの使用量と
+    ロックを保持する時間はバッチの大きさで決まり,中断された場合も記録した段階から再開する事が出来る
+    記事を分散して保存している場合(articles.shards),保存先の行は各保存先のトランザクションでdefaultの直前にコミットするため,
+    保存先とdefaultのコミットの間で中断された場合のみ件数が実際の行数と一致しない
+
+    Parameters
+    ----------
+    user_pk : int
+        削除するユーザの主キー
+    batch_size : int
+        1回のトランザクションで削除する最大の行数
+    time_budget : float
+        削除を行う最大の秒数,少なくとも1つのバッチは削除する
+
+    Returns
+    -------
+    finished : bool
+        全ての行を削除し終えたか否か,Falseの場合は続きを再び実行する必要がある
+    """
+    _, _, _, _, UserPurge = get_models()
+    if batch_size is None:
+        batch_size = getattr(settings, 'USER_PURGE_BATCH_SIZE', DEFAULT_USER_PURGE_BATCH_SIZE)
+    if time_budget is None:
+        time_budget = getattr(settings, 'USER_PURGE_TIME_BUDGET', DEFAULT_USER_PURGE_TIME_BUDGET)
+    steps = dict(PURGE_STEPS)
+    deadline = time.monotonic() + time_budget
+
+    while True:
+        # 記事を分散して保存している場合は各保存先のトランザクションも開き,進捗を記録するdefaultより先にコミットする
+        with transaction.atomic(), ExitStack() as shard_transactions:
+            for alias in get_shard_aliases():
+                shard_transactions.enter_context(transaction.atomic(using=alias))
+            purge = UserPurge.objects.select_for_update().filter(user_id=user_pk, finished_at=None).first()
+            if purge is None:
+                return True
+
+            step = purge.step
+            deleted = steps[step](user_pk, batch_size)
+            purge.deleted[step] = purge.deleted.get(step, 0) + deleted
+            purge.batches += 1
+            if deleted < batch_size:
+                if next_step(step) is None:
+                    purge.finished_at = timezone.now()
+                else:
+                    purge.step = next_step(step)
+            purge.save()
+
+        if purge.finished_at is not None:
+            return True
+        if time.monotonic() >= deadline:
+            return False
@@ -0,0 +1,51 @@
+from django.contrib.auth import get_user_model
+from django.core.mail import send_mail
+
+from common.page_cache import USERS_TAG, invalidate_tags, user_tag
+from jobs.queue import task
+
+from .icons import delete_renditions, generate_icon_renditions
+from .purge import run_purge
+
+User = get_user_model()
+
+
+@task(name='authenticate.generate_icon_renditions')
+def generate_renditions(user_pk, icon_name, previous_renditions=()):
+    """
+    アップロードされたアイコンの縮小画像を作成し,User.icon_renditionsに保存する
+
+    ジョブを実行するまでの間に再びアイコンが変更された場合は,古いアイコンの縮小画像を作成しない
+    previous_renditionsには変更前のアイコンの縮小画像のファイル名を受け取り,新しい縮小画像を保存する前に削除する
+    """
+    storage = User._meta.get_field('icon').storage
+    delete_renditions(storage, previous_renditions)
+    user = User.objects.filter(pk=user_pk, icon=icon_name).first()
+    if user is None:
+        return
+    renditions = generate_icon_renditions(user)
+    # update()はpost_saveを送信しないため,アイコンを表示するキャッシュ済みのページ・ETagを無効にする
+    if User.objects.filter(pk=user_pk, icon=icon_name).update(icon_renditions=renditions):
+        invalidate_tags(USERS_TAG, user_tag(user_pk))
+    else:
+        # 作成している間にアイコンが変更された場合は,保存されない縮小画像を残さない
+        delete_renditions(storage, renditions.values())
+
+
+@task(name='authenticate.send_user_email')
+def send_user_email(user_pk, subject, message, from_email=None, **kwargs):
+    user = User.objects.filter(pk=user_pk).first()
+    if user is None:
+        return
+    send_mail(subject, message, from_email, [user.email], **kwargs)
+
+
+@task(name='authenticate.purge_user')
+def purge_user(user_pk):
+    """
+    退会したユーザが所有する行を一定の行数ずつ削除する
+
+    1つのジョブが占有の期限を超えて実行されない様に,時間内に削除し終えなかった場合は続きを新しいジョブとして登録する
+    """
+    if not run_purge(user_pk):
+        purge_user.delay(user_pk)
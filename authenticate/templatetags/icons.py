@@ -0,0 +1,32 @@
+from django import template
+
+from ..icons import icon_url, pick_rendition
+
+register = template.Library()
+
+
+@register.inclusion_tag('authenticate/icon.html')
+def icon(user, size, style=''):
+    """
+    表示するサイズに適した縮小済みのアイコンを表示する
+
+    WebPの画像を優先し,WebPに対応していないブラウザにはPNGの画像を表示する
+    縮小した画像が無い場合(初期アイコンや作成前にアップロードされたアイコン)は元の画像を表示する
+
+    Parameters
+    ----------
+    user : User
+        アイコンを表示するユーザ
+    size : int
+        表示する一辺の長さ(px)
+    style : str
+        imgタグに指定するstyle属性
+    """
+    webp = pick_rendition(user, size, 'webp')
+    webp_2x = pick_rendition(user, size * 2, 'webp')
+    return {
+        'webp_url': icon_url(user, size, 'webp') if webp else None,
+        'webp_2x_url': icon_url(user, size * 2, 'webp') if webp_2x and webp_2x != webp else None,
+        'src': icon_url(user, size),
+        'style': style,
+    }
@@ -0,0 +1,113 @@
+import os
+import tempfile
+from io import BytesIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.template import Context, Template
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from common.page_cache import USERS_TAG, get_tag_versions, user_tag
+from jobs.queue import run_pending_jobs
+from settings.tests.NeedImageTestMixin import NeedImageTestMixin
+from ..icons import icon_url, render_renditions
+
+User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, MEDIA_URL='/media/')
+@override_settings(AXES_ENABLED=False)
+class IconRenditionPipelineTest(NeedImageTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='icon_rendition_tester',
+                                            email='icon_rendition_tester@test.com',
+                                            password='ic0nrend1tion')
+
+    # 画像を中央で正方形に切り抜き,サイズ・形式ごとに縮小する
+    def test_success_render_renditions(self):
+        source = BytesIO()
+        Image.new('RGB', (300, 200), color=(255, 0, 0)).save(source, 'png')
+
+        renditions = render_renditions(source.getvalue(), (25, 50))
+        self.assertEqual([(size, image_format) for size, image_format, _ in renditions],
+                         [(25, 'webp'), (25, 'png'), (50, 'webp'), (50, 'png')])
+        for size, image_format, content in renditions:
+            with Image.open(BytesIO(content)) as image:
+                self.assertEqual(image.size, (size, size))
+                self.assertEqual(image.format, image_format.upper())
+
+    # アイコンのアップロード時に縮小画像を作成するジョブが登録され,元の画像と同じストレージに保存される
+    def test_success_generate_on_upload(self):
+        self.client.force_login(self.user)
+        response = self.client.post(reverse('settings:profile'),
+                                    {'icon': self.create_image_dict(size=(400, 400))['icon'],
+                                     'profile_message': 'icon_rendition_message'})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(User.objects.get(pk=self.user.pk).icon_renditions, {})
+
+        self.assertEqual(run_pending_jobs(), 1)
+        user = User.objects.get(pk=self.user.pk)
+        self.assertEqual(set(user.icon_renditions),
+                         {'{}.{}'.format(size, image_format)
+                          for size in (25, 50, 100, 200) for image_format in ('webp', 'png')})
+        icon_directory = os.path.dirname(user.icon.name)
+        for name in user.icon_renditions.values():
+            self.assertEqual(os.path.dirname(name), icon_directory)
+            self.assertTrue(default_storage.exists(name))
+
+        # 一覧では25pxの画像と高解像度向けの50pxの画像を表示する
+        html = Template("{% load icons %}{% icon user 25 %}").render(Context({'user': user}))
+        self.assertIn('/media/{} 1x'.format(user.icon_renditions['25.webp']), html)
+        self.assertIn('/media/{} 2x'.format(user.icon_renditions['50.webp']), html)
+        self.assertIn('<img src="/media/{}"'.format(user.icon_renditions['25.png']), html)
+
+    # 2回目のアップロードでは前のアイコンの縮小画像を空にし,ジョブが前の縮小画像のファイルを削除して作成し直した後に
+    # キャッシュ済みのページを無効にする
+    def test_success_regenerate_on_second_upload(self):
+        self.client.force_login(self.user)
+        for i in range(2):
+            response = self.client.post(reverse('settings:profile'),
+                                        {'icon': self.create_image_dict(size=(400, 400))['icon'],
+                                         'profile_message': 'icon_rendition_message{}'.format(i)})
+            self.assertEqual(response.status_code, 302)
+            if i == 0:
+                self.assertEqual(run_pending_jobs(), 1)
+                first_renditions = User.objects.get(pk=self.user.pk).icon_renditions
+                self.assertNotEqual(first_renditions, {})
+        self.assertEqual(User.objects.get(pk=self.user.pk).icon_renditions, {})
+
+        tags = (USERS_TAG, user_tag(self.user.pk))
+        versions = get_tag_versions(tags)
+        self.assertEqual(run_pending_jobs(), 1)
+        user = User.objects.get(pk=self.user.pk)
+        icon_directory = os.path.dirname(user.icon.name)
+        self.assertEqual(len(user.icon_renditions), len(first_renditions))
+        for name in user.icon_renditions.values():
+            self.assertEqual(os.path.dirname(name), icon_directory)
+            self.assertNotIn(name, first_renditions.values())
+            self.assertTrue(default_storage.exists(name))
+        # 前のアイコンの縮小画像のファイルはストレージから削除される
+        for name in first_renditions.values():
+            self.assertFalse(default_storage.exists(name))
+        for tag, version in get_tag_versions(tags).items():
+            self.assertGreater(version, versions[tag])
+
+    # 縮小画像が無いアイコンは元の画像を表示する
+    def test_success_fallback_original(self):
+        html = Template("{% load icons %}{% icon user 25 'width: 25px;' %}").render(Context({'user': self.user}))
+        self.assertEqual(html.strip(), '<img src="/media/media/images/default.png" style="width: 25px;">')
+
+    # URLはMEDIA_URLから組み立てずに,アイコンを保存したストレージから取得する
+    def test_success_storage_url(self):
+        User.objects.filter(pk=self.user.pk).update(icon_renditions={'25.png': 'media/images/icon.25x25.png'})
+        user = User.objects.get(pk=self.user.pk)
+        with mock.patch('django.core.files.storage.FileSystemStorage.url',
+                        side_effect=lambda name: 'https://cdn.example.com/{}'.format(name)):
+            html = Template("{% load icons %}{% icon user 25 %}").render(Context({'user': user}))
+            self.assertIn('<img src="https://cdn.example.com/media/images/icon.25x25.png"', html)
+            self.assertEqual(icon_url(user, 200, 'webp'), 'https://cdn.example.com/media/images/default.png')
@@ -0,0 +1,91 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from articles.models import Article, ArticleNgram, Comment, Tag, TimelineEntry
+from common import counters
+from jobs.models import Job
+from jobs.queue import run_pending_jobs
+from ..models import Relation, UserPurge
+from ..purge import PURGE_STEPS, run_purge, start_purge
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False, USER_PURGE_BATCH_SIZE=2)
+class UserPurgeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.leaver = User.objects.create_user(username='purge_leaver', email='purge_leaver@test.com',
+                                              password='purge1234')
+        cls.others = [User.objects.create_user(username='purge_other{}'.format(i),
+                                               email='purge_other{}@test.com'.format(i),
+                                               password='purge1234')
+                      for i in range(3)]
+        tag = Tag.objects.create(tag='purge_tag')
+        other_article = Article.objects.create(author=cls.others[0], title='purge_other', content='purge_other')
+
+        for other in cls.others:
+            Relation.objects.create(follower=cls.leaver, followee=other)
+            Relation.objects.create(follower=other, followee=cls.leaver)
+        for i in range(5):
+            article = Article.objects.create(author=cls.leaver, title='purge_title{}'.format(i),
+                                             content='purge_content{}'.format(i))
+            article.tags.add(tag)
+            article.favorite_users.add(*cls.others)
+            Comment.objects.create(article=article, comment_author=cls.others[1], content='purge_comment')
+            Comment.objects.create(article=other_article, comment_author=cls.leaver, content='purge_comment')
+        other_article.favorite_users.add(cls.leaver)
+        counters.rebuild(*counters.get_models())
+
+    def assert_counters_consistent(self):
+        self.assertFalse(any(counters.verify(*counters.get_models()).values()))
+
+    # 退会によってユーザは無効になり,ジョブによって所有する行が全て削除され件数も更新される
+    def test_success_purge_from_view(self):
+        self.client.force_login(self.leaver)
+        response = self.client.post(reverse('settings:deleteuser'))
+        self.assertEqual(response.status_code, 302)
+        self.assertFalse(User.objects.get(pk=self.leaver.pk).is_active)
+        self.assertTrue(Job.objects.filter(task='authenticate.purge_user').exists())
+
+        run_pending_jobs()
+
+        self.assertFalse(User.objects.filter(pk=self.leaver.pk).exists())
+        self.assertFalse(Article.objects.filter(author_id=self.leaver.pk).exists())
+        self.assertFalse(Comment.objects.filter(comment_author_id=self.leaver.pk).exists())
+        self.assertFalse(ArticleNgram.objects.exclude(article__in=Article.objects.all()).exists())
+        self.assertEqual(Relation.objects.count(), 0)
+        self.assertFalse(TimelineEntry.objects.exists())
+        self.assert_counters_consistent()
+        for other in User.objects.filter(pk__in=[other.pk for other in self.others]):
+            self.assertEqual((other.follower_count, other.followee_count, other.favorite_count), (0, 0, 0))
+
+        purge = UserPurge.objects.get(user_id=self.leaver.pk)
+        self.assertIsNotNone(purge.finished_at)
+        # タイムラインの行はフォローの削除と共に取り除かれる
+        self.assertEqual(purge.deleted, {'followees': 3, 'followers': 3, 'favorites': 1, 'comments': 5,
+                                         'article_comments': 5, 'article_favorites': 15, 'timeline': 0,
+                                         'article_timeline': 0, 'articles': 5, 'user': 1})
+
+    # 各バッチは一定の行数のみを削除し,中断された場合も記録した段階から再開する
+    def test_success_resume_in_batches(self):
+        start_purge(User.objects.get(pk=self.leaver.pk))
+
+        # 時間が残っていない場合も1つのバッチのみを削除して戻る
+        self.assertFalse(run_purge(self.leaver.pk, time_budget=0))
+        purge = UserPurge.objects.get(user_id=self.leaver.pk)
+        self.assertEqual((purge.step, purge.deleted, purge.batches), ('followees', {'followees': 2}, 1))
+        self.assertEqual(Relation.objects.filter(follower=self.leaver).count(), 1)
+        # バッチごとに件数を更新するため,途中の状態でも件数は実際の行数と一致する
+        self.assert_counters_consistent()
+
+        finished = False
+        while not finished:
+            finished = run_purge(self.leaver.pk, time_budget=0)
+            self.assert_counters_consistent()
+        purge.refresh_from_db()
+        self.assertEqual(purge.step, PURGE_STEPS[-1][0])
+        self.assertFalse(User.objects.filter(pk=self.leaver.pk).exists())
+        # 完了した後に再び実行しても何も行わない
+        self.assertTrue(run_purge(self.leaver.pk))
@@ -0,0 +1,16 @@
+from django.apps import AppConfig
+
+
+class CommonConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'common'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from .connections import track_connection
+        from .signals import connect_signals
+        from .sqlite import apply_sqlite_profile
+        connect_signals()
+        connection_created.connect(track_connection, dispatch_uid='common_track_connection')
+        connection_created.connect(apply_sqlite_profile, dispatch_uid='common_apply_sqlite_profile')
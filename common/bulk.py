@@ -0,0 +1,97 @@
+import json
+
+from django.conf import settings
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.http import JsonResponse
+
+# 1回のリクエストで受け付ける対象の最大数
+DEFAULT_BULK_MAX_ITEMS = 100
+# 整数の対象(主キー)として受け付ける範囲,全てのモデルの主キーであるBigAutoFieldの範囲とする
+INTEGER_ITEM_RANGE = BaseDatabaseOperations.integer_field_ranges['BigAutoField']
+
+
+class InvalidBulkRequest(Exception):
+    pass
+
+
+def parse_bulk_request(body, actions, item_type):
+    """
+    {"<操作>": [対象, ...], ...} 形式のJSONを解析し,操作ごとに重複を取り除いた対象のリストを返す
+
+    Parameters
+    ----------
+    body : bytes
+        リクエストの本文
+    actions : tuple
+        受け付ける操作の名前
+    item_type : type
+        対象の型(ユーザ名の場合はstr,記事の主キーの場合はint)
+
+    Raises
+    ------
+    InvalidBulkRequest
+        JSONとして解釈出来ない場合,未知の操作・型の異なる対象・主キーの範囲を超える整数が含まれる場合,
+        複数の操作に同じ対象が含まれる場合,対象の数がBULK_MAX_ITEMSを超える場合に発生
+
+    Returns
+    -------
+    items : dict
+        操作の名前をキーとし,指定された順番を保った対象のリストを値とする辞書
+    """
+    try:
+        data = json.loads(body)
+    except (TypeError, ValueError):
+        raise InvalidBulkRequest('request body is not valid JSON')
+    if not isinstance(data, dict) or not set(data) <= set(actions):
+        raise InvalidBulkRequest('actions must be some of {}'.format(', '.join(actions)))
+
+    items = {}
+    seen = set()
+    for action in actions:
+        values = data.get(action, [])
+        # boolはintのサブクラスであるため,型の判定から除外する
+        if not isinstance(values, list) or any(type(value) is not item_type for value in values):
+            raise InvalidBulkRequest('{} must be a list of {}'.format(action, item_type.__name__))
+        # 範囲を超える整数は絞り込みの条件としてデータベースに渡す事が出来ない
+        min_value, max_value = INTEGER_ITEM_RANGE
+        if item_type is int and any(not min_value <= value <= max_value for value in values):
+            raise InvalidBulkRequest('{} must be between {} and {}'.format(action, min_value, max_value))
+        values = list(dict.fromkeys(values))
+        if seen.intersection(values):
+            raise InvalidBulkRequest('the same item is given to several actions')
+        seen.update(values)
+        items[action] = values
+
+    max_items = getattr(settings, 'BULK_MAX_ITEMS', DEFAULT_BULK_MAX_ITEMS)
+    if len(seen) > max_items:
+        raise InvalidBulkRequest('at most {} items are accepted'.format(max_items))
+    return items
+
+
+class BulkJsonMixin:
+    """
+    複数の対象に対する操作をJSONで受け取り,対象ごとの結果を1つのJSONで返すMixin
+
+    継承したViewはbulk_actions・bulk_item_typeを定義し,apply_bulk()で操作を適用する
+    """
+    bulk_actions = ()
+    bulk_item_type = str
+
+    def apply_bulk(self, items):
+        """
+        parse_bulk_request()が返す辞書を受け取り,{'item': 対象, 'status': 結果} のリストを返す
+        """
+        raise NotImplementedError
+
+    def post(self, request, *args, **kwargs):
+        try:
+            items = parse_bulk_request(request.body, self.bulk_actions, self.bulk_item_type)
+        except InvalidBulkRequest as e:
+            return JsonResponse({'error': str(e)}, status=400)
+
+        json_response = {
+            'data': {
+                'results': self.apply_bulk(items)
+            }
+        }
+        return JsonResponse(json_response)
@@ -0,0 +1,56 @@
+import hashlib
+
+from django.utils.cache import get_conditional_response
+
+from .page_cache import (get_tag_versions, has_pending_messages, replica_may_be_stale, user_favorites_tag,
+                         user_relations_tag)
+
+
+class ConditionalGetMixin:
+    """
+    ページの内容が依存するデータのタグのバージョンからETagを作成し,条件付きGETに304を返すMixin
+
+    ETagはテンプレートを描画する前にget_etag_tags()が返すタグのバージョンのみから計算するため,
+    If-None-Matchが一致する場合はクエリセットの評価やテンプレートの描画を行わずに応答する
+    認証ユーザの場合はユーザ自身のフォロー・お気に入りの変更や再ログインによってもETagが変わる
+    """
+
+    def get_etag_tags(self):
+        """
+        ページの内容が依存するデータを示すタグのリストを返す,Noneの場合はETagを付与しない
+        """
+        return None
+
+    def get_etag(self, request):
+        tags = self.get_etag_tags()
+        if tags is None:
+            return None
+
+        viewer_key = None
+        if request.user.is_authenticated:
+            tags = list(tags) + [user_relations_tag(request.user.pk), user_favorites_tag(request.user.pk)]
+            # ログインの度に更新されるCSRFトークンを含むページを再利用しない様に,セッションごとに区別する
+            viewer_key = (request.user.pk, request.session.session_key)
+        # レプリカが反映していない可能性のある内容に,更新後のバージョンのETagを付与しない
+        if replica_may_be_stale(tags):
+            return None
+
+        versions = sorted(get_tag_versions(tags).items())
+        digest = hashlib.sha1(repr((request.get_full_path(), viewer_key, versions)).encode('utf-8')).hexdigest()
+        # 同じバージョンでもCSRFトークンのマスク等によって内容は一致しないため,弱いETagとする
+        return 'W/"{}"'.format(digest)
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD') or has_pending_messages(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        etag = self.get_etag(request)
+        if etag is not None:
+            response = get_conditional_response(request, etag=etag)
+            if response is not None:
+                return response
+
+        response = super().dispatch(request, *args, **kwargs)
+        if etag is not None and response.status_code == 200 and not response.has_header('ETag'):
+            response['ETag'] = etag
+        return response
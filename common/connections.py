@@ -0,0 +1,168 @@
+import threading
+import time
+import weakref
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.http import HttpResponse
+
+# 接続の再利用・待機時間の計測値を保持するキャッシュのキーの接頭辞
+STATS_PREFIX = 'connections:stats'
+# created: 新しく接続した回数,reused: リクエストの開始時に前のリクエストの接続を持ち越した回数,
+# unusable: 疎通の確認に失敗して閉じた回数,overflow: 枠の数を超えたため閉じた回数,
+# acquired・wait_us・timeouts: 枠を確保した回数・待機したマイクロ秒の合計・待機を諦めた回数
+STATS_NAMES = ('created', 'reused', 'unusable', 'overflow', 'acquired', 'wait_us', 'timeouts')
+
+# 接続の枠が空くまで待機する秒数
+DEFAULT_DATABASE_POOL_TIMEOUT = 10
+
+_lock = threading.Lock()
+# 接続したデータベースのラッパ(スレッドごと),スレッドの終了と共に取り除かれる
+_wrappers = weakref.WeakSet()
+_pools = {}
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+def record(name, amount=1):
+    key = '{}:{}'.format(STATS_PREFIX, name)
+    try:
+        cache.incr(key, amount)
+    except ValueError:
+        cache.add(key, amount, None)
+
+
+def get_stats():
+    """
+    接続の作成・再利用の回数と再利用率,枠を確保するまでの平均待機時間を返す
+    """
+    values = cache.get_many(['{}:{}'.format(STATS_PREFIX, name) for name in STATS_NAMES])
+    stats = {name: values.get('{}:{}'.format(STATS_PREFIX, name), 0) for name in STATS_NAMES}
+    total = stats['created'] + stats['reused']
+    stats['reuse_ratio'] = stats['reused'] / total if total else 0.0
+    stats['average_wait_ms'] = stats['wait_us'] / stats['acquired'] / 1000 if stats['acquired'] else 0.0
+    return stats
+
+
+def reset_stats():
+    cache.delete_many(['{}:{}'.format(STATS_PREFIX, name) for name in STATS_NAMES])
+
+
+def track_connection(sender, connection, **kwargs):
+    # connection_createdの受信側,枠を超えた接続を数えるために接続したラッパを保持する
+    record('created')
+    with _lock:
+        _wrappers.add(connection)
+
+
+def count_open_connections(alias):
+    with _lock:
+        return sum(1 for wrapper in _wrappers if wrapper.alias == alias and wrapper.connection is not None)
+
+
+def check_connections():
+    """
+    前のリクエストから持ち越した永続的な接続(CONN_MAX_AGE)を数え,CONN_HEALTH_CHECKSがTrueの場合は疎通を確認する
+
+    データベースの再起動等によって切断されていた接続は閉じ,最初のクエリの実行時に接続し直す
+    """
+    health_checks = getattr(settings, 'CONN_HEALTH_CHECKS', False)
+    for connection in connections.all():
+        if connection.connection is None:
+            continue
+        if health_checks and not connection.in_atomic_block and not connection.is_usable():
+            connection.close()
+            record('unusable')
+            continue
+        record('reused')
+
+
+class ConnectionPool:
+    """
+    スレッドで並行してリクエストを処理するワーカで,1つのプロセスが保持するデータベースへの接続の数を制限する
+
+    Djangoの接続はスレッドごとに保持されるため,リクエストの間だけsize個の枠のいずれかを確保し,
+    枠の数を超えて接続が開いている場合はリクエストの終了時にそのスレッドの接続を閉じる
+    枠が空くまでtimeout秒待機し,空かない場合はPoolTimeoutを発生させる
+
+    Parameters
+    ----------
+    size : int
+        1つのプロセスがデータベース(エイリアス)ごとに保持する接続の最大数
+    timeout : float
+        枠が空くまで待機する秒数
+    """
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.slots = threading.BoundedSemaphore(size)
+
+    def acquire(self):
+        started = time.monotonic()
+        if not self.slots.acquire(timeout=self.timeout):
+            record('timeouts')
+            raise PoolTimeout('no database connection slot was released in {} seconds'.format(self.timeout))
+        record('acquired')
+        record('wait_us', int((time.monotonic() - started) * 1000000))
+
+    def release(self):
+        try:
+            for connection in connections.all():
+                if connection.connection is not None and count_open_connections(connection.alias) > self.size:
+                    connection.close()
+                    record('overflow')
+        finally:
+            self.slots.release()
+
+
+def get_pool():
+    """
+    設定値DATABASE_POOL_SIZEに応じたConnectionPoolを返す
+
+    Returns
+    -------
+    pool : ConnectionPool
+        DATABASE_POOL_SIZEが設定されていない場合はNone
+    """
+    size = getattr(settings, 'DATABASE_POOL_SIZE', None)
+    if not size:
+        return None
+    timeout = getattr(settings, 'DATABASE_POOL_TIMEOUT', DEFAULT_DATABASE_POOL_TIMEOUT)
+    with _lock:
+        pool = _pools.get((size, timeout))
+        if pool is None:
+            pool = _pools[(size, timeout)] = ConnectionPool(size, timeout)
+        return pool
+
+
+class ConnectionPoolMiddleware:
+    """
+    リクエストの間だけ接続の枠を確保し,持ち越した接続の疎通を確認するミドルウェア
+
+    データベースを利用する他のミドルウェア(SessionMiddleware等)より前に置く
+    枠が空かない場合は503を返す
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        pool = get_pool()
+        if pool is None:
+            check_connections()
+            return self.get_response(request)
+
+        try:
+            pool.acquire()
+        except PoolTimeout:
+            return HttpResponse('データベースへの接続が混み合っています', status=503)
+        try:
+            # 枠を待つ間に切断される場合があるため,枠を確保してから確認する
+            check_connections()
+            return self.get_response(request)
+        finally:
+            pool.release()
@@ -0,0 +1,221 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, When
+from django.db.models.functions import Coalesce, Greatest
+
+from articles.shards import get_shard_aliases, group_by_shard, shard_for_article, sharding_enabled, using_shard
+
+# ユーザ・記事に保持している件数のカラム
+USER_COUNTERS = ('follower_count', 'followee_count', 'article_count', 'favorite_count')
+ARTICLE_COUNTERS = ('favorite_count', 'comment_count')
+
+
+def update_fields_without_counters(instance, counter_fields, update_fields=None, force_insert=False, **kwargs):
+    """
+    既存の行を保存する際に,件数のカラム以外の全てのカラムを更新対象とするupdate_fieldsを返す
+
+    読み込んでいない(deferした)カラムは変更されていないため,更新対象に含めない
+    新しく作成する行の場合や,update_fieldsが指定されている場合はそのままの値を返す
+    """
+    if update_fields is not None or force_insert or instance._state.adding:
+        return update_fields
+    deferred_fields = instance.get_deferred_fields()
+    return [field.name for field in instance._meta.concrete_fields
+            if not field.primary_key and field.name not in counter_fields and field.attname not in deferred_fields]
+
+
+def get_models():
+    from django.contrib.auth import get_user_model
+
+    from articles.models import Article, Comment
+    from authenticate.models import Relation
+
+    return get_user_model(), Article, Comment, Relation
+
+
+def shifted(field, delta):
+    """
+    カラムfieldの値をdeltaだけ増減させる式を返す
+
+    管理画面等から直接変更された行の件数が負の値にならない様に,減らす場合は0を下限とする
+    """
+    if delta < 0:
+        # 符号無し整数のカラムでも途中の値が負にならない様に,先に下限を揃えてから減らす
+        return Greatest(F(field), -delta) + delta
+    return F(field) + delta
+
+
+def add(queryset, field, delta):
+    """
+    クエリセットに含まれる行のカラムfieldをF式によってdeltaだけ増減させる
+
+    読み込んだ値を書き戻さずにデータベース上で加算するため,同時に更新されても値が失われない
+    """
+    if delta:
+        queryset.update(**{field: shifted(field, delta)})
+
+
+def add_grouped(model, field, counts, using=None):
+    """
+    {主キー: 減らす件数} の辞書に従って,同じ件数ごとにまとめてカラムfieldの値を減らす
+
+    usingには記事を保存しているデータベースのエイリアスを指定する(Noneの場合はルータに任せる)
+    """
+    pks_by_count = defaultdict(list)
+    for pk, count in counts:
+        pks_by_count[count].append(pk)
+    for count, pks in pks_by_count.items():
+        add(using_shard(model.objects.filter(pk__in=pks), using), field, -count)
+
+
+def followed(follower_id, followee_id, delta):
+    followed_many(follower_id, [followee_id], delta)
+
+
+def followed_many(follower_id, followee_ids, delta):
+    """
+    フォローする側のフォロー数と,フォローされる各ユーザのフォロワー数を1つのUPDATE文で増減させる
+    """
+    followee_ids = list(followee_ids)
+    if not delta or not followee_ids:
+        return
+    User, _, _, _ = get_models()
+    User.objects.filter(pk__in=[follower_id, *followee_ids]).update(
+        followee_count=Case(When(pk=follower_id, then=shifted('followee_count', delta * len(followee_ids))),
+                            default=F('followee_count')),
+        follower_count=Case(When(pk__in=followee_ids, then=shifted('follower_count', delta)),
+                            default=F('follower_count')))
+
+
+def favorited(user_id, article_id, delta):
+    favorited_many(user_id, [article_id], delta)
+
+
+def favorited_many(user_id, article_ids, delta):
+    # ユーザのお気に入り数と,お気に入りに追加・削除した各記事のお気に入り数を増減させる
+    article_ids = list(article_ids)
+    if not article_ids:
+        return
+    User, Article, _, _ = get_models()
+    add(User.objects.filter(pk=user_id), 'favorite_count', delta * len(article_ids))
+    # 記事を分散して保存している場合は,保存先ごとにまとめて更新する
+    for alias, pks in group_by_shard(article_ids, shard_for_article).items():
+        add(using_shard(Article.objects.filter(pk__in=pks), alias), 'favorite_count', delta)
+
+
+def commented(article_id, delta):
+    _, Article, _, _ = get_models()
+    add(using_shard(Article.objects.filter(pk=article_id), shard_for_article(article_id)), 'comment_count', delta)
+
+
+def posted(author_id, delta):
+    User, _, _, _ = get_models()
+    add(User.objects.filter(pk=author_id), 'article_count', delta)
+
+
+def before_article_delete(article):
+    """
+    記事を削除する前に,投稿者の記事数とお気に入りに追加していたユーザのお気に入り数を減らす
+    """
+    User, Article, _, _ = get_models()
+    posted(article.author_id, -1)
+    favorite_users = Article.favorite_users.through.objects.filter(article_id=article.pk).values('user_id')
+    # 中間テーブルが記事の保存先にある場合は,ユーザの主キーを先に取得する
+    if sharding_enabled():
+        favorite_users = list(favorite_users.using(article._state.db).values_list('user_id', flat=True))
+    add(User.objects.filter(pk__in=favorite_users), 'favorite_count', -1)
+
+
+def count_subquery(queryset, group_field):
+    return Coalesce(Subquery(queryset.order_by().values(group_field)
+                             .annotate(count=Count('pk')).values('count')), 0)
+
+
+def actual_counts(User, Article, Comment, Relation):
+    """
+    各カラムに保持するべき件数を計算するためのサブクエリを返す
+    """
+    favorite_through = Article.favorite_users.through
+    user_counts = {
+        'follower_count': count_subquery(Relation.objects.filter(followee=OuterRef('pk')), 'followee'),
+        'followee_count': count_subquery(Relation.objects.filter(follower=OuterRef('pk')), 'follower'),
+        'article_count': count_subquery(Article.objects.filter(author=OuterRef('pk')), 'author'),
+        'favorite_count': count_subquery(favorite_through.objects.filter(user=OuterRef('pk')), 'user'),
+    }
+    article_counts = {
+        'favorite_count': count_subquery(favorite_through.objects.filter(article=OuterRef('pk')), 'article'),
+        'comment_count': count_subquery(Comment.objects.filter(article=OuterRef('pk')), 'article'),
+    }
+    return user_counts, article_counts
+
+
+def sharded_user_counts(Article):
+    """
+    記事を分散して保存している場合に,保存先の行から数えるユーザの件数を全ての保存先で合計して返す
+
+    記事とお気に入りの中間テーブルはユーザと異なるデータベースにあるため,サブクエリでは数えられない
+
+    Returns
+    -------
+    counts : dict
+        {カラム名: {ユーザの主キー: 件数}}
+    """
+    favorite_through = Article.favorite_users.through
+    counts = {'article_count': Counter(), 'favorite_count': Counter()}
+    for alias in get_shard_aliases():
+        for field, queryset, group_field in (('article_count', Article.objects, 'author_id'),
+                                             ('favorite_count', favorite_through.objects, 'user_id')):
+            counts[field].update(dict(queryset.using(alias).order_by().values_list(group_field)
+                                      .annotate(count=Count('pk'))))
+    return counts
+
+
+def rebuild(User, Article, Comment, Relation, using='default'):
+    """
+    全てのユーザ・記事の件数を実際の行数から再計算する
+
+    記事を分散して保存している場合は,記事の件数を各保存先で,ユーザの記事数・お気に入り数を全ての保存先の合計から再計算する
+    """
+    user_counts, article_counts = actual_counts(User, Article, Comment, Relation)
+    if not sharding_enabled():
+        User.objects.using(using).update(**user_counts)
+        Article.objects.using(using).update(**article_counts)
+        return
+
+    # コメント・お気に入りは記事と同じ保存先にあるため,記事の件数はサブクエリのまま各保存先で更新する
+    for alias in get_shard_aliases():
+        Article.objects.using(alias).update(**article_counts)
+    sharded_counts = sharded_user_counts(Article)
+    with transaction.atomic(using=using):
+        User.objects.using(using).update(**{field: expression for field, expression in user_counts.items()
+                                            if field not in sharded_counts},
+                                         **{field: 0 for field in sharded_counts})
+        for field, counts in sharded_counts.items():
+            pks_by_count = defaultdict(list)
+            for pk, count in counts.items():
+                pks_by_count[count].append(pk)
+            for count, pks in pks_by_count.items():
+                User.objects.using(using).filter(pk__in=pks).update(**{field: count})
+
+
+def verify(User, Article, Comment, Relation, using='default'):
+    """
+    保持している件数が実際の行数と異なるユーザ・記事の数をカラムごとに返す
+    """
+    user_counts, article_counts = actual_counts(User, Article, Comment, Relation)
+    sharded_counts = sharded_user_counts(Article) if sharding_enabled() else {}
+    mismatches = {}
+    for model, counts, aliases in ((User, user_counts, [using]),
+                                   (Article, article_counts, get_shard_aliases() or [using])):
+        for field, expression in counts.items():
+            label = '{}.{}'.format(model._meta.label, field)
+            if model is User and field in sharded_counts:
+                # 保存先の合計と比較するため,全てのユーザの件数を読み込む
+                mismatches[label] = len([pk for pk, stored in User.objects.using(using).values_list('pk', field)
+                                         .iterator() if stored != sharded_counts[field].get(pk, 0)])
+                continue
+            actual_field = 'actual_{}'.format(field)
+            mismatches[label] = sum(model.objects.using(alias).annotate(**{actual_field: expression})
+                                    .exclude(**{field: F(actual_field)}).count() for alias in aliases)
+    return mismatches
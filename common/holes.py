@@ -0,0 +1,109 @@
+import base64
+import json
+import re
+from collections import defaultdict
+
+from django.middleware.csrf import get_token
+from django.utils.html import format_html
+
+# シェルの中で穴の位置を示すマーカー,引数はJSONをbase64で符号化して埋め込む
+HOLE_MARKER = '<!--hole:{name}:{payload}-->'
+HOLE_PATTERN = re.compile(r'<!--hole:(?P<name>[\w.]+):(?P<payload>[\w=-]*)-->')
+
+_holes = {}
+
+
+class Hole:
+    """
+    閲覧しているユーザごとに描画するページの一部分(穴)
+
+    Parameters
+    ----------
+    render : callable
+        render(request, *args) の形式で呼び出され,穴を埋めるHTMLを返す関数
+    prime : callable
+        prime(request, args_list) の形式で,同じ種類の全ての穴を埋める前に1度だけ呼び出される関数
+        穴ごとにクエリを実行しない様に,必要なデータをまとめて取得するために利用する
+    """
+
+    def __init__(self, render, prime=None):
+        self.render = render
+        self.prime = prime
+
+
+def register_hole(name, prime=None):
+    """
+    穴を描画する関数を名前と共に登録するデコレータ
+    """
+    def decorator(render):
+        _holes[name] = Hole(render, prime)
+        return render
+    return decorator
+
+
+def get_hole(name):
+    try:
+        return _holes[name]
+    except KeyError:
+        raise KeyError('hole {} is not registered'.format(name))
+
+
+def hole_marker(name, args):
+    payload = json.dumps(list(args), separators=(',', ':'))
+    return HOLE_MARKER.format(name=name,
+                              payload=base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii'))
+
+
+def render_hole(request, name, args):
+    """
+    穴を1つだけ直接描画する,シェルを利用しない通常の描画で利用する
+    """
+    hole = get_hole(name)
+    if hole.prime is not None:
+        hole.prime(request, [args])
+    return hole.render(request, *args)
+
+
+def fill_holes(shell, request):
+    """
+    シェルに含まれる全ての穴を閲覧しているユーザに応じたHTMLで置き換える
+
+    同じ種類の穴はprimeによってまとめてデータを取得してから描画するため,
+    クエリの回数は穴の数ではなく穴の種類の数に比例する
+
+    Parameters
+    ----------
+    shell : str
+        hole_marker()によって作成したマーカーを含むHTML
+    request : HttpRequest
+        閲覧しているユーザのリクエスト
+
+    Returns
+    -------
+    content : str
+        全ての穴を埋めたHTML
+    """
+    matches = list(HOLE_PATTERN.finditer(shell))
+    if not matches:
+        return shell
+
+    args_by_name = defaultdict(list)
+    for match in matches:
+        args = json.loads(base64.urlsafe_b64decode(match.group('payload')).decode('utf-8'))
+        args_by_name[match.group('name')].append(args)
+
+    for name, args_list in args_by_name.items():
+        hole = get_hole(name)
+        if hole.prime is not None:
+            hole.prime(request, args_list)
+
+    def replace(match):
+        args = json.loads(base64.urlsafe_b64decode(match.group('payload')).decode('utf-8'))
+        return str(get_hole(match.group('name')).render(request, *args))
+
+    return HOLE_PATTERN.sub(replace, shell)
+
+
+@register_hole('csrf_token')
+def csrf_token(request):
+    return format_html('<input type="hidden" name="csrfmiddlewaretoken" value="{}">', get_token(request))
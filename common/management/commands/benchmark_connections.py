@@ -0,0 +1,65 @@
+import time
+
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django.test import RequestFactory
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from common.connections import get_stats
+
+
+class Command(BaseCommand):
+    help = 'リクエストごとに接続し直す場合と,永続的な接続を再利用する場合の1リクエストあたりの処理時間を比較する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--path', default=None,
+                            help='リクエストするパス,指定しない場合は記事一覧')
+        parser.add_argument('--requests', type=int, default=200,
+                            help='1つの条件につきリクエストする回数')
+        parser.add_argument('--max-ages', nargs='+', type=int, default=[0, 60],
+                            help='計測を行うCONN_MAX_AGEの値,0はリクエストごとに接続し直す')
+
+    def handle(self, *args, **options):
+        path = options['path'] or reverse('articles:articles')
+        handler = WSGIHandler()
+        original_max_ages = {alias: connections[alias].settings_dict['CONN_MAX_AGE'] for alias in connections}
+
+        # キャッシュしたページを返すとデータベースに接続しないため,ページのキャッシュを無効にする
+        results = {}
+        with override_settings(PAGE_CACHE_ENABLED=False, ALLOWED_HOSTS=['*']):
+            try:
+                for max_age in options['max_ages']:
+                    self.set_max_age(max_age)
+                    # 最初のリクエストはテンプレートの読み込み等を含むため計測しない
+                    self.request(handler, path)
+                    created = get_stats()['created']
+                    started = time.perf_counter()
+                    for _ in range(options['requests']):
+                        self.request(handler, path)
+                    results[max_age] = (time.perf_counter() - started) / options['requests']
+                    self.stdout.write('CONN_MAX_AGE {:>5}: {:8.3f}ms/request, {} connections'.format(
+                        max_age, results[max_age] * 1000, get_stats()['created'] - created))
+            finally:
+                for alias, max_age in original_max_ages.items():
+                    connections[alias].settings_dict['CONN_MAX_AGE'] = max_age
+                    connections[alias].close()
+
+        baseline = results[options['max_ages'][0]]
+        for max_age, elapsed in results.items():
+            self.stdout.write('CONN_MAX_AGE {:>5}: {:+8.3f}ms/request ({:+.1%})'.format(
+                max_age, (elapsed - baseline) * 1000, (elapsed - baseline) / baseline if baseline else 0.0))
+
+    def set_max_age(self, max_age):
+        # 接続ごとの期限は接続時に設定値から求めるため,設定を変えてから接続し直す
+        for alias in connections:
+            connections[alias].settings_dict['CONN_MAX_AGE'] = max_age
+            connections[alias].close()
+
+    def request(self, handler, path):
+        # WSGIサーバと同様にrequest_started・request_finishedを送信し,リクエストの終了時に期限切れの接続を閉じる
+        environ = RequestFactory().get(path).environ
+        response = handler(environ, lambda status, headers: None)
+        response.close()
+        return response.status_code
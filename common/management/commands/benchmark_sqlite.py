@@ -0,0 +1,135 @@
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import OperationalError, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.urls import reverse
+
+from articles.models import Article
+from articles.shards import sharding_enabled
+from common.sqlite import SQLITE_PROFILES
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    help = ('SQLiteのデータベースの複製に対して,複数のスレッドから同時にお気に入り・フォローを切り替え,'
+            'PRAGMAの組(SQLITE_PROFILE)ごとの処理量とロックによる失敗の数を比較する')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8,
+                            help='同時に書き込むスレッドの数')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='1つのスレッドがリクエストする回数')
+        parser.add_argument('--profiles', nargs='+', choices=list(SQLITE_PROFILES), default=list(SQLITE_PROFILES),
+                            help='計測を行うPRAGMAの組')
+
+    def handle(self, *args, **options):
+        database = connections.settings['default']
+        if database['ENGINE'] != 'django.db.backends.sqlite3':
+            raise CommandError('defaultのデータベースがSQLiteではありません')
+        if sharding_enabled():
+            raise CommandError('記事を分散して保存している場合(ARTICLE_SHARDS)は計測できません')
+
+        original_name = database['NAME']
+        # fsyncの速度を揃えるため,元のデータベースと同じディレクトリに複製する
+        directory = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(original_name)))
+        # キャッシュしたページ・レプリカ・ログイン試行の記録を介さずに,書き込みのみを計測する
+        try:
+            with override_settings(PAGE_CACHE_ENABLED=False, DATABASE_REPLICAS=[], AXES_ENABLED=False,
+                                   ALLOWED_HOSTS=['*']):
+                for profile in options['profiles']:
+                    # 先行書き込みログ(WAL)はファイルに記録されるため,PRAGMAの組ごとに元のデータベースを複製し直す
+                    database['NAME'] = os.path.join(directory, '{}.sqlite3'.format(profile))
+                    self.copy_database(original_name, database['NAME'])
+                    connections['default'].close()
+                    with override_settings(SQLITE_PROFILE=profile):
+                        self.run_profile(profile, options['writers'], options['requests'])
+        finally:
+            connections['default'].close()
+            database['NAME'] = original_name
+            shutil.rmtree(directory)
+
+    def copy_database(self, source, destination):
+        # 元のデータベースが先行書き込みログを利用している場合でも,ログの内容を含めて複製する
+        source_connection = sqlite3.connect(str(source))
+        destination_connection = sqlite3.connect(destination)
+        try:
+            source_connection.backup(destination_connection)
+        finally:
+            source_connection.close()
+            destination_connection.close()
+
+    def run_profile(self, profile, writers, requests):
+        # 書き込むユーザと,全員がお気に入り・フォローを切り替える記事と投稿者を複製したデータベースに作成する
+        author = User.objects.create_user(username='bench_sqlite_author', email='bench_sqlite_author@example.com')
+        article = Article.objects.create(author=author, title='bench_sqlite', content='bench_sqlite')
+        users = [User.objects.create_user(username='bench_sqlite{}'.format(i),
+                                          email='bench_sqlite{}@example.com'.format(i))
+                 for i in range(writers)]
+        connections['default'].close()
+
+        barrier = threading.Barrier(writers + 1)
+        results = [None] * writers
+        threads = [threading.Thread(target=self.write, args=(user, article, author, requests, barrier, results, i))
+                   for i, user in enumerate(users)]
+        for thread in threads:
+            thread.start()
+        # 全てのスレッドがログインを終えてから同時に書き込みを始める
+        barrier.wait()
+        started = time.perf_counter()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        measured = [result for thread_results in results for result in thread_results]
+        latencies = sorted(latency for latency, _ in measured)
+        errors = [error for _, error in measured if error is not None]
+        locked = len([error for error in errors if 'locked' in error])
+        self.stdout.write('{:>12}: {:8.1f} requests/s, p50 {:7.2f}ms, p95 {:7.2f}ms, {} errors ({} locked)'.format(
+            profile, len(latencies) / elapsed, self.percentile(latencies, 0.5) * 1000,
+            self.percentile(latencies, 0.95) * 1000, len(errors), locked))
+
+    def write(self, user, article, author, requests, barrier, results, index):
+        client = Client()
+        favorite_url = reverse('articles:favorite', kwargs={'pk': article.pk})
+        follow_url = reverse('users:follow', kwargs={'username': author.username})
+        thread_results = []
+        try:
+            try:
+                client.force_login(user)
+            except BaseException:
+                # ログインに失敗した場合は,他のスレッドを待機させたままにしない
+                barrier.abort()
+                raise
+            barrier.wait()
+            for i in range(requests):
+                # お気に入りとフォローを交互に切り替える
+                if i % 2 == 0:
+                    url, data = favorite_url, {'username': user.username}
+                else:
+                    url, data = follow_url, {'follower': user.username}
+                started = time.perf_counter()
+                error = None
+                try:
+                    response = client.post(url, data, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+                    if response.status_code != 200:
+                        error = 'status {}'.format(response.status_code)
+                except OperationalError as e:
+                    error = str(e)
+                thread_results.append((time.perf_counter() - started, error))
+        finally:
+            results[index] = thread_results
+            connections.close_all()
+
+    def percentile(self, values, ratio):
+        if not values:
+            return 0.0
+        return values[min(len(values) - 1, int(len(values) * ratio))]
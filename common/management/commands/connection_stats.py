@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from common import connections
+
+
+class Command(BaseCommand):
+    help = 'データベースへの接続の作成数・再利用数と,接続の枠を確保するまでの待機時間を表示する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='表示した後に計測値を0に戻す')
+
+    def handle(self, *args, **options):
+        stats = connections.get_stats()
+        self.stdout.write('created: {}'.format(stats['created']))
+        self.stdout.write('reused: {}'.format(stats['reused']))
+        self.stdout.write('reuse ratio: {:.1%}'.format(stats['reuse_ratio']))
+        self.stdout.write('closed unusable: {}'.format(stats['unusable']))
+        self.stdout.write('closed overflow: {}'.format(stats['overflow']))
+        self.stdout.write('pool acquired: {}'.format(stats['acquired']))
+        self.stdout.write('pool average wait: {:.3f}ms'.format(stats['average_wait_ms']))
+        self.stdout.write('pool timeouts: {}'.format(stats['timeouts']))
+
+        if options['reset']:
+            connections.reset_stats()
+            self.stdout.write(self.style.SUCCESS('計測値を0に戻しました'))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from common import page_cache
+
+
+class Command(BaseCommand):
+    help = 'ページ・シェルのキャッシュのヒット数・ミス数を表示する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--reset', action='store_true',
+                            help='表示した後にヒット数・ミス数を0に戻す')
+
+    def handle(self, *args, **options):
+        stats = page_cache.get_stats()
+        self.stdout.write('hit: {}'.format(stats['hit']))
+        self.stdout.write('miss: {}'.format(stats['miss']))
+        self.stdout.write('hit ratio: {:.1%}'.format(stats['hit_ratio']))
+        self.stdout.write('shell hit: {}'.format(stats['shell_hit']))
+        self.stdout.write('shell miss: {}'.format(stats['shell_miss']))
+
+        if options['reset']:
+            page_cache.reset_stats()
+            self.stdout.write(self.style.SUCCESS('ヒット数・ミス数を0に戻しました'))
@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from common import counters
+
+
+class Command(BaseCommand):
+    help = 'フォロー数・フォロワー数・記事数・お気に入り数・コメント数を実際の行数から再計算する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--verify', action='store_true',
+                            help='再計算は行わず,実際の行数と異なる件数を持つ行の数を表示する')
+
+    def handle(self, *args, **options):
+        models = counters.get_models()
+
+        if not options['verify']:
+            counters.rebuild(*models)
+            self.stdout.write(self.style.SUCCESS('件数を再計算しました'))
+            return
+
+        mismatches = counters.verify(*models)
+        for field, count in mismatches.items():
+            self.stdout.write('{}: {}'.format(field, count))
+        if any(mismatches.values()):
+            raise CommandError('実際の行数と異なる件数が存在します')
+        self.stdout.write(self.style.SUCCESS('全ての件数が実際の行数と一致しています'))
@@ -0,0 +1,289 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.contrib.messages import get_messages
+from django.core.cache import caches
+from django.db import transaction
+from django.http import HttpResponse
+
+from .holes import fill_holes
+from .replicas import get_replica_aliases, get_replica_pin_seconds, replicas_enabled
+
+# キャッシュに利用するキーの接頭辞
+PAGE_CACHE_PREFIX = 'page_cache:page'
+SHELL_CACHE_PREFIX = 'page_cache:shell'
+TAG_VERSION_PREFIX = 'page_cache:tag'
+TAG_BUMPED_PREFIX = 'page_cache:bumped'
+STATS_PREFIX = 'page_cache:stats'
+STATS_NAMES = ('hit', 'miss', 'shell_hit', 'shell_miss')
+
+# 複数のページが参照するデータに対するタグ
+ARTICLES_TAG = 'articles'
+TAGS_TAG = 'tags'
+USERS_TAG = 'users'
+
+
+def article_tag(article_id):
+    return 'article:{}'.format(article_id)
+
+
+def user_tag(user_id):
+    return 'user:{}'.format(user_id)
+
+
+def user_relations_tag(user_id):
+    return 'user_relations:{}'.format(user_id)
+
+
+def user_articles_tag(user_id):
+    return 'user_articles:{}'.format(user_id)
+
+
+def user_favorites_tag(user_id):
+    return 'user_favorites:{}'.format(user_id)
+
+
+def get_page_cache():
+    return caches[getattr(settings, 'PAGE_CACHE_ALIAS', 'default')]
+
+
+def tag_version_key(tag):
+    return '{}:{}'.format(TAG_VERSION_PREFIX, tag)
+
+
+def tag_bumped_key(tag):
+    return '{}:{}'.format(TAG_BUMPED_PREFIX, tag)
+
+
+def new_version():
+    # キャッシュから追い出された後に作り直されたバージョンが,以前のバージョンと一致しない様にする
+    return time.time_ns()
+
+
+def get_tag_versions(tags):
+    """
+    タグごとの現在のバージョンを返す,バージョンが存在しないタグは新しく作成する
+    """
+    cache = get_page_cache()
+    keys = {tag_version_key(tag): tag for tag in tags}
+    versions = cache.get_many(keys)
+    for key in keys.keys() - versions.keys():
+        cache.add(key, new_version(), None)
+        versions[key] = cache.get(key)
+    return {tag: versions[key] for key, tag in keys.items()}
+
+
+def bump_tags(tags):
+    cache = get_page_cache()
+    for tag in tags:
+        key = tag_version_key(tag)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, new_version(), None)
+    # レプリカが更新を反映するまでの間(REPLICA_PIN_SECONDS)は,タグを更新した事を記録する
+    if get_replica_aliases():
+        cache.set_many({tag_bumped_key(tag): True for tag in tags}, get_replica_pin_seconds())
+
+
+def replica_may_be_stale(tags):
+    """
+    レプリカから読み込むリクエストで,いずれかのタグがREPLICA_PIN_SECONDS以内に更新されている場合にTrueを返す
+
+    レプリカが更新を反映する前の内容を更新後のタグのバージョンと共に保存しない様に,
+    この間はページのキャッシュとETagを作成しない(レプリカの遅延がREPLICA_PIN_SECONDSより短い事を前提とする)
+    """
+    if not replicas_enabled() or not get_replica_aliases():
+        return False
+    return bool(get_page_cache().get_many([tag_bumped_key(tag) for tag in tags]))
+
+
+def invalidate_tags(*tags):
+    """
+    タグを付与されたキャッシュ済みのページを無効にする
+
+    トランザクションの中で呼び出された場合,コミットされるまでの間に他のリクエストが
+    変更前のデータでページをキャッシュする可能性があるため,コミット後にもう一度無効にする
+    """
+    tags = set(tags)
+    bump_tags(tags)
+    transaction.on_commit(lambda: bump_tags(tags))
+
+
+def record(name):
+    cache = get_page_cache()
+    key = '{}:{}'.format(STATS_PREFIX, name)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+def get_stats():
+    """
+    キャッシュのヒット数・ミス数とヒット率を返す
+    """
+    values = get_page_cache().get_many(['{}:{}'.format(STATS_PREFIX, name) for name in STATS_NAMES])
+    stats = {name: values.get('{}:{}'.format(STATS_PREFIX, name), 0) for name in STATS_NAMES}
+    total = stats['hit'] + stats['miss']
+    stats['hit_ratio'] = stats['hit'] / total if total else 0.0
+    return stats
+
+
+def reset_stats():
+    get_page_cache().delete_many(['{}:{}'.format(STATS_PREFIX, name) for name in STATS_NAMES])
+
+
+def page_cache_key(request, prefix=PAGE_CACHE_PREFIX):
+    digest = hashlib.sha1(request.build_absolute_uri().encode('utf-8')).hexdigest()
+    return '{}:{}'.format(prefix, digest)
+
+
+def get_cached_entry(key):
+    """
+    キャッシュしたページを返す,キャッシュした後にいずれかのタグのバージョンが更新されている場合はNoneを返す
+    """
+    cache = get_page_cache()
+    entry = cache.get(key)
+    if entry is None:
+        return None
+
+    versions = cache.get_many([tag_version_key(tag) for tag in entry['tags']])
+    for tag, version in entry['tags'].items():
+        if versions.get(tag_version_key(tag)) != version:
+            return None
+    return entry
+
+
+def set_cached_entry(key, content, content_type, tags, timeout):
+    if replica_may_be_stale(tags):
+        return
+    entry = {
+        'content': content,
+        'content_type': content_type,
+        'tags': get_tag_versions(tags),
+    }
+    get_page_cache().set(key, entry, timeout)
+
+
+def has_pending_messages(request):
+    # 表示するメッセージが残っている場合はそのユーザにのみ表示するページとなる
+    return len(get_messages(request)) > 0
+
+
+class AnonymousPageCacheMixin:
+    """
+    認証されていないユーザに対するページをURL(パスとクエリ文字列)ごとにキャッシュするMixin
+
+    ページはget_page_cache_tags()が返すタグと,キャッシュした時点での各タグのバージョンと共に保存される
+    モデルの変更時にタグのバージョンが更新される事で,そのタグを持つページのみが無効になる
+    ローカルメモリ・ファイル・データベースのいずれのキャッシュバックエンドでも動作する
+    """
+    page_cache_timeout = None
+
+    def get_page_cache_tags(self, context):
+        """
+        ページの内容が依存するデータを示すタグのリストを返す
+
+        Parameters
+        ----------
+        context : dict
+            ページの描画に利用したコンテキスト
+        """
+        return []
+
+    def is_page_cacheable(self, request):
+        if not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+            return False
+        if request.method not in ('GET', 'HEAD') or request.user.is_authenticated:
+            return False
+        return not has_pending_messages(request)
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_page_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(request)
+        response = self.get_cached_response(key)
+        if response is not None:
+            record('hit')
+            return response
+
+        record('miss')
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code == 200 and hasattr(response, 'render'):
+            response.render()
+            # CSRFトークンを含むページはユーザごとに異なるため共有しない
+            if not request.META.get('CSRF_COOKIE_USED'):
+                self.set_cached_response(key, response)
+            response['X-Page-Cache'] = 'MISS'
+        return response
+
+    def get_page_cache_timeout(self):
+        return self.page_cache_timeout or getattr(settings, 'PAGE_CACHE_TIMEOUT', 600)
+
+    def get_cached_response(self, key):
+        entry = get_cached_entry(key)
+        if entry is None:
+            return None
+
+        response = HttpResponse(entry['content'], content_type=entry['content_type'])
+        response['X-Page-Cache'] = 'HIT'
+        return response
+
+    def set_cached_response(self, key, response):
+        set_cached_entry(key, response.content, response['Content-Type'],
+                         self.get_page_cache_tags(response.context_data), self.get_page_cache_timeout())
+
+
+class HolePunchedPageCacheMixin(AnonymousPageCacheMixin):
+    """
+    認証されているユーザに対しても,ユーザごとに異なる部分を除いたページをキャッシュするMixin
+
+    テンプレートのユーザごとに異なる部分を {% hole %} タグで囲み,全ての認証ユーザで共通の部分(シェル)を
+    穴の位置を示すマーカーと共にキャッシュする,リクエストごとにはマーカーを置き換える穴のみを描画する
+    シェルの無効化には認証されていないユーザに対するページと同じタグを利用する
+    """
+    hole_shell = False
+
+    def is_shell_cacheable(self, request):
+        if not getattr(settings, 'PAGE_CACHE_ENABLED', True):
+            return False
+        if request.method not in ('GET', 'HEAD') or not request.user.is_authenticated:
+            return False
+        return not has_pending_messages(request)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context['hole_shell'] = self.hole_shell
+        return context
+
+    def dispatch(self, request, *args, **kwargs):
+        if not self.is_shell_cacheable(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        key = page_cache_key(request, SHELL_CACHE_PREFIX)
+        entry = get_cached_entry(key)
+        if entry is not None:
+            record('shell_hit')
+            response = HttpResponse(fill_holes(entry['content'], request), content_type=entry['content_type'])
+            response['X-Page-Cache'] = 'HIT'
+            return response
+
+        record('shell_miss')
+        self.hole_shell = True
+        csrf_cookie_used = request.META.get('CSRF_COOKIE_USED')
+        response = super().dispatch(request, *args, **kwargs)
+        if response.status_code != 200 or not hasattr(response, 'render'):
+            return response
+
+        response.render()
+        shell = response.content.decode(response.charset)
+        # 穴の外でCSRFトークンが利用されたシェルは他のユーザと共有しない
+        if request.META.get('CSRF_COOKIE_USED') == csrf_cookie_used:
+            set_cached_entry(key, shell, response['Content-Type'],
+                             self.get_page_cache_tags(response.context_data), self.get_page_cache_timeout())
+        response.content = fill_holes(shell, request)
+        response['X-Page-Cache'] = 'MISS'
+        return response
@@ -0,0 +1,315 @@
+import base64
+import datetime
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import connections, router
+from django.db.backends.base.operations import BaseDatabaseOperations
+from django.db.models import IntegerField, Q, QuerySet
+from django.http import Http404
+from django.utils.functional import cached_property
+
+# カーソルに記録するページ送りの方向
+NEXT = 'n'
+PREVIOUS = 'p'
+
+
+# 件数のキャッシュに利用するキーの接頭辞
+COUNT_CACHE_PREFIX = 'pagination:count'
+GENERATION_CACHE_PREFIX = 'pagination:generation'
+
+
+class InvalidCursor(Exception):
+    pass
+
+
+class CursorJSONEncoder(DjangoJSONEncoder):
+    # DjangoJSONEncoderは日時をミリ秒単位に切り捨てるため,マイクロ秒まで保持する
+    def default(self, o):
+        if isinstance(o, datetime.datetime):
+            return o.isoformat()
+        return super().default(o)
+
+
+def encode_cursor(direction, values):
+    """
+    ページ送りの方向と基準となる行の並び替えキーの値から,URLに含める不透明なカーソル文字列を作成する
+    """
+    payload = json.dumps([direction, list(values)], cls=CursorJSONEncoder, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """
+    encode_cursor()によって作成したカーソル文字列から,ページ送りの方向と並び替えキーの値を取り出す
+
+    Raises
+    ------
+    InvalidCursor
+        カーソル文字列として解釈する事が出来ない場合に発生
+    """
+    try:
+        padding = '=' * (-len(cursor) % 4)
+        direction, values = json.loads(base64.urlsafe_b64decode(cursor + padding).decode('utf-8'))
+    except (TypeError, ValueError, UnicodeError):
+        raise InvalidCursor('cursor is invalid')
+
+    if direction not in (NEXT, PREVIOUS) or not isinstance(values, list):
+        raise InvalidCursor('cursor is invalid')
+    return direction, values
+
+
+def ordering_field(model, name):
+    # 並び替えキーの名前('-'を除く)が指すフィールドを,関連を辿って取得する
+    *relations, field_name = name.lstrip('-').split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(field_name)
+
+
+def integer_range(field, using):
+    """
+    整数のフィールドとの比較に渡す事が出来る値の範囲を返す
+
+    SQLiteはカラムの範囲を持たない((None, None)を返す)が,パラメータは64ビットの符号付き整数に限られる
+    """
+    min_value, max_value = connections[using].ops.integer_field_range(field.get_internal_type())
+    big_min, big_max = BaseDatabaseOperations.integer_field_ranges['BigIntegerField']
+    return (big_min if min_value is None else min_value, big_max if max_value is None else max_value)
+
+
+def clean_cursor_values(model, ordering, values):
+    """
+    カーソルから取り出した並び替えキーの値を,並び替えキーのフィールドの型に変換する
+
+    Parameters
+    ----------
+    model : Model
+        ページ分割を行うクエリセットのモデル
+    ordering : tuple
+        並び替えキーの組
+    values : list
+        decode_cursor()によって取り出した並び替えキーの値
+
+    Raises
+    ------
+    InvalidCursor
+        値の数が並び替えキーと異なる場合や,フィールドの型に変換する事が出来ない値・データベースの整数の範囲を超える値を含む場合に発生
+    """
+    if len(values) != len(ordering):
+        raise InvalidCursor('cursor is invalid')
+    cleaned = []
+    for name, value in zip(ordering, values):
+        # 改ざんされたカーソルの値をそのまま絞り込みの条件に渡さない
+        field = ordering_field(model, name)
+        try:
+            value = field.to_python(value)
+        except (ValidationError, TypeError, ValueError):
+            raise InvalidCursor('cursor is invalid')
+        if value is None:
+            raise InvalidCursor('cursor is invalid')
+        # 外部キーは参照先の主キーの範囲とする
+        target_field = field.target_field if field.is_relation else field
+        if isinstance(target_field, IntegerField):
+            min_value, max_value = integer_range(target_field, router.db_for_read(model))
+            if not min_value <= value <= max_value:
+                raise InvalidCursor('cursor is invalid')
+        cleaned.append(value)
+    return cleaned
+
+
+class CursorPage:
+    """
+    CursorPaginatorによって取得した1ページ分の結果
+
+    総件数を数えないため,ページ番号の代わりに前後のページのカーソルのみを持つ
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    並び替えキーの値を基準に次のページを取得するキーセット方式のページネータ
+
+    OFFSETとCOUNT(*)を利用しないため,ページの深さに関わらず一定の処理時間で取得する事が出来る
+    並び替えキーの組は全ての行で一意である必要があるため,末尾には主キーを含める
+
+    Parameters
+    ----------
+    queryset : QuerySet
+        ページ分割を行うクエリセット
+    per_page : int
+        1ページに含める行数
+    ordering : tuple
+        並び替えキーの組,降順の場合は先頭に'-'を付ける (例: ('-create_date', '-id'))
+    """
+
+    def __init__(self, queryset, per_page, ordering):
+        self.queryset = queryset
+        self.per_page = int(per_page)
+        self.ordering = tuple(ordering)
+        self.keys = [(field.lstrip('-'), field.startswith('-')) for field in self.ordering]
+
+    def page(self, cursor=None):
+        if not cursor:
+            rows = list(self.queryset.order_by(*self.ordering)[:self.per_page + 1])
+            return self.build_page(rows[:self.per_page], len(rows) > self.per_page, False)
+
+        direction, values = decode_cursor(cursor)
+        values = clean_cursor_values(self.queryset.model, self.ordering, values)
+
+        if direction == NEXT:
+            queryset = self.queryset.filter(self.seek_filter(values, forward=True)).order_by(*self.ordering)
+            rows = list(queryset[:self.per_page + 1])
+            return self.build_page(rows[:self.per_page], len(rows) > self.per_page, True)
+
+        # 前のページは逆順に取得して並べ直す
+        reversed_ordering = [field[1:] if field.startswith('-') else '-' + field for field in self.ordering]
+        queryset = self.queryset.filter(self.seek_filter(values, forward=False)).order_by(*reversed_ordering)
+        rows = list(queryset[:self.per_page + 1])
+        return self.build_page(rows[:self.per_page][::-1], True, len(rows) > self.per_page)
+
+    def seek_filter(self, values, forward):
+        """
+        並び替えキーの値がvaluesより後ろ(forwardがFalseの場合は前)にある行を取り出す条件を作成する
+        """
+        condition = Q()
+        for i, (field, descending) in enumerate(self.keys):
+            lookup = 'lt' if descending == forward else 'gt'
+            term = Q(**{'{}__{}'.format(field, lookup): values[i]})
+            for j in range(i):
+                term &= Q(**{self.keys[j][0]: values[j]})
+            condition |= term
+        return condition
+
+    def key_values(self, row):
+        values = []
+        for field, _ in self.keys:
+            value = row
+            for attribute in field.split('__'):
+                value = getattr(value, attribute)
+            values.append(value)
+        return values
+
+    def build_page(self, rows, has_next, has_previous):
+        next_cursor = encode_cursor(NEXT, self.key_values(rows[-1])) if rows and has_next else None
+        previous_cursor = encode_cursor(PREVIOUS, self.key_values(rows[0])) if rows and has_previous else None
+        return CursorPage(rows, next_cursor, previous_cursor)
+
+
+def generation_cache_key(db_table):
+    return '{}:{}'.format(GENERATION_CACHE_PREFIX, db_table)
+
+
+def bump_count_generation(db_table):
+    """
+    テーブルの世代番号を更新し,そのテーブルを参照するクエリセットのキャッシュされた件数を無効にする
+    """
+    key = generation_cache_key(db_table)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, 1, None)
+
+
+class WindowedPage(Page):
+    """
+    現在のページ番号の前後のみのページ番号を返すPage
+    """
+
+    @property
+    def page_window(self):
+        return self.paginator.get_elided_page_range(self.number,
+                                                    on_each_side=self.paginator.window_on_each_side,
+                                                    on_ends=self.paginator.window_on_ends)
+
+
+class CachedCountPaginator(Paginator):
+    """
+    総件数をキャッシュし,ページ番号を現在のページの前後のみに絞って表示するためのページネータ
+
+    件数はクエリのSQLと参照しているテーブルの世代番号をキーとしてキャッシュされ,
+    記事やフォロー関係の追加・削除時に世代番号が更新される事で無効になる
+    世代番号の更新を伴わない変更もPAGINATION_COUNT_CACHE_TIMEOUT秒後には反映される
+    """
+    window_on_each_side = 2
+    window_on_ends = 1
+
+    def _get_page(self, *args, **kwargs):
+        return WindowedPage(*args, **kwargs)
+
+    @cached_property
+    def count(self):
+        if not isinstance(self.object_list, QuerySet):
+            return super().count
+
+        # コミットされていない変更を含む可能性がある件数は他のリクエストと共有しない
+        if connections[self.object_list.db].in_atomic_block:
+            return super().count
+
+        key = self.count_cache_key()
+        count = cache.get(key)
+        if count is None:
+            count = super().count
+            cache.set(key, count, getattr(settings, 'PAGINATION_COUNT_CACHE_TIMEOUT', 300))
+        return count
+
+    def count_cache_key(self):
+        query = self.object_list.query
+        sql, params = query.get_compiler(using=self.object_list.db).as_sql()
+        tables = sorted({alias.table_name for alias in query.alias_map.values()})
+        generations = cache.get_many([generation_cache_key(table) for table in tables])
+        digest = hashlib.sha1(repr((sql, params, sorted(generations.items()))).encode('utf-8')).hexdigest()
+        return '{}:{}'.format(COUNT_CACHE_PREFIX, digest)
+
+
+class CursorPaginationMixin:
+    """
+    ListViewでキーセット方式のページネーションを利用するためのMixin
+
+    URLパラメータにcursorが含まれている場合,もしくは設定値CURSOR_PAGINATIONがTrueの場合に
+    cursor_orderingを並び替えキーとしたCursorPaginatorを利用し,それ以外の場合は通常のページネーションを行う
+    """
+    cursor_ordering = None
+    cursor_kwarg = 'cursor'
+
+    def use_cursor_pagination(self):
+        if self.cursor_ordering is None:
+            return False
+        return self.cursor_kwarg in self.request.GET or getattr(settings, 'CURSOR_PAGINATION', False)
+
+    def paginate_queryset(self, queryset, page_size):
+        if not self.use_cursor_pagination():
+            return super().paginate_queryset(queryset, page_size)
+
+        paginator = CursorPaginator(queryset, page_size, self.cursor_ordering)
+        try:
+            page = paginator.page(self.request.GET.get(self.cursor_kwarg))
+        except InvalidCursor:
+            raise Http404('不正なカーソルが指定されました')
+        return (paginator, page, page.object_list, page.has_other_pages())
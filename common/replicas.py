@@ -0,0 +1,124 @@
+import random
+import time
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+# 書き込みを行ったユーザの読み込みをプライマリに固定する期限を保持するセッションのキー
+REPLICA_PIN_SESSION_KEY = '_replica_pinned_until'
+# 書き込みを行ってから読み込みをプライマリに固定する秒数(レプリカの遅延より長くする)
+DEFAULT_REPLICA_PIN_SECONDS = 10
+# レプリカの遅延の影響を受けない様に,常にプライマリから読み込むアプリケーション
+# セッションは固定の期限の判定にも利用するため,レプリカから読み込まない
+PRIMARY_ONLY_APPS = ('sessions', 'axes', 'jobs')
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_state = Local()
+
+
+def get_replica_aliases():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextmanager
+def use_replicas():
+    """
+    ブロックの中での読み込みをレプリカに振り分ける
+
+    レプリカが設定されていない場合や,ブロックの外ではプライマリ(default)から読み込む
+    """
+    previous = getattr(_state, 'enabled', False)
+    _state.enabled = True
+    try:
+        yield
+    finally:
+        _state.enabled = previous
+
+
+def replicas_enabled():
+    return getattr(_state, 'enabled', False)
+
+
+class ReplicaRouter:
+    """
+    use_replicas()のブロックの中での読み込みをDATABASE_REPLICASのいずれかに振り分けるルータ
+
+    書き込みは常にプライマリに行い,レプリカから読み込んだインスタンスを保存する場合もプライマリに書き込む
+    レプリカはプライマリを複製するため,マイグレーションは振り分けない
+    """
+
+    def db_for_read(self, model, **hints):
+        if model._meta.app_label in PRIMARY_ONLY_APPS or not replicas_enabled():
+            return DEFAULT_DB_ALIAS
+        aliases = get_replica_aliases()
+        if not aliases:
+            return DEFAULT_DB_ALIAS
+        return random.choice(aliases)
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # プライマリとレプリカは同じデータを保持するため,いずれの間の関連も許可する
+        databases = {DEFAULT_DB_ALIAS, *get_replica_aliases()}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+
+def get_replica_pin_seconds():
+    return getattr(settings, 'REPLICA_PIN_SECONDS', DEFAULT_REPLICA_PIN_SECONDS)
+
+
+def pin_to_primary(request):
+    # 書き込みを行ったユーザの読み込みを一定時間プライマリに固定し,書き込んだ内容がすぐに表示される様にする
+    request.session[REPLICA_PIN_SESSION_KEY] = time.time() + get_replica_pin_seconds()
+
+
+def is_pinned_to_primary(request):
+    session = getattr(request, 'session', None)
+    if session is None:
+        return False
+    return session.get(REPLICA_PIN_SESSION_KEY, 0) > time.time()
+
+
+class ReplicaPinMiddleware:
+    """
+    POST等の書き込みを行うリクエストが成功した場合に,そのセッションの読み込みをプライマリに固定するミドルウェア
+
+    SessionMiddlewareより後に置く
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        if (request.method not in SAFE_METHODS and response.status_code < 400
+                and get_replica_aliases() and hasattr(request, 'session')):
+            pin_to_primary(request)
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    GET・HEADのリクエストの読み込みをレプリカに振り分けるViewのMixin
+
+    テンプレートの描画時に評価されるクエリセットもレプリカから読み込む様に,ブロックの中で描画を行う
+    書き込みを行ってからREPLICA_PIN_SECONDSの間はプライマリから読み込む
+    他のユーザの書き込みによってタグが更新されてからREPLICA_PIN_SECONDSの間は,レプリカから読み込んだページを
+    キャッシュしない(common.page_cache.replica_may_be_stale)
+    """
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.method not in SAFE_METHODS or is_pinned_to_primary(request):
+            return super().dispatch(request, *args, **kwargs)
+
+        with use_replicas():
+            response = super().dispatch(request, *args, **kwargs)
+            if callable(getattr(response, 'render', None)):
+                response.render()
+        return response
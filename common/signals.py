@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import m2m_changed, post_delete, post_save
+
+from articles.models import Article, Comment, Tag
+from authenticate.models import Relation
+from .page_cache import (ARTICLES_TAG, TAGS_TAG, USERS_TAG, article_tag, invalidate_tags,
+                         user_articles_tag, user_favorites_tag, user_relations_tag, user_tag)
+from .pagination import bump_count_generation
+
+User = get_user_model()
+
+# 一覧ページの件数に影響するモデル
+COUNTED_MODELS = (Article, Comment, Tag, Relation)
+COUNTED_M2M_FIELDS = (Article.tags, Article.favorite_users)
+
+
+def invalidate_model_count(sender, **kwargs):
+    bump_count_generation(sender._meta.db_table)
+
+
+def invalidate_m2m_count(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_count_generation(sender._meta.db_table)
+
+
+def invalidate_article_pages(sender, instance, **kwargs):
+    invalidate_tags(ARTICLES_TAG, article_tag(instance.pk), user_articles_tag(instance.author_id))
+
+
+def invalidate_article_tag_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # タグ側から変更された場合はpk_setに記事の主キーが含まれる
+    article_ids = (pk_set or []) if reverse else [instance.pk]
+    invalidate_tags(ARTICLES_TAG, *[article_tag(article_id) for article_id in article_ids])
+
+
+def invalidate_favorite_pages(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    # ユーザ側から変更された場合はpk_setに記事の主キーが含まれる
+    user_ids = [instance.pk] if reverse else (pk_set or [])
+    invalidate_tags(*[user_favorites_tag(user_id) for user_id in user_ids])
+
+
+def invalidate_comment_pages(sender, instance, **kwargs):
+    invalidate_tags(article_tag(instance.article_id))
+
+
+def invalidate_tag_pages(sender, **kwargs):
+    invalidate_tags(TAGS_TAG)
+
+
+def invalidate_relation_pages(sender, instance, **kwargs):
+    invalidate_tags(user_relations_tag(instance.follower_id), user_relations_tag(instance.followee_id))
+
+
+def invalidate_user_pages(sender, instance, update_fields=None, **kwargs):
+    # ログイン時の最終ログイン日時の更新はページの内容に影響しない
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    invalidate_tags(USERS_TAG, user_tag(instance.pk))
+
+
+PAGE_CACHE_RECEIVERS = (
+    (Article, invalidate_article_pages),
+    (Comment, invalidate_comment_pages),
+    (Tag, invalidate_tag_pages),
+    (Relation, invalidate_relation_pages),
+    (User, invalidate_user_pages),
+)
+
+
+def connect_signals():
+    for model in COUNTED_MODELS:
+        post_save.connect(invalidate_model_count, sender=model,
+                          dispatch_uid='count_generation_save_{}'.format(model._meta.label))
+        post_delete.connect(invalidate_model_count, sender=model,
+                            dispatch_uid='count_generation_delete_{}'.format(model._meta.label))
+    for field in COUNTED_M2M_FIELDS:
+        through = field.through
+        m2m_changed.connect(invalidate_m2m_count, sender=through,
+                            dispatch_uid='count_generation_m2m_{}'.format(through._meta.label))
+
+    # 認証されていないユーザ向けにキャッシュしたページの無効化
+    for model, receiver in PAGE_CACHE_RECEIVERS:
+        post_save.connect(receiver, sender=model,
+                          dispatch_uid='page_cache_save_{}'.format(model._meta.label))
+        post_delete.connect(receiver, sender=model,
+                            dispatch_uid='page_cache_delete_{}'.format(model._meta.label))
+    m2m_changed.connect(invalidate_article_tag_pages, sender=Article.tags.through,
+                        dispatch_uid='page_cache_m2m_{}'.format(Article.tags.through._meta.label))
+    m2m_changed.connect(invalidate_favorite_pages, sender=Article.favorite_users.through,
+                        dispatch_uid='page_cache_m2m_{}'.format(Article.favorite_users.through._meta.label))
@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+# SQLiteの接続ごとに実行するPRAGMAの組,設定値SQLITE_PROFILEによって選択する
+# busy_timeoutは他の接続がロックを保持している場合に待機するミリ秒,journal_modeの変更も待機させるため先頭に置く
+SQLITE_PROFILES = {
+    # SQLite・Djangoの既定の動作のまま変更しない
+    'default': {},
+    # 読み込みが書き込みを待たない先行書き込みログ(WAL)とし,コミットごとのfsyncをチェックポイントのみに減らす
+    # (synchronous=NORMALではOSが停止した場合に直前のコミットが失われる場合があるが,データベースは破損しない)
+    'performance': {
+        'busy_timeout': 5000,
+        'journal_mode': 'WAL',
+        'synchronous': 'NORMAL',
+        # 256MiBまでをメモリマップで読み込み,ページキャッシュは64MiB(負の値はKiB単位)とする
+        'mmap_size': 268435456,
+        'cache_size': -65536,
+    },
+}
+
+
+def get_sqlite_pragmas():
+    """
+    設定値SQLITE_PROFILEのPRAGMAに,SQLITE_PRAGMASによる個別の指定を上書きして返す
+
+    Returns
+    -------
+    pragmas : dict
+        {PRAGMAの名前: 値}
+    """
+    profile = getattr(settings, 'SQLITE_PROFILE', 'default')
+    if profile not in SQLITE_PROFILES:
+        raise ImproperlyConfigured('SQLITE_PROFILE must be one of {}, got {!r}'.format(
+            ', '.join(SQLITE_PROFILES), profile))
+    return {**SQLITE_PROFILES[profile], **getattr(settings, 'SQLITE_PRAGMAS', {})}
+
+
+def apply_sqlite_profile(sender, connection, **kwargs):
+    # connection_createdの受信側,SQLiteに接続した直後にPRAGMAを実行する
+    if connection.vendor != 'sqlite':
+        return
+    for name, value in get_sqlite_pragmas().items():
+        # 設定値のみを受け付け,PRAGMAはプレースホルダを利用できないため文字列として組み立てる
+        connection.connection.execute('PRAGMA {} = {}'.format(name, value))
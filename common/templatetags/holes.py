@@ -0,0 +1,19 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from ..holes import hole_marker, render_hole
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def hole(context, name, *args):
+    """
+    閲覧しているユーザごとに異なる部分を描画する
+
+    シェルを描画している場合(コンテキストのhole_shellがTrueの場合)は穴の位置を示すマーカーのみを出力し,
+    それ以外の場合はその場で描画する,argsはJSONに変換出来る値である必要がある
+    """
+    if context.get('hole_shell'):
+        return mark_safe(hole_marker(name, args))
+    return mark_safe(render_hole(context['request'], name, list(args)))
@@ -0,0 +1,19 @@
+from django import template
+
+register = template.Library()
+
+# ページ番号とカーソルは同時に指定しない
+PAGINATION_PARAMETERS = ('page', 'cursor')
+
+
+@register.simple_tag(takes_context=True)
+def page_query(context, **kwargs):
+    """
+    現在のURLパラメータ(検索キーワードやタグ等)を保ったまま,ページ番号またはカーソルを置き換えたクエリ文字列を返す
+    """
+    query = context['request'].GET.copy()
+    for parameter in PAGINATION_PARAMETERS:
+        query.pop(parameter, None)
+    for key, value in kwargs.items():
+        query[key] = value
+    return query.urlencode()
@@ -0,0 +1,68 @@
+import copy
+import os
+import shutil
+import sqlite3
+import tempfile
+from contextlib import ExitStack
+
+from django.db import connections
+from django.test.utils import CaptureQueriesContext
+
+
+class ExtraSQLiteDatabasesMixin:
+    """
+    テスト用データベースと同じスキーマを持つSQLiteのファイルを,追加のデータベースとして登録するTestCaseのMixin
+
+    追加のデータベースはテストのトランザクションの外にあるため,テストごとにスキーマのみのひな形から作り直す
+    テストランナーの確認に含めない様に,databasesには含めずにsetUpClassの後で登録する
+    """
+    extra_databases = ()
+
+    @classmethod
+    def setUpClass(cls):
+        # 行を作成する前のテスト用データベースを複製し,スキーマのひな形とする
+        cls.extra_database_dir = tempfile.mkdtemp()
+        cls.extra_database_template = os.path.join(cls.extra_database_dir, 'template.sqlite3')
+        primary = connections['default']
+        primary.ensure_connection()
+        template = sqlite3.connect(cls.extra_database_template)
+        primary.connection.backup(template)
+        template.close()
+        super().setUpClass()
+
+        for alias in cls.extra_databases:
+            connections.settings[alias] = {'ENGINE': 'django.db.backends.sqlite3',
+                                           'NAME': os.path.join(cls.extra_database_dir, '{}.sqlite3'.format(alias))}
+
+    @classmethod
+    def tearDownClass(cls):
+        for alias in cls.extra_databases:
+            connections[alias].close()
+            del connections[alias]
+            del connections.settings[alias]
+        shutil.rmtree(cls.extra_database_dir)
+        super().tearDownClass()
+
+    def setUp(self):
+        for alias in self.extra_databases:
+            connections[alias].close()
+            shutil.copyfile(self.extra_database_template, connections.settings[alias]['NAME'])
+        super().setUp()
+
+    def copy_rows(self, *objects, aliases=None):
+        # テスト用データベースの行をシグナルを送信せずに追加のデータベースへ複製する
+        for alias in self.extra_databases if aliases is None else aliases:
+            for obj in objects:
+                type(obj).objects.using(alias).bulk_create([copy.copy(obj)])
+
+    def capture_queries(self, func, *args, **kwargs):
+        # funcの中で各データベースに発行されたクエリを記録する
+        with ExitStack() as stack:
+            contexts = {alias: stack.enter_context(CaptureQueriesContext(connections[alias]))
+                        for alias in ['default', *self.extra_databases]}
+            result = func(*args, **kwargs)
+        self.captured = {alias: context.captured_queries for alias, context in contexts.items()}
+        return result
+
+    def count_queries(self, alias, table):
+        return len([query for query in self.captured[alias] if '"{}"'.format(table) in query['sql']])
@@ -0,0 +1,52 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TransactionTestCase
+
+from articles.models import Article
+from ..pagination import CachedCountPaginator
+
+User = get_user_model()
+
+
+# トランザクション内で数えた件数はキャッシュされないため,TransactionTestCaseを利用する
+class CachedCountPaginatorTest(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='cached_count_tester',
+                                               email='cached_count_tester@test.com',
+                                               password='c0unttest')
+        for i in range(3):
+            Article.objects.create(author=self.author,
+                                   title='cached_count_title{}'.format(i),
+                                   content='cached_count_content{}'.format(i))
+
+    # 2回目以降は総件数を数えるクエリを実行しない
+    def test_success_cache_count(self):
+        self.assertEqual(CachedCountPaginator(Article.objects.all(), 5).count, 3)
+        with self.assertNumQueries(0):
+            self.assertEqual(CachedCountPaginator(Article.objects.all(), 5).count, 3)
+
+    # 記事の追加・削除によってキャッシュされた件数が無効になる
+    def test_success_invalidate_on_write(self):
+        self.assertEqual(CachedCountPaginator(Article.objects.all(), 5).count, 3)
+
+        article = Article.objects.create(author=self.author,
+                                         title='cached_count_title',
+                                         content='cached_count_content')
+        self.assertEqual(CachedCountPaginator(Article.objects.all(), 5).count, 4)
+
+        article.delete()
+        self.assertEqual(CachedCountPaginator(Article.objects.all(), 5).count, 3)
+
+    # 条件の異なるクエリセットの件数は別々にキャッシュされる
+    def test_success_cache_per_query(self):
+        self.assertEqual(CachedCountPaginator(Article.objects.all(), 5).count, 3)
+        queryset = Article.objects.filter(title='cached_count_title0')
+        self.assertEqual(CachedCountPaginator(queryset, 5).count, 1)
+
+    # ページ番号は現在のページの前後と先頭・末尾のみが表示される
+    def test_success_page_window(self):
+        paginator = CachedCountPaginator(list(range(100000)), 5)
+        page_window = list(paginator.page(10000).page_window)
+        self.assertEqual(page_window, [1, paginator.ELLIPSIS, 9998, 9999, 10000, 10001, 10002,
+                                       paginator.ELLIPSIS, 20000])
@@ -0,0 +1,89 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from articles.models import Article
+from ..page_cache import get_page_cache
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False)
+class ConditionalGetMixinTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='conditional_author',
+                                              email='conditional_author@test.com',
+                                              password='c0nditi0nal')
+        cls.reader = User.objects.create_user(username='conditional_reader',
+                                              email='conditional_reader@test.com',
+                                              password='c0nditi0nal')
+        cls.article = Article.objects.create(author=cls.author,
+                                             title='conditional_title',
+                                             content='conditional_content')
+
+    def setUp(self):
+        get_page_cache().clear()
+
+    def revalidate(self, url, etag):
+        return self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+
+    # ETagが一致する場合はクエリの実行やテンプレートの描画を行わずに304を返す
+    def test_success_not_modified(self):
+        urls = [reverse('articles:articles'),
+                reverse('articles:article', kwargs={'pk': self.article.pk}),
+                reverse('users:articles', kwargs={'username': self.author.username}),
+                reverse('users:favorites', kwargs={'username': self.author.username})]
+        for url in urls:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response['ETag'].startswith('W/"'))
+
+            revalidated = self.revalidate(url, response['ETag'])
+            self.assertEqual(revalidated.status_code, 304)
+            self.assertEqual(revalidated.templates, [])
+            self.assertEqual(revalidated.content, b'')
+
+        # 記事ページの再検証ではクエリを実行しない
+        with self.assertNumQueries(0):
+            self.revalidate(urls[1], self.client.get(urls[1])['ETag'])
+
+    # 記事の変更によってETagが変わり,内容を再び返す
+    def test_success_modified(self):
+        url = reverse('articles:article', kwargs={'pk': self.article.pk})
+        etag = self.client.get(url)['ETag']
+
+        self.article.title = 'conditional_updated_title'
+        self.article.save()
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'conditional_updated_title')
+
+    # 認証ユーザごとに異なるETagとなり,自分のお気に入りの変更によってETagが変わる
+    def test_success_per_viewer(self):
+        url = reverse('articles:article', kwargs={'pk': self.article.pk})
+        anonymous_etag = self.client.get(url)['ETag']
+
+        self.client.force_login(self.reader)
+        etag = self.client.get(url)['ETag']
+        self.assertNotEqual(etag, anonymous_etag)
+        self.assertEqual(self.revalidate(url, etag).status_code, 304)
+
+        self.article.favorite_users.add(self.reader)
+        response = self.revalidate(url, etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, 'message-status="favorited"')
+
+    # お気に入りの追加によってお気に入り記事一覧のETagが変わる
+    def test_success_favorites_modified(self):
+        url = reverse('users:favorites', kwargs={'username': self.reader.username})
+        etag = self.client.get(url)['ETag']
+        self.article.favorite_users.add(self.reader)
+        self.assertEqual(self.revalidate(url, etag).status_code, 200)
+
+    # 存在しないユーザのページにはETagを付与せずに404を返す
+    def test_fail_unknown_user(self):
+        response = self.client.get(reverse('users:articles', kwargs={'username': 'conditional_unknown'}))
+        self.assertEqual(response.status_code, 404)
+        self.assertFalse(response.has_header('ETag'))
@@ -0,0 +1,92 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from articles.models import Article
+from ..connections import ConnectionPool, PoolTimeout, check_connections, get_pool, get_stats, reset_stats
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False)
+class ConnectionPoolTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(username='pool_author', email='pool_author@test.com', password='p00l1234')
+        Article.objects.create(author=author, title='pool_title', content='pool')
+
+    def setUp(self):
+        reset_stats()
+
+    def fake_connection(self, usable=True, connected=True):
+        # テストのデータベースの接続を閉じない様に,存在しないエイリアスの接続とする
+        return mock.Mock(alias='pool_test', connection=object() if connected else None, in_atomic_block=False,
+                         is_usable=mock.Mock(return_value=usable))
+
+    # 持ち越した接続を数え,疎通を確認する場合は切断されていた接続のみを閉じる
+    def test_success_health_check(self):
+        usable, unusable, closed = self.fake_connection(), self.fake_connection(usable=False), \
+            self.fake_connection(connected=False)
+        with mock.patch('common.connections.connections') as connections:
+            connections.all.return_value = [usable, unusable, closed]
+            check_connections()
+            self.assertEqual((get_stats()['reused'], get_stats()['unusable']), (2, 0))
+            unusable.is_usable.assert_not_called()
+
+            with override_settings(CONN_HEALTH_CHECKS=True):
+                check_connections()
+        unusable.close.assert_called_once_with()
+        usable.close.assert_not_called()
+        self.assertEqual((get_stats()['reused'], get_stats()['unusable']), (3, 1))
+
+    # 新しい接続と持ち越した接続の数から再利用率を求める
+    def test_success_reuse_ratio(self):
+        connection = self.fake_connection()
+        connection_created.send(sender=type(connection), connection=connection)
+        with mock.patch('common.connections.connections') as connections:
+            connections.all.return_value = [connection]
+            for _ in range(3):
+                check_connections()
+        stats = get_stats()
+        self.assertEqual((stats['created'], stats['reused']), (1, 3))
+        self.assertEqual(stats['reuse_ratio'], 0.75)
+
+    # 枠が空かない場合は待機を諦め,枠の数を超えて開いている接続は枠を返す際に閉じる
+    def test_success_pool_bounds(self):
+        pool = ConnectionPool(1, 0.01)
+        pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            pool.acquire()
+        self.assertEqual((get_stats()['acquired'], get_stats()['timeouts']), (1, 1))
+
+        connections = [self.fake_connection(), self.fake_connection()]
+        for connection in connections:
+            connection_created.send(sender=type(connection), connection=connection)
+        with mock.patch('common.connections.connections') as patched:
+            patched.all.return_value = connections[:1]
+            pool.release()
+        connections[0].close.assert_called_once_with()
+        self.assertEqual(get_stats()['overflow'], 1)
+        # 枠を返した後は再び確保する事が出来る
+        pool.acquire()
+        pool.release()
+
+    # ミドルウェアはリクエストの間だけ枠を確保し,枠が空かない場合は503を返す
+    @override_settings(DATABASE_POOL_SIZE=1, DATABASE_POOL_TIMEOUT=0.01)
+    def test_success_middleware(self):
+        response = self.client.get(reverse('articles:articles'))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(get_stats()['acquired'], 1)
+        self.assertGreater(get_stats()['reused'], 0)
+
+        pool = get_pool()
+        pool.acquire()
+        try:
+            response = self.client.get(reverse('articles:articles'))
+        finally:
+            pool.slots.release()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(get_stats()['timeouts'], 1)
@@ -0,0 +1,98 @@
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from articles.models import Article, Comment, Tag
+from authenticate.models import Relation
+from jobs.queue import run_pending_jobs
+from .. import counters
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False)
+class CountersTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        User.objects.create_user(username='counter_author',
+                                 email='counter_author@test.com',
+                                 password='c0unter1234')
+        User.objects.create_user(username='counter_reader',
+                                 email='counter_reader@test.com',
+                                 password='c0unter1234')
+
+    def post_ajax(self, url, payload):
+        return self.client.post(url, payload, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    # フォロー・お気に入り・コメント・記事の投稿と削除によって件数が更新される
+    def test_success_update_counters_from_views(self):
+        author = User.objects.get(username='counter_author')
+        reader = User.objects.get(username='counter_reader')
+
+        self.client.force_login(author)
+        self.client.post(reverse('settings:newarticle'),
+                         {'title': 'counter_title', 'content': 'counter_content',
+                          'tags': [Tag.objects.create(tag='counter_tag').pk]})
+        article = Article.objects.get(title='counter_title')
+
+        self.client.force_login(reader)
+        self.post_ajax(reverse('users:follow', kwargs={'username': 'counter_author'}),
+                       {'follower': 'counter_reader'})
+        self.post_ajax(reverse('articles:favorite', kwargs={'pk': article.pk}),
+                       {'username': 'counter_reader'})
+        self.client.post(reverse('articles:comments', kwargs={'pk': article.pk}),
+                         {'content': 'counter_comment'})
+
+        author.refresh_from_db()
+        reader.refresh_from_db()
+        article.refresh_from_db()
+        self.assertEqual((author.article_count, author.follower_count), (1, 1))
+        self.assertEqual((reader.followee_count, reader.favorite_count), (1, 1))
+        self.assertEqual((article.favorite_count, article.comment_count), (1, 1))
+
+        self.client.force_login(author)
+        self.client.post(reverse('settings:deletearticle', kwargs={'pk': article.pk}))
+        author.refresh_from_db()
+        reader.refresh_from_db()
+        self.assertEqual((author.article_count, reader.favorite_count), (0, 0))
+
+    # ユーザの削除によって連鎖的に削除される行の分だけ他のユーザ・記事の件数が減る
+    def test_success_update_counters_on_user_delete(self):
+        author = User.objects.get(username='counter_author')
+        reader = User.objects.get(username='counter_reader')
+        article = Article.objects.create(author=author, title='counter_title', content='counter_content')
+        Relation.objects.create(follower=reader, followee=author)
+        Relation.objects.create(follower=author, followee=reader)
+        article.favorite_users.add(reader)
+        Comment.objects.create(article=article, comment_author=reader, content='counter_comment')
+        counters.rebuild(*counters.get_models())
+
+        self.client.force_login(reader)
+        self.client.post(reverse('settings:deleteuser'))
+        # 退会したユーザはジョブによって削除される
+        run_pending_jobs()
+
+        author.refresh_from_db()
+        article.refresh_from_db()
+        self.assertEqual((author.follower_count, author.followee_count), (0, 0))
+        self.assertEqual((article.favorite_count, article.comment_count), (0, 0))
+        self.assertFalse(any(counters.verify(*counters.get_models()).values()))
+
+    # 管理コマンドによって件数の検証と再計算を行う事が出来る
+    def test_success_rebuild_command(self):
+        author = User.objects.get(username='counter_author')
+        reader = User.objects.get(username='counter_reader')
+        Relation.objects.create(follower=reader, followee=author)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_counters', '--verify', stdout=StringIO())
+
+        call_command('rebuild_counters', stdout=StringIO())
+        call_command('rebuild_counters', '--verify', stdout=StringIO())
+        author.refresh_from_db()
+        self.assertEqual(author.follower_count, 1)
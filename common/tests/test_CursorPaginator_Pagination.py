@@ -0,0 +1,97 @@
+import datetime
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase
+
+from articles.models import Article
+from ..pagination import CursorPaginator, InvalidCursor, decode_cursor, encode_cursor
+
+User = get_user_model()
+
+
+class CursorPaginatorTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='cursor_paginator_tester',
+                                          email='cursor_paginator_tester@test.com',
+                                          password='curs0rtest')
+        # 同じ日付の記事を複数作成し,日付だけでは順序が決まらない状態にする
+        for i in range(7):
+            Article.objects.create(author=author,
+                                   title='cursor_title{}'.format(i),
+                                   content='cursor_content{}'.format(i),
+                                   create_date=datetime.date(2021, 10, 1 + i // 3))
+
+    def setUp(self):
+        self.paginator = CursorPaginator(Article.objects.all(), 3, ('-create_date', '-id'))
+        self.expected = list(Article.objects.order_by('-create_date', '-id'))
+
+    # カーソルは方向と並び替えキーの値を復元する事が出来る
+    def test_encode_decode_cursor(self):
+        cursor = encode_cursor('n', [datetime.date(2021, 10, 1), 3])
+        self.assertEqual(decode_cursor(cursor), ('n', ['2021-10-01', 3]))
+
+        with self.assertRaises(InvalidCursor):
+            decode_cursor('not-a-cursor')
+
+    # 並び替えキーの型に変換する事が出来ない値を含むカーソルは不正なカーソルとする
+    def test_fail_forged_cursor(self):
+        for values in ([[1, 2], 3], ['x', 'y'], ['2021-10-01', None], [{'id': 1}, 3], ['2021-10-01'],
+                       ['2021-10-01', 2 ** 70], ['2021-10-01', -2 ** 70]):
+            with self.assertRaises(InvalidCursor):
+                self.paginator.page(encode_cursor('n', values))
+
+    # 次のページのカーソルを辿る事で全ての記事を重複無く取得する事が出来る
+    def test_success_forward(self):
+        first_page = self.paginator.page()
+        self.assertEqual(first_page.object_list, self.expected[:3])
+        self.assertFalse(first_page.has_previous())
+        self.assertTrue(first_page.has_next())
+
+        second_page = self.paginator.page(first_page.next_cursor)
+        self.assertEqual(second_page.object_list, self.expected[3:6])
+
+        last_page = self.paginator.page(second_page.next_cursor)
+        self.assertEqual(last_page.object_list, self.expected[6:])
+        self.assertFalse(last_page.has_next())
+        self.assertTrue(last_page.has_previous())
+
+    # 前のページのカーソルによって直前のページを取得する事が出来る
+    def test_success_backward(self):
+        second_page = self.paginator.page(self.paginator.page().next_cursor)
+        last_page = self.paginator.page(second_page.next_cursor)
+
+        previous_page = self.paginator.page(last_page.previous_cursor)
+        self.assertEqual(previous_page.object_list, self.expected[3:6])
+
+        first_page = self.paginator.page(previous_page.previous_cursor)
+        self.assertEqual(first_page.object_list, self.expected[:3])
+        self.assertFalse(first_page.has_previous())
+
+    # ページの取得はCOUNT(*)とOFFSETを利用しない1回のクエリで行われる
+    def test_success_single_query(self):
+        cursor = self.paginator.page().next_cursor
+        with self.assertNumQueries(1) as queries:
+            self.paginator.page(cursor)
+        sql = queries.captured_queries[0]['sql'].upper()
+        self.assertNotIn('COUNT(', sql)
+        self.assertNotIn('OFFSET', sql)
+
+    # 作成日時がマイクロ秒単位でしか異ならない記事も欠落・重複無く取得する事が出来る
+    def test_success_microsecond_ordering(self):
+        author = User.objects.get(username='cursor_paginator_tester')
+        created_at = Article.objects.order_by('created_at').first().created_at
+        for i in range(1, 4):
+            Article.objects.create(author=author,
+                                   title='cursor_microsecond{}'.format(i),
+                                   content='cursor_microsecond',
+                                   created_at=created_at.replace(microsecond=i))
+
+        paginator = CursorPaginator(Article.objects.all(), 2, ('-created_at', '-id'))
+        page = paginator.page()
+        fetched = list(page.object_list)
+        while page.has_next():
+            page = paginator.page(page.next_cursor)
+            fetched.extend(page.object_list)
+        self.assertEqual(fetched, list(Article.objects.order_by('-created_at', '-id')))
@@ -0,0 +1,92 @@
+from django.contrib.auth import get_user_model
+from django.test import RequestFactory, TestCase, override_settings
+from django.urls import reverse
+
+from authenticate.models import Relation
+from ..holes import fill_holes, hole_marker, register_hole
+from ..page_cache import get_page_cache
+
+User = get_user_model()
+
+primed_args = []
+
+
+def prime_test_hole(request, args_list):
+    primed_args.append(args_list)
+
+
+@register_hole('test_hole', prime=prime_test_hole)
+def render_test_hole(request, value):
+    return '<b>{}:{}</b>'.format(request.user.username, value)
+
+
+class FillHolesTest(TestCase):
+    # 同じ種類の穴はまとめてprimeを呼び出してから全てのマーカーを置き換える
+    def test_success_fill_holes(self):
+        request = RequestFactory().get('/')
+        request.user = User(username='fill_holes_tester')
+        shell = '<p>{}</p><p>{}</p>'.format(hole_marker('test_hole', [1]), hole_marker('test_hole', ['a']))
+
+        primed_args.clear()
+        self.assertEqual(fill_holes(shell, request),
+                         '<p><b>fill_holes_tester:1</b></p><p><b>fill_holes_tester:a</b></p>')
+        self.assertEqual(primed_args, [[[1], ['a']]])
+
+
+@override_settings(AXES_ENABLED=False)
+class HolePunchedPageCacheTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.profile_user = User.objects.create_user(username='hole_profile',
+                                                    email='hole_profile@test.com',
+                                                    password='h0lecache')
+        cls.viewers = [User.objects.create_user(username='hole_viewer{}'.format(i),
+                                                email='hole_viewer{}@test.com'.format(i),
+                                                password='h0lecache')
+                       for i in range(2)]
+        for viewer in cls.viewers:
+            Relation.objects.create(follower=viewer, followee=cls.profile_user)
+        # 1人目の閲覧者のみが2人目の閲覧者をフォローしている
+        Relation.objects.create(follower=cls.viewers[0], followee=cls.viewers[1])
+
+    def setUp(self):
+        get_page_cache().clear()
+        self.url = reverse('users:followers', kwargs={'username': self.profile_user.username})
+
+    def get_as(self, viewer):
+        self.client.force_login(viewer)
+        return self.client.get(self.url)
+
+    # 2人目以降のユーザにはキャッシュしたシェルの穴のみを埋めて返す
+    def test_success_fill_shell_per_viewer(self):
+        first = self.get_as(self.viewers[0])
+        self.assertEqual(first['X-Page-Cache'], 'MISS')
+
+        # セッション・ユーザとフォロー関係を取得するクエリのみを実行する
+        self.client.force_login(self.viewers[1])
+        with self.assertNumQueries(3):
+            second = self.client.get(self.url)
+        self.assertEqual(second['X-Page-Cache'], 'HIT')
+
+        for response in (first, second):
+            self.assertNotContains(response, '<!--hole:')
+            self.assertContains(response, 'csrfmiddlewaretoken')
+
+        # 1人目はプロフィールのユーザと2人目をフォローしており,自分自身のボタンは表示されない
+        self.assertContains(first, 'value="フォロー中"', count=2)
+        self.assertNotContains(first, 'action="{}"'.format(reverse('users:follow', args=['hole_viewer0'])))
+        self.assertContains(first, 'value="hole_viewer0"')
+
+        # 2人目はプロフィールのユーザのみをフォローしている
+        self.assertContains(second, 'value="フォロー中"', count=1)
+        self.assertContains(second, 'value="フォローする"', count=1)
+        self.assertNotContains(second, 'action="{}"'.format(reverse('users:follow', args=['hole_viewer1'])))
+        self.assertContains(second, 'value="hole_viewer1"')
+
+    # フォロー関係の変更によってシェルが無効になる
+    def test_success_invalidate_shell(self):
+        self.get_as(self.viewers[0])
+        Relation.objects.filter(follower=self.viewers[1], followee=self.profile_user).delete()
+        response = self.get_as(self.viewers[0])
+        self.assertEqual(response['X-Page-Cache'], 'MISS')
+        self.assertNotContains(response, 'hole_viewer1')
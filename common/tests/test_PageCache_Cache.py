@@ -0,0 +1,146 @@
+import tempfile
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from articles.models import Article, Comment
+from authenticate.models import Relation
+from ..page_cache import get_page_cache, get_stats
+
+User = get_user_model()
+
+
+class PageCacheTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='page_cache_author',
+                                              email='page_cache_author@test.com',
+                                              password='p4gecache')
+        cls.reader = User.objects.create_user(username='page_cache_reader',
+                                              email='page_cache_reader@test.com',
+                                              password='p4gecache')
+        cls.article = Article.objects.create(author=cls.author,
+                                             title='page_cache_title',
+                                             content='page_cache_content')
+        cls.other_article = Article.objects.create(author=cls.reader,
+                                                   title='page_cache_other_title',
+                                                   content='page_cache_other_content')
+
+    def setUp(self):
+        get_page_cache().clear()
+
+    def assertCacheStatus(self, url, status):
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Page-Cache'], status)
+        return response
+
+    # 2回目以降のアクセスは記事・ユーザのテーブルにアクセスせずにキャッシュしたページを返す
+    def test_success_hit(self):
+        url = reverse('articles:article', kwargs={'pk': self.article.pk})
+        first = self.assertCacheStatus(url, 'MISS')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.assertCacheStatus(url, 'HIT')
+        # データベースをキャッシュに利用する場合もキャッシュのテーブルのみにアクセスする
+        for query in queries.captured_queries:
+            self.assertNotIn('articles_', query['sql'])
+            self.assertNotIn('authenticate_', query['sql'])
+        self.assertEqual(first.content, second.content)
+
+        # クエリ文字列が異なる場合は別のページとして扱う
+        self.assertCacheStatus(reverse('articles:articles'), 'MISS')
+        self.assertCacheStatus(reverse('articles:articles') + '?page=1', 'MISS')
+
+        self.assertEqual(get_stats()['hit'], 1)
+        self.assertEqual(get_stats()['miss'], 3)
+
+    # 認証されているユーザには認証されていないユーザ向けにキャッシュしたページを返さない
+    def test_success_skip_authenticated(self):
+        url = reverse('articles:article', kwargs={'pk': self.article.pk})
+        self.assertCacheStatus(url, 'MISS')
+        self.client.force_login(self.reader)
+        response = self.client.get(url)
+        self.assertContains(response, 'favorite_button')
+
+    # コメントの投稿によってその記事のページのみが無効になる
+    def test_success_invalidate_comment(self):
+        url = reverse('articles:article', kwargs={'pk': self.article.pk})
+        other_url = reverse('articles:article', kwargs={'pk': self.other_article.pk})
+        self.assertCacheStatus(url, 'MISS')
+        self.assertCacheStatus(other_url, 'MISS')
+
+        Comment.objects.create(article=self.article, comment_author=self.reader,
+                               content='page_cache_comment')
+        response = self.assertCacheStatus(url, 'MISS')
+        self.assertContains(response, 'page_cache_comment')
+        self.assertCacheStatus(other_url, 'HIT')
+
+    # 記事の更新によって記事一覧・記事・投稿者の投稿記事一覧のページが無効になる
+    def test_success_invalidate_article(self):
+        urls = [reverse('articles:articles'),
+                reverse('articles:article', kwargs={'pk': self.article.pk}),
+                reverse('users:articles', kwargs={'username': self.author.username})]
+        for url in urls:
+            self.assertCacheStatus(url, 'MISS')
+
+        self.article.title = 'page_cache_updated_title'
+        self.article.save()
+        for url in urls:
+            response = self.assertCacheStatus(url, 'MISS')
+            self.assertContains(response, 'page_cache_updated_title')
+
+        # 他のユーザの投稿記事一覧は無効にならない
+        self.assertCacheStatus(reverse('users:articles', kwargs={'username': self.reader.username}), 'MISS')
+        Article.objects.get(pk=self.article.pk).save()
+        self.assertCacheStatus(reverse('users:articles', kwargs={'username': self.reader.username}), 'HIT')
+
+    # フォロー関係・プロフィールの変更によってユーザを表示しているページが無効になる
+    def test_success_invalidate_user(self):
+        profile_url = reverse('users:articles', kwargs={'username': self.author.username})
+        article_url = reverse('articles:article', kwargs={'pk': self.article.pk})
+        self.assertCacheStatus(profile_url, 'MISS')
+        self.assertCacheStatus(article_url, 'MISS')
+
+        Relation.objects.create(follower=self.reader, followee=self.author)
+        self.assertCacheStatus(profile_url, 'MISS')
+        self.assertCacheStatus(article_url, 'HIT')
+
+        self.author.profile_message = 'page_cache_profile_message'
+        self.author.save()
+        self.assertCacheStatus(profile_url, 'MISS')
+        self.assertCacheStatus(article_url, 'MISS')
+
+        # 最終ログイン日時の更新では無効にならない
+        self.client.login(username='page_cache_author', password='p4gecache')
+        self.client.logout()
+        self.assertCacheStatus(article_url, 'HIT')
+
+
+@override_settings(AXES_ENABLED=False, CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'},
+})
+class LocMemPageCacheTest(PageCacheTestMixin, TestCase):
+    pass
+
+
+@override_settings(AXES_ENABLED=False, CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+                'LOCATION': tempfile.mkdtemp()},
+})
+class FileBasedPageCacheTest(PageCacheTestMixin, TestCase):
+    pass
+
+
+@override_settings(AXES_ENABLED=False, CACHES={
+    'default': {'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+                'LOCATION': 'page_cache_test_table'},
+})
+class DatabasePageCacheTest(PageCacheTestMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('createcachetable', verbosity=0)
+        super().setUpTestData()
@@ -0,0 +1,132 @@
+import time
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.contrib.sessions.models import Session
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from articles.models import Article
+from .databases import ExtraSQLiteDatabasesMixin
+from ..page_cache import ARTICLES_TAG, article_tag, get_page_cache, invalidate_tags, tag_bumped_key
+from ..replicas import REPLICA_PIN_SESSION_KEY, ReplicaRouter, use_replicas
+
+User = get_user_model()
+
+REPLICAS = ['replica_test1', 'replica_test2']
+
+
+@override_settings(AXES_ENABLED=False, DATABASE_REPLICAS=REPLICAS)
+class ReplicaRouterTest(ExtraSQLiteDatabasesMixin, TestCase):
+    extra_databases = REPLICAS
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='replica_reader', email='replica_reader@test.com',
+                                              password='rep1ica1234')
+        cls.author = User.objects.create_user(username='replica_author', email='replica_author@test.com',
+                                              password='rep1ica1234')
+        cls.article = Article.objects.create(author=cls.author, title='replica_title', content='replica')
+
+    def replicate(self, *objects, aliases=REPLICAS):
+        # プライマリの行をシグナルを送信せずにレプリカへ複製する
+        self.copy_rows(*objects, aliases=aliases)
+
+    def get(self, url, **kwargs):
+        # リクエストの中で各データベースに発行されたクエリを記録する
+        return self.capture_queries(self.client.get, url, **kwargs)
+
+    # ブロックの中の読み込みのみをレプリカに振り分け,書き込みとセッションは常にプライマリで行う
+    def test_success_route(self):
+        router = ReplicaRouter()
+        self.assertEqual(router.db_for_read(Article), 'default')
+        with use_replicas():
+            self.assertIn(router.db_for_read(Article), REPLICAS)
+            self.assertEqual(router.db_for_read(Session), 'default')
+            self.assertEqual(router.db_for_write(Article), 'default')
+            with override_settings(DATABASE_REPLICAS=[]):
+                self.assertEqual(router.db_for_read(Article), 'default')
+
+        # レプリカから読み込んだインスタンスを保存する場合もプライマリに書き込む
+        self.replicate(self.author, self.article, aliases=REPLICAS[:1])
+        with override_settings(DATABASE_REPLICAS=REPLICAS[:1]), use_replicas():
+            article = Article.objects.get(pk=self.article.pk)
+        self.assertEqual(article._state.db, REPLICAS[0])
+        article.title = 'replica_updated'
+        article.save()
+        self.assertEqual(Article.objects.get(pk=self.article.pk).title, 'replica_updated')
+        self.assertEqual(Article.objects.using(REPLICAS[0]).get(pk=self.article.pk).title, 'replica_title')
+
+    # GETによる一覧ページの表示はレプリカの内容を読み込む
+    def test_success_list_reads_replica(self):
+        self.replicate(self.author, self.article)
+        stale = Article(pk=self.article.pk + 100, author=self.author, title='replica_only', content='replica')
+        self.replicate(stale)
+
+        response = self.get(reverse('articles:articles'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('replica_only', [article.title for article in response.context['article_list']])
+        self.assertEqual(self.count_queries('default', 'articles_article'), 0)
+        self.assertGreater(sum(self.count_queries(alias, 'articles_article') for alias in REPLICAS), 0)
+
+    # 書き込みを行ったセッションは一定時間プライマリから読み込み,書き込んだ内容がすぐに表示される
+    def test_success_pin_after_write(self):
+        self.replicate(self.reader, self.author, self.article)
+        self.client.force_login(self.reader)
+        url = reverse('users:favorites', kwargs={'username': self.reader.username})
+
+        self.get(url)
+        self.assertEqual(self.count_queries('default', 'articles_article'), 0)
+
+        self.client.post(reverse('articles:favorite', kwargs={'pk': self.article.pk}),
+                         {'username': self.reader.username}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertIn(REPLICA_PIN_SESSION_KEY, self.client.session)
+
+        response = self.get(url)
+        self.assertEqual([article.pk for article in response.context['article_list']], [self.article.pk])
+        self.assertFalse(any(self.captured[alias] for alias in REPLICAS))
+
+        # 期限を過ぎた場合はレプリカから読み込む
+        with mock.patch('common.replicas.time.time', return_value=time.time() + 3600):
+            response = self.get(url)
+        self.assertEqual(list(response.context['article_list']), [])
+        self.assertEqual(self.count_queries('default', 'articles_article'), 0)
+
+    # 更新を反映していないレプリカから読み込んだページは,更新からREPLICA_PIN_SECONDSの間はキャッシュせずETagも付与しない
+    def test_success_skip_cache_from_lagging_replica(self):
+        get_page_cache().clear()
+        self.replicate(self.author, self.article)
+        url = reverse('articles:articles')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'MISS')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+
+        # プライマリのみを更新し,レプリカは遅延して更新前の行を保持する
+        Article.objects.filter(pk=self.article.pk).update(title='replica_updated')
+        invalidate_tags(ARTICLES_TAG, article_tag(self.article.pk))
+        for _ in range(2):
+            response = self.get(url)
+            self.assertEqual([article.title for article in response.context['article_list']], ['replica_title'])
+            self.assertEqual(response['X-Page-Cache'], 'MISS')
+            self.assertFalse(response.has_header('ETag'))
+
+        # 期限を過ぎた後は,レプリカが反映した内容を再びキャッシュする
+        for alias in REPLICAS:
+            Article.objects.using(alias).filter(pk=self.article.pk).update(title='replica_updated')
+        get_page_cache().delete_many([tag_bumped_key(tag) for tag in (ARTICLES_TAG, article_tag(self.article.pk))])
+        response = self.client.get(url)
+        self.assertEqual([article.title for article in response.context['article_list']], ['replica_updated'])
+        self.assertTrue(response.has_header('ETag'))
+        self.assertContains(self.client.get(url), 'replica_updated')
+        self.assertEqual(self.client.get(url)['X-Page-Cache'], 'HIT')
+
+    # レプリカを設定していない場合はプライマリのみを利用し,セッションに書き込まない
+    @override_settings(DATABASE_REPLICAS=[])
+    def test_success_without_replicas(self):
+        self.client.force_login(self.reader)
+        self.client.post(reverse('articles:favorite', kwargs={'pk': self.article.pk}),
+                         {'username': self.reader.username}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertNotIn(REPLICA_PIN_SESSION_KEY, self.client.session)
+
+        self.get(reverse('articles:articles'))
+        self.assertFalse(any(self.captured[alias] for alias in REPLICAS))
+        self.assertGreater(self.count_queries('default', 'articles_article'), 0)
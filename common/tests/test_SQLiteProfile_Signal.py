@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connections
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.test import SimpleTestCase, override_settings
+
+from ..sqlite import get_sqlite_pragmas
+
+
+class SQLiteProfileTest(SimpleTestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+
+    def connect(self):
+        # テスト用データベースとは別のファイルに接続し,connection_createdを送信させる
+        settings_dict = dict(connections['default'].settings_dict,
+                             NAME=os.path.join(self.directory, 'profile.sqlite3'))
+        wrapper = DatabaseWrapper(settings_dict, alias='sqlite_profile_test')
+        wrapper.ensure_connection()
+        self.addCleanup(wrapper.close)
+        return wrapper
+
+    def pragma(self, wrapper, name):
+        return wrapper.connection.execute('PRAGMA {}'.format(name)).fetchone()[0]
+
+    # 既定の組では,SQLiteの既定のPRAGMAのまま接続する
+    @override_settings(SQLITE_PROFILE='default')
+    def test_success_default_profile(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'delete')
+        # synchronous=FULL
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 2)
+
+    # performanceの組では,接続の度に先行書き込みログ・fsyncの頻度・キャッシュ・ロックの待機時間を設定する
+    @override_settings(SQLITE_PROFILE='performance')
+    def test_success_performance_profile(self):
+        wrapper = self.connect()
+        self.assertEqual(self.pragma(wrapper, 'journal_mode'), 'wal')
+        # synchronous=NORMAL
+        self.assertEqual(self.pragma(wrapper, 'synchronous'), 1)
+        self.assertEqual(self.pragma(wrapper, 'busy_timeout'), 5000)
+        self.assertEqual(self.pragma(wrapper, 'cache_size'), -65536)
+        self.assertEqual(self.pragma(wrapper, 'mmap_size'), 268435456)
+
+    # SQLITE_PRAGMASによって組の値を個別に上書きし,存在しない組は設定の誤りとする
+    def test_success_override_pragmas(self):
+        with override_settings(SQLITE_PROFILE='performance', SQLITE_PRAGMAS={'busy_timeout': 100}):
+            self.assertEqual(self.pragma(self.connect(), 'busy_timeout'), 100)
+            self.assertEqual(get_sqlite_pragmas()['journal_mode'], 'WAL')
+
+        with override_settings(SQLITE_PROFILE='fast'):
+            with self.assertRaises(ImproperlyConfigured):
+                get_sqlite_pragmas()
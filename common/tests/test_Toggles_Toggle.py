@@ -0,0 +1,120 @@
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models import QuerySet
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from articles.models import Article
+from authenticate.models import Relation
+from ..toggles import delete_rows, insert_rows, toggle_row
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False)
+class ToggleTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='toggle_reader', email='toggle_reader@test.com',
+                                              password='t0ggle1234')
+        cls.author = User.objects.create_user(username='toggle_author', email='toggle_author@test.com',
+                                              password='t0ggle1234')
+        cls.article = Article.objects.create(author=cls.author, title='toggle_title', content='toggle')
+
+    def setUp(self):
+        self.client.force_login(self.reader)
+        # セッションとユーザの読み込みを済ませ,トグルで実行される文のみを数える
+        self.client.get(reverse('articles:articles'))
+
+    def post_toggle(self, url, payload):
+        """
+        トグルを送信し,結果とセッション・ログインユーザの読み込みとセーブポイントを除いて実行された文を返す
+        """
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, payload, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        statements = [query['sql'] for query in queries
+                      if not query['sql'].startswith(('SAVEPOINT', 'RELEASE SAVEPOINT'))][2:]
+        return response.json()['data']['status'], statements
+
+    def statements(self, queries, keyword):
+        return [sql for sql in queries if sql.startswith(keyword)]
+
+    # フォロー・解除は存在の確認を行わず,行の削除もしくは作成と1回の件数の更新のみを行う
+    def test_success_follow_statements(self):
+        url = reverse('users:follow', kwargs={'username': self.author.username})
+        status, queries = self.post_toggle(url, {'follower': self.reader.username})
+        self.assertEqual(status, 'follow')
+        # フォロー対象の主キー,削除,作成,件数の更新,タイムラインへの書き込み(フォロワー数と記事の取得,作成)
+        self.assertEqual(len(queries), 7)
+        self.assertEqual(len(self.statements(queries, 'DELETE FROM "authenticate_relation"')), 1)
+        self.assertEqual(len(self.statements(queries, 'INSERT INTO "authenticate_relation"')), 1)
+        self.assertEqual(len(self.statements(queries, 'UPDATE')), 1)
+
+        status, queries = self.post_toggle(url, {'follower': self.reader.username})
+        self.assertEqual(status, 'notfollow')
+        # フォロー対象の主キー,削除,タイムラインからの削除,件数の更新
+        self.assertEqual(len(queries), 4)
+        self.assertEqual(len(self.statements(queries, 'DELETE FROM "authenticate_relation"')), 1)
+        self.assertFalse(self.statements(queries, 'INSERT'))
+
+        self.author.refresh_from_db()
+        self.assertEqual(self.author.follower_count, 0)
+
+    # お気に入りの追加・削除は中間テーブルのみを書き換え,記事の行を保存し直さない
+    def test_success_favorite_statements(self):
+        url = reverse('articles:favorite', kwargs={'pk': self.article.pk})
+        status, queries = self.post_toggle(url, {'username': self.reader.username})
+        self.assertEqual(status, 'favorited')
+        # 記事の存在の確認,削除,作成,ユーザと記事の件数の更新
+        self.assertEqual(len(queries), 5)
+
+        status, queries = self.post_toggle(url, {'username': self.reader.username})
+        self.assertEqual(status, 'notfavorited')
+        # 記事の存在の確認,削除,ユーザと記事の件数の更新
+        self.assertEqual(len(queries), 4)
+        self.assertFalse(self.statements(queries, 'UPDATE "articles_article" SET "title"'))
+
+        self.article.refresh_from_db()
+        self.assertEqual(self.article.favorite_count, 0)
+        self.assertFalse(self.article.favorite_users.exists())
+
+    # 同時に作成された行はユニーク制約によって重複せず,件数も変更しない
+    def test_success_concurrent_create(self):
+        Relation.objects.create(follower=self.reader, followee=self.author)
+        # 削除の後に他のリクエストが作成した状態を,削除した行数を0とする事で再現する
+        with mock.patch('django.db.models.query.QuerySet._raw_delete', return_value=0):
+            self.assertEqual(toggle_row(Relation, follower_id=self.reader.pk, followee_id=self.author.pk),
+                             (True, False))
+        self.assertEqual(Relation.objects.filter(follower=self.reader, followee=self.author).count(), 1)
+
+        self.assertEqual(toggle_row(Relation, follower_id=self.reader.pk, followee_id=self.author.pk),
+                         (False, True))
+        self.assertEqual(toggle_row(Relation, follower_id=self.reader.pk, followee_id=self.author.pk),
+                         (True, True))
+
+    # 一括での作成・削除は,同時に作成・削除された行を除いて実際に変更した行のみを返す
+    def test_success_concurrent_bulk_rows(self):
+        followees = [self.author, User.objects.create_user(username='toggle_other', email='toggle_other@test.com',
+                                                           password='t0ggle1234')]
+        # 状態を確認した後に他のリクエストが作成した行は,ユニーク制約に違反するため作成した行に含めない
+        Relation.objects.create(follower=self.reader, followee=followees[0])
+        created = insert_rows(Relation, [Relation(follower=self.reader, followee=followee) for followee in followees])
+        self.assertEqual([relation.followee_id for relation in created], [followees[1].pk])
+        self.assertEqual(Relation.objects.filter(follower=self.reader).count(), 2)
+
+        # 存在を確認した後に他のリクエストが削除した行は,削除した行に含めない
+        values_list = QuerySet.values_list
+
+        def delete_after_check(queryset, *args, **kwargs):
+            existing = list(values_list(queryset, *args, **kwargs))
+            Relation.objects.filter(follower=self.reader, followee=followees[1]).delete()
+            return existing
+
+        with mock.patch.object(QuerySet, 'values_list', delete_after_check):
+            removed = delete_rows(Relation, 'followee_id', [followee.pk for followee in followees],
+                                  follower=self.reader)
+        self.assertEqual(removed, [followees[0].pk])
+        self.assertFalse(Relation.objects.filter(follower=self.reader).exists())
@@ -0,0 +1,131 @@
+from django.db import IntegrityError, router, transaction
+from django.db.models.signals import post_delete
+
+
+def toggle_row(model, using=None, **fields):
+    """
+    fieldsに一致する行が存在する場合は削除し,存在しない場合は作成する
+
+    事前に存在を確認せずにDELETE文が削除した行数によって判定し,作成時の重複はユニーク制約に任せるため,
+    同じ操作が同時に行われても行は重複せず,実際に行を変更した呼び出しのみchangedがTrueとなる
+    件数のカラムはchangedがTrueの場合のみ増減させる
+
+    Parameters
+    ----------
+    model : Model
+        fieldsの組にユニーク制約を持つモデル
+    using : str
+        行を変更するデータベースのエイリアス,Noneの場合はルータに任せる
+    fields : dict
+        行を特定するカラムと値
+
+    Returns
+    -------
+    exists : bool
+        操作後に行が存在する場合はTrue
+    changed : bool
+        この呼び出しによって行を作成もしくは削除した場合はTrue
+    """
+    manager = model._default_manager.db_manager(using)
+    queryset = manager.filter(**fields)
+    # 行を読み込まずにDELETE文1つで削除し,受信側には行を特定するカラムのみを持つインスタンスを渡す
+    if queryset._raw_delete(queryset.db):
+        post_delete.send(sender=model, instance=model(**fields), using=queryset.db)
+        return False, True
+
+    try:
+        # 同時に作成された場合はユニーク制約の違反となるため,セーブポイントまでを取り消す
+        with transaction.atomic(using=queryset.db):
+            manager.create(**fields)
+    except IntegrityError:
+        return True, False
+    return True, True
+
+
+class RowsChanged(Exception):
+    pass
+
+
+def insert_rows(model, rows, using=None):
+    """
+    rowsをまとめて作成し,この呼び出しによって実際に作成した行を返す
+
+    同時に作成された行が含まれユニーク制約に違反した場合は,セーブポイントまで取り消して1行ずつ作成し直し,
+    違反した行は作成した行に含めない
+
+    Parameters
+    ----------
+    model : Model
+        行を特定するカラムの組にユニーク制約を持つモデル
+    rows : list
+        作成するインスタンス
+    using : str
+        行を作成するデータベースのエイリアス,Noneの場合はルータに任せる
+
+    Returns
+    -------
+    created : list
+        実際に作成したインスタンス
+    """
+    rows = list(rows)
+    if not rows:
+        return []
+    using = using or router.db_for_write(model)
+    manager = model._default_manager.db_manager(using)
+    try:
+        with transaction.atomic(using=using):
+            manager.bulk_create(rows)
+        return rows
+    except IntegrityError:
+        pass
+
+    created = []
+    for row in rows:
+        try:
+            with transaction.atomic(using=using):
+                manager.bulk_create([row])
+        except IntegrityError:
+            continue
+        created.append(row)
+    return created
+
+
+def delete_rows(model, field, values, using=None, **fields):
+    """
+    fieldsに一致し,カラムfieldの値がvaluesのいずれかである行を削除し,この呼び出しによって実際に削除した行の値を返す
+
+    存在する行をまとめて削除し,削除した行数が存在を確認した行数と異なる(同時に削除された行がある)場合は,
+    セーブポイントまで取り消して1行ずつ削除し直す
+
+    Parameters
+    ----------
+    model : Model
+        削除する行のモデル
+    field : str
+        削除する行ごとに異なるカラム
+    values : list
+        削除する行のfieldの値
+    using : str
+        行を削除するデータベースのエイリアス,Noneの場合はルータに任せる
+    fields : dict
+        削除する全ての行に共通するカラムと値
+
+    Returns
+    -------
+    deleted : list
+        実際に削除した行のfieldの値
+    """
+    using = using or router.db_for_write(model)
+    queryset = model._default_manager.db_manager(using).filter(**fields)
+    existing = list(queryset.filter(**{'{}__in'.format(field): values}).values_list(field, flat=True))
+    if not existing:
+        return []
+    try:
+        with transaction.atomic(using=using):
+            _, deleted = queryset.filter(**{'{}__in'.format(field): existing}).delete()
+            if deleted.get(model._meta.label, 0) != len(existing):
+                raise RowsChanged
+        return existing
+    except RowsChanged:
+        pass
+    return [value for value in existing if queryset.filter(**{field: value}).delete()[1].get(model._meta.label, 0)]
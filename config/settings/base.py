@@ -34,7 +34,9 @@ INSTALLED_APPS = [
     'axes',
     'authenticate',
     'articles',
-    'users'
+    'users',
+    'common',
+    'jobs',
 ]
 
 AUTHENTICATION_BACKENDS = [
@@ -44,10 +46,12 @@ AUTHENTICATION_BACKENDS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'common.connections.ConnectionPoolMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'common.replicas.ReplicaPinMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'axes.middleware.AxesMiddleware',
@@ -85,6 +89,30 @@ DATABASES = {
     }
 }
 
+# 一覧・詳細ページの読み込みを振り分けるレプリカのエイリアス(common.replicas),空の場合はプライマリのみを利用する
+DATABASE_REPLICAS = []
+
+# 記事・コメントを投稿者ごとに分散して保存するデータベースのエイリアス(articles.shards),空の場合は分散しない
+ARTICLE_SHARDS = []
+
+# 保存先を決められない記事以外のモデルはレプリカへの振り分けに任せるため,記事のルータを先に置く
+DATABASE_ROUTERS = ['articles.shards.ArticleShardRouter', 'common.replicas.ReplicaRouter']
+
+# 書き込みを行ったユーザの読み込みをプライマリに固定する秒数,レプリカの遅延より長くする
+REPLICA_PIN_SECONDS = 10
+
+# 持ち越した永続的な接続(CONN_MAX_AGE)をリクエストの開始時に疎通を確認してから利用する(common.connections)
+CONN_HEALTH_CHECKS = False
+# スレッドで並行してリクエストを処理するワーカで1つのプロセスが保持する接続の最大数(Noneの場合は制限しない)と,
+# 接続の枠が空くまで待機する秒数
+DATABASE_POOL_SIZE = None
+DATABASE_POOL_TIMEOUT = 10
+
+# SQLiteに接続する度に実行するPRAGMAの組(common.sqlite.SQLITE_PROFILES)と,組の値を個別に上書きするPRAGMA
+# 'performance'は先行書き込みログ(WAL)等によって,同時に書き込まれる場合のロックの待機とfsyncを減らす
+SQLITE_PROFILE = 'default'
+SQLITE_PRAGMAS = {}
+
 # Password validation
 # https://docs.djangoproject.com/en/3.2/ref/settings/#auth-password-validators
 
@@ -135,3 +163,64 @@ LOGOUT_REDIRECT_URL = 'articles:articles'
 AXES_ONLY_USER_FAILURES = True
 
 SESSION_COOKIE_HTTPONLY = True
+
+# 記事検索に利用するバックエンド
+# 'auto' の場合はSQLiteではFTS5,MySQLではFULLTEXTインデックスを利用する
+ARTICLE_SEARCH_BACKEND = 'auto'
+
+# articles.search.NgramSearchBackend を利用する場合のN-gramの文字数(2または3)
+ARTICLE_SEARCH_NGRAM_SIZE = 2
+
+# Trueの場合は一覧ページでページ番号の代わりにカーソルによるページネーションを行う
+# Falseの場合もURLパラメータにcursorを指定する事でカーソルによるページネーションを利用する事が出来る
+CURSOR_PAGINATION = False
+
+# 一覧ページの総件数をキャッシュする秒数
+PAGINATION_COUNT_CACHE_TIMEOUT = 300
+
+# 認証されていないユーザに対する記事一覧・記事・ユーザの投稿記事一覧のページをキャッシュする
+PAGE_CACHE_ENABLED = True
+
+# ページのキャッシュに利用するキャッシュの名前(CACHESのキー)とキャッシュする秒数
+PAGE_CACHE_ALIAS = 'default'
+PAGE_CACHE_TIMEOUT = 600
+
+# フォロワー数がこれを超えるユーザの記事はタイムラインに書き込まずに表示時に取得する
+TIMELINE_FANOUT_LIMIT = 10000
+
+# タイムラインへの書き込みで1回に書き込むフォロワーの数と,フォローした際に書き込む最近の記事の件数
+TIMELINE_FANOUT_BATCH_SIZE = 1000
+TIMELINE_BACKFILL = 20
+
+# フォローしているユーザの記事の2ページ目以降を組み立てる際に,投稿者ごとに取得して併合する投稿者数の上限
+# これを超える場合と最初のページはデータベースで並び替える(benchmark_feedによって環境ごとに計測して決める)
+FEED_MERGE_MAX_AUTHORS = 100
+
+# 一括フォロー・お気に入りのエンドポイントが1回のリクエストで受け付ける対象の最大数
+BULK_MAX_ITEMS = 100
+
+# アップロードされたアイコンから作成する縮小画像の一辺の長さ(px)
+ICON_RENDITION_SIZES = (25, 50, 100, 200)
+
+# アップロードされた画像の検証で読み込むヘッダの最大バイト数と,受け付ける最大の画素数・ファイルサイズ
+IMAGE_HEADER_MAX_BYTES = 256 * 1024
+IMAGE_MAX_PIXELS = 4096 * 4096
+ICON_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+
+# ジョブ(jobs)を失敗とするまでに実行する最大の回数と,再試行までの待機時間の基準(秒)
+JOBS_MAX_ATTEMPTS = 5
+JOBS_RETRY_DELAY = 10
+
+# 実行中のジョブをワーカが占有する秒数,これを過ぎても完了しないジョブは他のワーカが再び実行する
+JOBS_VISIBILITY_TIMEOUT = 300
+
+# run_jobsコマンドが同時に実行するジョブの数と,ジョブが無い場合に次に確認するまでの秒数
+JOBS_WORKERS = 4
+JOBS_POLL_INTERVAL = 1.0
+
+# 退会したユーザの行を削除する際に1回のトランザクションで削除する最大の行数と,1つのジョブで削除を行う最大の秒数
+USER_PURGE_BATCH_SIZE = 500
+USER_PURGE_TIME_BUDGET = 60
+
+# Trueの場合はジョブを登録せずにコミット後にその場で実行する(ワーカを起動しない開発環境向け)
+JOBS_ALWAYS_EAGER = False
@@ -44,5 +44,27 @@ DATABASES = {
         'PASSWORD': env('PASSWORD'),
         'HOST': env('HOST'),
         'PORT': env('PORT'),
+        # リクエストごとに接続し直さない様に,接続を一定の秒数だけ持ち越して再利用する
+        'CONN_MAX_AGE': env.int('CONN_MAX_AGE', default=60),
     }
 }
+
+# 持ち越した接続はリクエストの開始時に疎通を確認し,切断されていた場合は接続し直す
+CONN_HEALTH_CHECKS = True
+# スレッドで処理するワーカ(gunicornのgthread等)では,スレッド数ではなくこの数で接続数を制限する
+DATABASE_POOL_SIZE = env.int('DATABASE_POOL_SIZE', default=None)
+DATABASE_POOL_TIMEOUT = env.float('DATABASE_POOL_TIMEOUT', default=10)
+# 1台のサーバでSQLite(ENGINE)を利用する場合のPRAGMAの組,他のデータベースでは何もしない
+SQLITE_PROFILE = env('SQLITE_PROFILE', default='performance')
+
+# 読み込みを振り分けるレプリカのホスト(カンマ区切り),プライマリと同じ認証情報で接続する
+# テストではプライマリのテスト用データベースをそのまま利用する
+for index, host in enumerate(env.list('REPLICA_HOSTS', default=[]), start=1):
+    DATABASES['replica{}'.format(index)] = dict(DATABASES['default'], HOST=host, TEST={'MIRROR': 'default'})
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != 'default']
+
+# 記事・コメントを投稿者ごとに分散して保存するデータベースのホスト(カンマ区切り,articles.shards)
+# 保存先の番号は記事の主キーに含まれるため,運用を始めた後にホストの順番を変更しない
+for index, host in enumerate(env.list('ARTICLE_SHARD_HOSTS', default=[]), start=1):
+    DATABASES['shard{}'.format(index)] = dict(DATABASES['default'], HOST=host)
+ARTICLE_SHARDS = [alias for alias in DATABASES if alias.startswith('shard')]
@@ -0,0 +1,12 @@
+from django.contrib import admin
+
+from .models import Job
+
+
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('task', 'status', 'attempts', 'max_attempts', 'run_at', 'created_at')
+    list_filter = ('status', 'task')
+    readonly_fields = ('locked_until', 'lock_token', 'last_error')
+
+
+admin.site.register(Job, JobAdmin)
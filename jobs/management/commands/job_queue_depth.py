@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from jobs.queue import get_queue_stats
+
+
+class Command(BaseCommand):
+    help = '実行を待っているジョブの数(キューの深さ)と状態ごとのジョブの数を表示する'
+
+    def handle(self, *args, **options):
+        stats = get_queue_stats()
+        self.stdout.write('depth: {}'.format(stats['depth']))
+        self.stdout.write('oldest age: {:.1f}s'.format(stats['oldest_age']))
+        self.stdout.write('queued: {}'.format(stats['queued']))
+        self.stdout.write('running: {}'.format(stats['running']))
+        self.stdout.write('failed: {}'.format(stats['failed']))
@@ -0,0 +1,76 @@
+import multiprocessing
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from jobs.queue import claim_jobs, get_queue_stats, get_visibility_timeout
+from jobs.worker import execute, init_process
+
+
+class Command(BaseCommand):
+    help = 'データベースに登録されたジョブをスレッドプールまたはプロセスプールで実行する'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=getattr(settings, 'JOBS_WORKERS', 4),
+                            help='同時に実行するジョブの数')
+        parser.add_argument('--pool', choices=('thread', 'process'), default='thread',
+                            help='I/Oが中心のジョブはthread,画像処理等のCPUが中心のジョブはprocess')
+        parser.add_argument('--poll-interval', type=float, default=getattr(settings, 'JOBS_POLL_INTERVAL', 1.0),
+                            help='実行するジョブが無い場合に次に確認するまでの秒数')
+        parser.add_argument('--visibility-timeout', type=int, default=None,
+                            help='ジョブを占有する秒数,これを過ぎても完了しないジョブは他のワーカが再び実行する')
+        parser.add_argument('--once', action='store_true',
+                            help='実行可能なジョブが無くなった時点で終了する')
+
+    def get_executor(self, pool, workers):
+        if pool == 'process':
+            # 親プロセスのデータベース接続を子プロセスに引き継がない様にforkではなくspawnで起動する
+            return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                                       initializer=init_process)
+        return ThreadPoolExecutor(max_workers=workers)
+
+    def handle(self, *args, **options):
+        workers = options['workers']
+        visibility_timeout = options['visibility_timeout'] or get_visibility_timeout()
+        stats = get_queue_stats()
+        self.stdout.write('queue depth: {} (running: {}, failed: {})'.format(
+            stats['depth'], stats['running'], stats['failed']))
+
+        succeeded = failed = 0
+        pending = set()
+        executor = self.get_executor(options['pool'], workers)
+        try:
+            while True:
+                # 空いているワーカの数だけジョブを占有して実行する
+                if len(pending) < workers:
+                    close_old_connections()
+                    for job in claim_jobs(workers - len(pending), visibility_timeout):
+                        pending.add(executor.submit(execute, job.pk, job.lock_token))
+
+                if not pending:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                done, pending = wait(pending, timeout=options['poll_interval'], return_when=FIRST_COMPLETED)
+                for future in done:
+                    try:
+                        ok = future.result()
+                    except Exception as e:
+                        # ワーカプロセスが異常終了した場合,ジョブは占有の期限が過ぎた後に再び実行される
+                        self.stderr.write('worker error: {}'.format(e))
+                        ok = False
+                    if ok:
+                        succeeded += 1
+                    else:
+                        failed += 1
+        except KeyboardInterrupt:
+            self.stdout.write('実行中のジョブの完了を待っています')
+        finally:
+            executor.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS('succeeded: {}, failed: {}'.format(succeeded, failed)))
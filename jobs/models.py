@@ -0,0 +1,43 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """
+    ワーカによって実行されるのを待つジョブ
+
+    成功したジョブは行を削除し,実行待ち・実行中・失敗したジョブのみを保持する
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    FAILED = 'failed'
+    STATUS_CHOICES = (
+        (QUEUED, 'queued'),
+        (RUNNING, 'running'),
+        (FAILED, 'failed'),
+    )
+
+    # jobs.queue.taskによって登録したタスクの名前
+    task = models.CharField(max_length=200)
+    args = models.JSONField(default=list, blank=True)
+    kwargs = models.JSONField(default=dict, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveIntegerField(default=0)
+    max_attempts = models.PositiveIntegerField(default=1)
+    # 実行を開始する事が出来る日時(再試行の際は待機時間の分だけ遅らせる)
+    run_at = models.DateTimeField(default=timezone.now)
+    # 実行中のジョブをワーカが占有する期限,過ぎた場合は他のワーカが再び実行する
+    locked_until = models.DateTimeField(null=True, blank=True)
+    # ジョブを取得したワーカを区別するための値
+    lock_token = models.CharField(max_length=32, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        ordering = ['run_at', 'id']
+        indexes = [
+            models.Index(fields=['status', 'run_at'], name='job_status_run_at_idx'),
+        ]
+
+    def __str__(self):
+        return '{} ({})'.format(self.task, self.status)
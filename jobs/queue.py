@@ -0,0 +1,234 @@
+import logging
+import traceback
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, F, Min, Q
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# ジョブを失敗とするまでに実行する最大の回数
+DEFAULT_JOBS_MAX_ATTEMPTS = 5
+# 再試行までの待機時間の基準(秒),実行した回数ごとに2倍にする
+DEFAULT_JOBS_RETRY_DELAY = 10
+# 実行中のジョブをワーカが占有する秒数,これを過ぎても完了しないジョブは再び実行する
+DEFAULT_JOBS_VISIBILITY_TIMEOUT = 300
+
+_tasks = {}
+
+
+class Task:
+    """
+    ジョブとして実行する事が出来る関数
+
+    引数はデータベースにJSONとして保存するため,モデル等ではなく主キーや文字列を渡す
+
+    Parameters
+    ----------
+    func : callable
+        ジョブとして実行する関数
+    name : str
+        ジョブに保存するタスクの名前
+    max_attempts : int
+        失敗とするまでに実行する最大の回数
+    """
+
+    def __init__(self, func, name, max_attempts=None):
+        self.func = func
+        self.name = name
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.func(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """
+        タスクをジョブとして登録し,すぐに戻る
+        """
+        return enqueue(self, args, kwargs)
+
+
+def task(name=None, max_attempts=None):
+    """
+    関数をタスクとして登録するデコレータ
+    """
+    def decorator(func):
+        registered = Task(func, name or '{}.{}'.format(func.__module__, func.__name__), max_attempts)
+        _tasks[registered.name] = registered
+        return registered
+    return decorator
+
+
+def get_task(name):
+    try:
+        return _tasks[name]
+    except KeyError:
+        raise KeyError('task {} is not registered'.format(name))
+
+
+def get_visibility_timeout():
+    return getattr(settings, 'JOBS_VISIBILITY_TIMEOUT', DEFAULT_JOBS_VISIBILITY_TIMEOUT)
+
+
+def enqueue(registered, args=(), kwargs=None, run_at=None):
+    """
+    ジョブを登録する
+
+    トランザクションの中で呼び出された場合はジョブの行も同じトランザクションで保存されるため,
+    コミットされるまでワーカには見えず,ロールバックされた場合はジョブも取り消される
+    JOBS_ALWAYS_EAGERがTrueの場合は登録せずにコミット後にその場で実行する
+
+    Parameters
+    ----------
+    registered : Task
+        実行するタスク
+    args : tuple
+        タスクに渡す位置引数
+    kwargs : dict
+        タスクに渡すキーワード引数
+    run_at : datetime
+        実行を開始する日時,指定しない場合はすぐに実行する
+
+    Returns
+    -------
+    job : Job
+        登録したジョブ,その場で実行した場合はNone
+    """
+    kwargs = kwargs or {}
+    if getattr(settings, 'JOBS_ALWAYS_EAGER', False):
+        transaction.on_commit(lambda: registered(*args, **kwargs))
+        return None
+
+    max_attempts = registered.max_attempts or getattr(settings, 'JOBS_MAX_ATTEMPTS', DEFAULT_JOBS_MAX_ATTEMPTS)
+    return Job.objects.create(task=registered.name, args=list(args), kwargs=kwargs,
+                              max_attempts=max_attempts, run_at=run_at or timezone.now())
+
+
+def available_jobs(now):
+    # 実行を待っているジョブと,占有の期限が過ぎた実行中のジョブを取得する事が出来る
+    return Job.objects.filter(Q(status=Job.QUEUED, run_at__lte=now)
+                              | Q(status=Job.RUNNING, locked_until__lt=now, attempts__lt=F('max_attempts')))
+
+
+def fail_expired_jobs(now=None):
+    """
+    最大の回数まで実行したにも関わらず占有の期限が過ぎたジョブを失敗とする
+    """
+    now = now or timezone.now()
+    return Job.objects.filter(status=Job.RUNNING, locked_until__lt=now, attempts__gte=F('max_attempts')) \
+        .update(status=Job.FAILED, locked_until=None, last_error='visibility timeout expired')
+
+
+def claim_jobs(limit, visibility_timeout=None):
+    """
+    実行するジョブを最大limit件取得し,他のワーカに取得されない様に占有する
+
+    行ロックを利用せずに,取得した時点の状態と一致する場合のみ更新する条件付きのUPDATEで占有するため,
+    SQLite・MySQLのいずれでも複数のワーカが同じジョブを重複して実行する事は無い
+
+    Returns
+    -------
+    jobs : list
+        占有したジョブのリスト,lock_tokenはジョブを完了する際に利用する
+    """
+    now = timezone.now()
+    visibility_timeout = visibility_timeout or get_visibility_timeout()
+    fail_expired_jobs(now)
+
+    claimed = []
+    # 他のワーカと競合して占有出来なかった分を補うため,多めに候補を取得する
+    candidates = available_jobs(now).order_by('run_at', 'id').values_list('pk', flat=True)[:limit * 2]
+    for pk in candidates:
+        if len(claimed) >= limit:
+            break
+        token = uuid.uuid4().hex
+        updated = available_jobs(now).filter(pk=pk).update(
+            status=Job.RUNNING, attempts=F('attempts') + 1, lock_token=token,
+            locked_until=now + timedelta(seconds=visibility_timeout))
+        if updated:
+            claimed.append(Job.objects.get(pk=pk))
+    return claimed
+
+
+def run_job(pk, token):
+    """
+    占有したジョブを実行する
+
+    成功した場合は行を削除し,失敗した場合は回数に応じて待機時間を延ばして再試行する
+    占有の期限が過ぎて他のワーカが取得し直したジョブの結果は保存しない
+    プロセスプールのワーカプロセスからも呼び出すため,主キーと占有した際の値のみを受け取る
+
+    Returns
+    -------
+    succeeded : bool
+        ジョブが成功したか否か
+    """
+    job = Job.objects.filter(pk=pk, lock_token=token).first()
+    if job is None:
+        return False
+    try:
+        get_task(job.task)(*job.args, **job.kwargs)
+    except Exception:
+        logger.exception('job %s (%s) failed', job.pk, job.task)
+        retry(job, token, traceback.format_exc())
+        return False
+
+    Job.objects.filter(pk=pk, lock_token=token).delete()
+    return True
+
+
+def retry(job, token, error):
+    if job.attempts >= job.max_attempts:
+        Job.objects.filter(pk=job.pk, lock_token=token) \
+            .update(status=Job.FAILED, locked_until=None, last_error=error)
+        return
+
+    delay = getattr(settings, 'JOBS_RETRY_DELAY', DEFAULT_JOBS_RETRY_DELAY) * 2 ** (job.attempts - 1)
+    Job.objects.filter(pk=job.pk, lock_token=token) \
+        .update(status=Job.QUEUED, locked_until=None, last_error=error,
+                run_at=timezone.now() + timedelta(seconds=delay))
+
+
+def run_pending_jobs(limit=None):
+    """
+    実行を待っているジョブを現在のスレッドで順に実行する,テストやワーカを起動しない環境で利用する
+
+    Returns
+    -------
+    count : int
+        実行したジョブの数
+    """
+    count = 0
+    while limit is None or count < limit:
+        jobs = claim_jobs(1)
+        if not jobs:
+            break
+        run_job(jobs[0].pk, jobs[0].lock_token)
+        count += 1
+    return count
+
+
+def get_queue_stats():
+    """
+    キューの深さ(実行を待っているジョブの数)と,状態ごとのジョブの数を返す
+
+    Returns
+    -------
+    stats : dict
+        queued, running, failedの件数と,実行可能なジョブの数(depth),
+        最も長く実行を待っているジョブの待機秒数(oldest_age)
+    """
+    now = timezone.now()
+    stats = {status: 0 for status, _ in Job.STATUS_CHOICES}
+    for row in Job.objects.order_by().values('status').annotate(count=Count('id')):
+        stats[row['status']] = row['count']
+
+    due = Job.objects.filter(status=Job.QUEUED, run_at__lte=now).aggregate(depth=Count('id'), oldest=Min('run_at'))
+    stats['depth'] = due['depth']
+    stats['oldest_age'] = (now - due['oldest']).total_seconds() if due['oldest'] else 0.0
+    return stats
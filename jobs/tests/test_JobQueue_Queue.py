@@ -0,0 +1,136 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core import mail
+from django.core.management import call_command
+from django.db import transaction
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from ..models import Job
+from ..queue import claim_jobs, get_queue_stats, run_job, run_pending_jobs, task
+
+User = get_user_model()
+
+calls = []
+
+
+@task(name='jobs.tests.record_call')
+def record_call(value):
+    calls.append(value)
+
+
+@task(name='jobs.tests.always_fail', max_attempts=2)
+def always_fail():
+    raise RuntimeError('always fail')
+
+
+@override_settings(JOBS_RETRY_DELAY=10, JOBS_VISIBILITY_TIMEOUT=60)
+class JobQueueTest(TestCase):
+    def setUp(self):
+        calls.clear()
+
+    # 登録したジョブは実行されるまで残り,成功したジョブは削除される
+    def test_success_run(self):
+        job = record_call.delay('first')
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(run_pending_jobs(), 1)
+        self.assertEqual(calls, ['first'])
+        self.assertFalse(Job.objects.exists())
+
+    # ロールバックされたトランザクションの中で登録したジョブは取り消される
+    def test_success_rollback(self):
+        with self.assertRaises(RuntimeError):
+            with transaction.atomic():
+                record_call.delay('rolled back')
+                raise RuntimeError('rollback')
+        self.assertFalse(Job.objects.exists())
+
+    # 失敗したジョブは実行した回数に応じて待機時間を延ばして再試行し,最大の回数で失敗とする
+    def test_success_retry(self):
+        job = always_fail.delay()
+
+        before = timezone.now()
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.QUEUED)
+        self.assertEqual(job.attempts, 1)
+        self.assertIn('always fail', job.last_error)
+        self.assertGreaterEqual(job.run_at, before + timedelta(seconds=10))
+        # 待機時間が過ぎるまでは実行されない
+        self.assertEqual(run_pending_jobs(), 0)
+
+        Job.objects.filter(pk=job.pk).update(run_at=timezone.now())
+        self.assertEqual(run_pending_jobs(), 1)
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertEqual(job.attempts, 2)
+
+    # 占有されているジョブは他のワーカに取得されず,期限が過ぎた場合のみ再び取得される
+    def test_success_visibility_timeout(self):
+        record_call.delay('timeout')
+
+        first = claim_jobs(10)
+        self.assertEqual(len(first), 1)
+        self.assertEqual(claim_jobs(10), [])
+
+        Job.objects.filter(pk=first[0].pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        second = claim_jobs(10)
+        self.assertEqual([job.pk for job in second], [first[0].pk])
+        self.assertEqual(second[0].attempts, 2)
+
+        # 期限が過ぎた後に完了した最初のワーカの結果は保存しない
+        self.assertFalse(run_job(first[0].pk, first[0].lock_token))
+        self.assertTrue(Job.objects.filter(pk=first[0].pk, status=Job.RUNNING).exists())
+        self.assertTrue(run_job(second[0].pk, second[0].lock_token))
+        self.assertEqual(calls, ['timeout'])
+
+    # 最大の回数まで実行して期限が過ぎたジョブは失敗とする
+    def test_success_fail_expired(self):
+        always_fail.delay()
+        job = claim_jobs(1)[0]
+        Job.objects.filter(pk=job.pk).update(attempts=2, locked_until=timezone.now() - timedelta(seconds=1))
+
+        self.assertEqual(claim_jobs(1), [])
+        job.refresh_from_db()
+        self.assertEqual(job.status, Job.FAILED)
+
+    # キューの深さは実行可能なジョブの数を示す
+    def test_success_queue_stats(self):
+        record_call.delay('due')
+        record_call.delay('due')
+        Job.objects.create(task='jobs.tests.record_call', args=['later'],
+                           run_at=timezone.now() + timedelta(hours=1))
+        claim_jobs(1)
+
+        stats = get_queue_stats()
+        self.assertEqual(stats['depth'], 1)
+        self.assertEqual(stats['queued'], 2)
+        self.assertEqual(stats['running'], 1)
+        self.assertEqual(stats['failed'], 0)
+
+        out = StringIO()
+        call_command('job_queue_depth', stdout=out)
+        self.assertIn('depth: 1', out.getvalue())
+
+    # JOBS_ALWAYS_EAGERの場合はジョブを登録せずにコミット後に実行する
+    @override_settings(JOBS_ALWAYS_EAGER=True)
+    def test_success_eager(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertIsNone(record_call.delay('eager'))
+        self.assertEqual(calls, ['eager'])
+        self.assertFalse(Job.objects.exists())
+
+    # ユーザへのメールはジョブとして送信される
+    def test_success_email_user(self):
+        user = User.objects.create_user(username='job_queue_tester', email='job_queue_tester@test.com',
+                                        password='j0bqueue')
+        user.email_user('subject', 'message', 'from@test.com')
+        self.assertEqual(len(mail.outbox), 0)
+
+        run_pending_jobs()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ['job_queue_tester@test.com'])
@@ -0,0 +1,25 @@
+import django
+from django.db import close_old_connections
+
+# プロセスプールのワーカプロセスはこのモジュールを読み込んでから初期化するため,
+# モジュールの読み込み時にはモデルを参照しない
+
+
+def init_process():
+    # spawnで起動したワーカプロセスではDjangoの設定とアプリ(タスク)を読み込み直す
+    django.setup()
+
+
+def execute(pk, token):
+    """
+    ワーカのスレッド・プロセスでジョブを1つ実行する
+
+    リクエストと同様に,ジョブの前後で期限の切れたデータベースの接続を閉じる
+    """
+    from .queue import run_job
+
+    close_old_connections()
+    try:
+        return run_job(pk, token)
+    finally:
+        close_old_connections()
@@ -5,6 +5,7 @@ from django.core.exceptions import ValidationError
 from django.utils.translation import gettext_lazy as _
 
 from articles.models import Article, Tag
+from .images import HeaderOnlyImageField
 
 User = get_user_model()
 
@@ -59,10 +60,11 @@ class ArticleForm(forms.ModelForm):
 class UpdateProfileForm(forms.ModelForm):
     # [エラー] 画像ファイルをアップロードしなかった場合,'ImageFieldFile' object has no attribute 'image'が発生してしまう
     # iconが指定されなかった場合は現在のファイル名が指定されるためである
-    icon = forms.ImageField(label=_('Icon'),
-                            required=False,
-                            error_messages={'invalid': _('画像ファイルをアップロードしてください')},
-                            widget=forms.FileInput)
+    # 画像全体を読み込まない様に,ヘッダのみから形式と縦幅・横幅を取得する
+    icon = HeaderOnlyImageField(label=_('Icon'),
+                                required=False,
+                                error_messages={'invalid': _('画像ファイルをアップロードしてください')},
+                                widget=forms.FileInput)
 
     class Meta:
         model = User
@@ -82,7 +84,7 @@ class UpdateProfileForm(forms.ModelForm):
             raise ValidationError('画像ファイルをアップロードしてください')
 
         try:
-            if cleaned_icon.image.width > 1024 or cleaned_icon.image.height > 1024:
+            if cleaned_icon.image_header.width > 1024 or cleaned_icon.image_header.height > 1024:
                 raise ValidationError('縦幅・横幅が1024pxより大きい画像はアップロードする事が出来ません')
         except AttributeError:
             # ログインユーザの現在のアイコンと異なるファイルにも関わらず画像データが無い場合はエラーとする
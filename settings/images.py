@@ -0,0 +1,147 @@
+import warnings
+from collections import namedtuple
+
+from django import forms
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.translation import gettext_lazy as _
+from PIL import Image, UnidentifiedImageError
+
+# アイコンとしてアップロードする事が出来る画像の形式
+ICON_FORMATS = ('PNG', 'JPEG', 'GIF', 'WEBP')
+
+# ヘッダの読み込みに利用する最大のバイト数(JPEGのEXIFやPNGのテキストチャンク等を含む)
+DEFAULT_IMAGE_HEADER_MAX_BYTES = 256 * 1024
+# 展開した際の大きさが極端に大きい画像(解凍爆弾)とみなす画素数
+DEFAULT_IMAGE_MAX_PIXELS = 4096 * 4096
+# 1つのアップロードで受け付ける最大のバイト数
+DEFAULT_ICON_MAX_UPLOAD_SIZE = 5 * 1024 * 1024
+
+ImageHeader = namedtuple('ImageHeader', ['format', 'width', 'height'])
+
+
+class InvalidImage(Exception):
+    pass
+
+
+class BoundedReader:
+    """
+    読み込む事が出来るバイト数に上限を設けたファイルのラッパー
+
+    Pillowは画像を開く際にヘッダのみを読み込むが,ヘッダが巨大な画像の場合に
+    ファイル全体を読み込まない様に,上限を超えて読み込もうとした時点で例外を発生させる
+    """
+
+    def __init__(self, file, max_bytes):
+        self.file = file
+        self.max_bytes = max_bytes
+
+    def read(self, size=-1):
+        remaining = self.max_bytes - self.file.tell()
+        if size is None or size < 0 or size > remaining:
+            if remaining <= 0:
+                raise InvalidImage('image header is too large')
+            size = remaining
+        return self.file.read(size)
+
+    def seek(self, offset, whence=0):
+        return self.file.seek(offset, whence)
+
+    def tell(self):
+        return self.file.tell()
+
+
+def probe_image_header(file, max_header_bytes=None, max_pixels=None, formats=ICON_FORMATS):
+    """
+    画像のヘッダのみを読み込み,画像の形式と縦幅・横幅を返す
+
+    画素データの展開や検証は行わないため,画像の大きさに関わらず読み込むバイト数と処理時間が一定となる
+
+    Parameters
+    ----------
+    file : File
+        先頭から読み込む画像ファイル
+    max_header_bytes : int
+        ヘッダとして読み込む最大のバイト数
+    max_pixels : int
+        受け付ける最大の画素数,これを超える画像は解凍爆弾とみなす
+    formats : tuple
+        受け付ける画像の形式
+
+    Raises
+    ------
+    InvalidImage
+        画像として解釈出来ない場合,ヘッダが上限を超える場合,画素数が上限を超える場合に発生
+
+    Returns
+    -------
+    header : ImageHeader
+        画像の形式と縦幅・横幅
+    """
+    if max_header_bytes is None:
+        max_header_bytes = getattr(settings, 'IMAGE_HEADER_MAX_BYTES', DEFAULT_IMAGE_HEADER_MAX_BYTES)
+    if max_pixels is None:
+        max_pixels = getattr(settings, 'IMAGE_MAX_PIXELS', DEFAULT_IMAGE_MAX_PIXELS)
+
+    file.seek(0)
+    try:
+        # Pillowの解凍爆弾の警告も例外として扱う
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', Image.DecompressionBombWarning)
+            with Image.open(BoundedReader(file, max_header_bytes), formats=formats) as image:
+                header = ImageHeader(image.format, *image.size)
+    except (UnidentifiedImageError, Image.DecompressionBombError, Image.DecompressionBombWarning,
+            OSError, SyntaxError, ValueError) as e:
+        raise InvalidImage(str(e))
+    finally:
+        file.seek(0)
+
+    if header.width * header.height > max_pixels:
+        raise InvalidImage('image has too many pixels')
+    return header
+
+
+class HeaderOnlyImageField(forms.FileField):
+    """
+    画像のヘッダのみを検証するImageField
+
+    forms.ImageFieldはアップロードされたファイル全体をメモリに読み込んで検証するため,
+    代わりにファイルのサイズと画像のヘッダのみを確認し,形式と縦幅・横幅をimage_headerとして保持する
+    """
+    default_error_messages = {
+        'invalid_image': _(
+            'Upload a valid image. The file you uploaded was either not an '
+            'image or a corrupted image.'
+        ),
+        'too_large': _('%(max_size)dバイトより大きいファイルはアップロードする事が出来ません'),
+    }
+
+    def __init__(self, *, max_upload_size=None, **kwargs):
+        self.max_upload_size = max_upload_size
+        super().__init__(**kwargs)
+
+    def to_python(self, data):
+        f = super().to_python(data)
+        if f is None:
+            return None
+
+        max_upload_size = self.max_upload_size or getattr(settings, 'ICON_MAX_UPLOAD_SIZE',
+                                                          DEFAULT_ICON_MAX_UPLOAD_SIZE)
+        if f.size > max_upload_size:
+            raise ValidationError(self.error_messages['too_large'], code='too_large',
+                                  params={'max_size': max_upload_size})
+
+        try:
+            header = probe_image_header(f)
+        except InvalidImage as e:
+            raise ValidationError(self.error_messages['invalid_image'], code='invalid_image') from e
+
+        f.image_header = header
+        f.content_type = Image.MIME.get(header.format)
+        return f
+
+    def widget_attrs(self, widget):
+        attrs = super().widget_attrs(widget)
+        if isinstance(widget, forms.FileInput) and 'accept' not in widget.attrs:
+            attrs.setdefault('accept', 'image/*')
+        return attrs
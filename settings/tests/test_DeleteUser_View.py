@@ -3,6 +3,8 @@ from django.core.exceptions import ObjectDoesNotExist
 from django.test import TestCase, override_settings
 from django.urls import reverse
 
+from jobs.queue import run_pending_jobs
+
 User = get_user_model()
 
 
@@ -27,12 +29,18 @@ class DeleteUserViewTest(TestCase):
         response = self.client.get(reverse('settings:deleteuser'))
         self.assertEqual(response.status_code, 302)
 
-    # ログインしている状態でPOSTリクエストを送信する事でそのユーザを削除する
+    # ログインしている状態でPOSTリクエストを送信する事でそのユーザを無効にし,ジョブによって削除する
     def test_success_delete(self):
         self.client.login(username='delete_user_view',
                           password='delete0123')
         response = self.client.post(reverse('settings:deleteuser'))
 
         self.assertEqual(response.status_code, 302)
+        self.assertFalse(User.objects.get(username='delete_user_view').is_active)
+        # 無効にしたユーザはログアウトされる
+        response = self.client.get(reverse('settings:deleteuser'))
+        self.assertEqual(response.status_code, 302)
+
+        run_pending_jobs()
         with self.assertRaises(ObjectDoesNotExist):
             User.objects.get(username='delete_user_view')
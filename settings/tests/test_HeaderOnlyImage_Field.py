@@ -0,0 +1,86 @@
+import struct
+import zlib
+from io import BytesIO
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.forms import ValidationError
+from django.test import SimpleTestCase, override_settings
+from PIL import Image
+
+from ..images import HeaderOnlyImageField, InvalidImage, probe_image_header
+
+
+def png_chunk(chunk_type, data):
+    return (struct.pack('>I', len(data)) + chunk_type + data
+            + struct.pack('>I', zlib.crc32(chunk_type + data) & 0xffffffff))
+
+
+def png_header_only(width, height):
+    # IHDRのみで画素データを持たないPNG
+    ihdr = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + png_chunk(b'IHDR', ihdr) + png_chunk(b'IEND', b'')
+
+
+class CountingFile(BytesIO):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.read_bytes = 0
+
+    def read(self, size=-1):
+        data = super().read(size)
+        self.read_bytes += len(data)
+        return data
+
+
+class HeaderOnlyImageFieldTest(SimpleTestCase):
+    def create_image(self, size, image_format):
+        output = BytesIO()
+        Image.effect_noise(size, 64).convert('RGB').save(output, image_format)
+        return output.getvalue()
+
+    # 画像の形式と縦幅・横幅をヘッダのみから取得する
+    def test_success_probe(self):
+        for image_format in ('PNG', 'JPEG', 'WEBP', 'GIF'):
+            header = probe_image_header(BytesIO(self.create_image((320, 200), image_format)))
+            self.assertEqual(tuple(header), (image_format, 320, 200))
+
+    # 画像の大きさに関わらずヘッダの上限を超えて読み込まない
+    def test_success_bounded_read(self):
+        data = self.create_image((1024, 1024), 'PNG')
+        file = CountingFile(data)
+        probe_image_header(file, max_header_bytes=64 * 1024)
+        self.assertLess(file.read_bytes, 64 * 1024)
+        self.assertGreater(len(data), 64 * 1024)
+
+    # 画素数が上限を超える画像は画素データを展開する前に拒否する
+    def test_fail_decompression_bomb(self):
+        with self.assertRaises(InvalidImage):
+            probe_image_header(BytesIO(png_header_only(100000, 100000)))
+
+    # ヘッダが上限を超える画像は拒否する
+    def test_fail_large_header(self):
+        segment = b'\xff\xe1' + struct.pack('>H', 65535) + b'\x00' * 65533
+        data = b'\xff\xd8' + segment * 8 + self.create_image((10, 10), 'JPEG')[2:]
+        with self.assertRaises(InvalidImage):
+            probe_image_header(BytesIO(data), max_header_bytes=256 * 1024)
+
+    # 画像ではないファイルや上限を超える大きさのファイルは妥当な値ではない
+    @override_settings(ICON_MAX_UPLOAD_SIZE=1024)
+    def test_invalid(self):
+        field = HeaderOnlyImageField()
+        wrong_files = [
+            (SimpleUploadedFile('test.png', b'not an image', content_type='image/png'), 'invalid_image'),
+            (SimpleUploadedFile('test.png', self.create_image((100, 100), 'PNG'), content_type='image/png'),
+             'too_large'),
+        ]
+        for wrong_file, code in wrong_files:
+            with self.assertRaises(ValidationError) as context:
+                field.clean(wrong_file)
+            self.assertEqual(context.exception.code, code)
+
+    # 検証した画像は形式と縦幅・横幅を保持する
+    def test_valid(self):
+        upload = SimpleUploadedFile('test.jpg', self.create_image((64, 48), 'JPEG'), content_type='image/jpeg')
+        cleaned = HeaderOnlyImageField().clean(upload)
+        self.assertEqual(tuple(cleaned.image_header), ('JPEG', 64, 48))
+        self.assertEqual(cleaned.content_type, 'image/jpeg')
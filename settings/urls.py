@@ -1,5 +1,6 @@
 from django.urls import path
 
+from users.views import BulkFollowView
 from .views import UpdateUsernameView, UpdateEmailView, UpdateFolloweeView, \
     UpdateFollowerView, UpdatePasswordView, CreateArticleView, \
     PostedArticleListView, UpdateArticleView, UpdateProfileView, \
@@ -11,6 +12,8 @@ urlpatterns = [
     path('username', UpdateUsernameView.as_view(), name='username'),
     path('email', UpdateEmailView.as_view(), name='email'),
     path('followees', UpdateFolloweeView.as_view(), name='followees'),
+    # users/<ユーザ名>/... は全てのユーザ名と一致し得るため,フォローの一括変更はフォローの管理画面の下に置く
+    path('followees/bulk', BulkFollowView.as_view(), name='bulk_follow'),
     path('followers', UpdateFollowerView.as_view(), name='followers'),
     path('password', UpdatePasswordView.as_view(), name='password'),
     path('profile', UpdateProfileView.as_view(), name='profile'),
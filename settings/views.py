@@ -1,6 +1,7 @@
-from django.contrib.auth import get_user_model
+from django.contrib.auth import get_user_model, logout
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
 from django.contrib.auth.views import PasswordChangeView
+from django.db import transaction
 from django.http import HttpResponseRedirect
 from django.shortcuts import get_object_or_404, redirect
 from django.urls import reverse_lazy
@@ -8,9 +9,16 @@ from django.views.generic import UpdateView, ListView, CreateView, DeleteView
 
 from .forms import UpdateUsernameForm, UpdateEmailForm, UpdatePasswordForm, \
     ArticleForm, UpdateProfileForm
+from authenticate.purge import start_purge
+from authenticate.tasks import generate_renditions, purge_user
+from common import counters
+from common.pagination import CachedCountPaginator, CursorPaginationMixin
+from users.follow_state import prime_follow_state
 from users.forms import FollowForm
 from authenticate.models import Relation
+from articles.loaders import only_list_columns
 from articles.models import Article
+from articles.shards import shard_for_article, shard_for_author, using_shard
 
 # Create your views here.
 
@@ -39,10 +47,12 @@ class UpdateEmailView(LoginRequiredMixin, UpdateView):
         return User.objects.get(username=user.username)
 
 
-class UpdateFolloweeView(LoginRequiredMixin, ListView):
+class UpdateFolloweeView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     template_name = 'settings/followee.html'
     model = Relation
     paginate_by = 8
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ('followee__username', 'id')
 
     def get_queryset(self, *args, **kwargs):
         user = self.request.user
@@ -51,6 +61,9 @@ class UpdateFolloweeView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
+        # 一覧に表示するユーザに対するフォロー関係をまとめて取得する
+        prime_follow_state(self.request.user, [relation.followee for relation in context['relation_list']])
+
         # 自身のユーザ名をフォームに設定
         username = self.request.user.username
         initial_form_dict = dict(follower=username)
@@ -60,10 +73,12 @@ class UpdateFolloweeView(LoginRequiredMixin, ListView):
         return context
 
 
-class UpdateFollowerView(LoginRequiredMixin, ListView):
+class UpdateFollowerView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     template_name = 'settings/follower.html'
     model = Relation
     paginate_by = 8
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ('follower__username', 'id')
 
     def get_queryset(self, *args, **kwargs):
         user = self.request.user
@@ -72,6 +87,9 @@ class UpdateFollowerView(LoginRequiredMixin, ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
+        # 一覧に表示するユーザに対するフォロー関係をまとめて取得する
+        prime_follow_state(self.request.user, [relation.follower for relation in context['relation_list']])
+
         # 自身のユーザ名をフォームに設定
         username = self.request.user.username
         initial_form_dict = dict(follower=username)
@@ -96,6 +114,15 @@ class DeleteUserView(LoginRequiredMixin, DeleteView):
         user = self.request.user
         return User.objects.get(username=user.username)
 
+    def delete(self, request, *args, **kwargs):
+        # 記事・コメント等の連鎖的な削除には時間が掛かるため,ユーザを無効にしてジョブとして一定の行数ずつ削除する
+        self.object = self.get_object()
+        with transaction.atomic():
+            start_purge(self.object)
+            purge_user.delay(self.object.pk)
+        logout(request)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class CreateArticleView(LoginRequiredMixin, CreateView):
     template_name = 'settings/newarticle.html'
@@ -106,31 +133,42 @@ class CreateArticleView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         article = form.save(commit=False)
         article.author = self.request.user
-        article.save()
-        form.save_m2m()
+        with transaction.atomic():
+            article.save()
+            form.save_m2m()
+            counters.posted(article.author_id, 1)
         return HttpResponseRedirect(self.success_url)
 
 
-class PostedArticleListView(LoginRequiredMixin, ListView):
+class PostedArticleListView(LoginRequiredMixin, CursorPaginationMixin, ListView):
     template_name = 'settings/articles.html'
     model = Article
     paginate_by = 5
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self, *args, **kwargs):
-        return self.model.objects.filter(author=self.request.user)
+        # 一覧には抜粋を表示するため,本文は読み込まない
+        return using_shard(only_list_columns(self.model.objects.filter(author=self.request.user), with_author=False),
+                           shard_for_author(self.request.user.pk))
 
 
 class OnlyAuthorMixin(UserPassesTestMixin):
     """
     記事の編集ページを作者のみがアクセスするためのMixin
+
+    記事は記事の保存先(articles.shards)から読み込む
     """
 
+    def get_queryset(self):
+        return using_shard(Article.objects.all(), shard_for_article(self.kwargs['pk']))
+
     def test_func(self):
         user = self.request.user
 
-        article = get_object_or_404(Article.objects.filter(pk=self.kwargs['pk']).select_related('author'),
-                                    pk=self.kwargs['pk'])
-        if article.author == user:
+        author_id = get_object_or_404(self.get_queryset().values_list('author_id', flat=True),
+                                      pk=self.kwargs['pk'])
+        if author_id == user.pk:
             return True
 
         return False
@@ -152,6 +190,11 @@ class DeleteArticleView(LoginRequiredMixin, OnlyAuthorMixin, DeleteView):
         # GETリクエストによってアクセスされた場合は投稿された記事一覧ページへリダイレクト
         return redirect('settings:postedarticles')
 
+    def delete(self, request, *args, **kwargs):
+        with transaction.atomic():
+            counters.before_article_delete(self.get_object())
+            return super().delete(request, *args, **kwargs)
+
 
 class UpdateProfileView(LoginRequiredMixin, UpdateView):
     template_name = 'settings/profile.html'
@@ -169,3 +212,16 @@ class UpdateProfileView(LoginRequiredMixin, UpdateView):
 
     def get_object(self, queryset=None):
         return User.objects.get(username=self.request.user)
+
+    def form_valid(self, form):
+        if 'icon' not in form.changed_data:
+            return super().form_valid(form)
+
+        # 縮小画像を作成し直すまでの間に前のアイコンの縮小画像を表示しない様に,新しいアイコンと同時に空にする
+        previous_renditions = list((form.instance.icon_renditions or {}).values())
+        form.instance.icon_renditions = {}
+        response = super().form_valid(form)
+
+        # 一覧等で表示するための縮小画像をジョブとして作成し,前のアイコンの縮小画像のファイルはジョブの中で削除する
+        generate_renditions.delay(self.object.pk, self.object.icon.name, previous_renditions)
+        return response
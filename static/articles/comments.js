@@ -0,0 +1,26 @@
+// 「さらにコメントを表示」ボタンが押された場合に次のページのコメントを取得して置き換える
+document.addEventListener("click", function(e) {
+    const button = e.target.closest(".comments-more");
+    if (button === null) {
+        return;
+    }
+    e.preventDefault();
+    button.disabled = true;
+
+    fetch(button.dataset.url, {
+        headers: {"X-Requested-With": "XMLHttpRequest"},
+    })
+    .then(function(response) {
+        if (!response.ok) {
+            throw new Error(response.statusText);
+        }
+        return response.text();
+    })
+    .then(function(html) {
+        button.insertAdjacentHTML("afterend", html);
+        button.remove();
+    })
+    .catch(function() {
+        button.disabled = false;
+    });
+});
@@ -0,0 +1,71 @@
+from authenticate.models import Relation
+
+
+class FollowStateResolver:
+    """
+    閲覧しているユーザが一覧に表示されるユーザをフォローしているか否かをまとめて取得する
+
+    prime()に渡されたユーザに対するフォロー関係を1回のクエリで取得して保持し,
+    is_followテンプレートタグからはクエリを実行せずに参照する
+    閲覧しているユーザのインスタンスに紐づけるため,1つのリクエストの間のみ利用される
+
+    Parameters
+    ----------
+    viewer : User
+        一覧を閲覧しているユーザ(フォローする側)
+    """
+
+    def __init__(self, viewer):
+        self.viewer = viewer
+        self.followee_pks = set()
+        self.resolved_pks = set()
+
+    def prime(self, users):
+        self.prime_pks(user.pk for user in users if user is not None)
+
+    def prime_pks(self, pks):
+        pks = set(pks) - self.resolved_pks
+        if not pks:
+            return
+
+        relations = Relation.objects.filter(follower_id=self.viewer.pk, followee_id__in=pks)
+        self.followee_pks |= set(relations.values_list('followee_id', flat=True))
+        self.resolved_pks |= pks
+
+    def resolve(self, followee, state):
+        """
+        他のクエリによって取得済みのフォロー関係を登録する
+        """
+        self.resolved_pks.add(followee.pk)
+        if state:
+            self.followee_pks.add(followee.pk)
+        else:
+            self.followee_pks.discard(followee.pk)
+
+    def is_follow(self, followee):
+        return self.is_follow_pk(followee.pk)
+
+    def is_follow_pk(self, followee_pk):
+        if followee_pk not in self.resolved_pks:
+            self.prime_pks([followee_pk])
+        return followee_pk in self.followee_pks
+
+
+def prime_follow_state(viewer, users):
+    """
+    閲覧しているユーザに紐づいたFollowStateResolverを作成し,usersに対するフォロー関係をまとめて取得する
+
+    Returns
+    -------
+    resolver : FollowStateResolver
+        認証されていないユーザの場合はNone
+    """
+    if not viewer.is_authenticated:
+        return None
+
+    resolver = getattr(viewer, '_follow_state', None)
+    if resolver is None:
+        resolver = FollowStateResolver(viewer)
+        viewer._follow_state = resolver
+    resolver.prime(users)
+    return resolver
@@ -7,13 +7,18 @@ User = get_user_model()
 class FollowForm(forms.Form):
     follower = forms.CharField(max_length=30, required=True)
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, user=None, **kwargs):
         super().__init__(*args, **kwargs)
+        self.user = user
         self.fields['follower'].widget = forms.HiddenInput()
 
     def clean_follower(self):
         follower = self.cleaned_data['follower']
 
+        # 送信したユーザ自身のユーザ名である場合は存在するため,データベースに問い合わせない
+        if self.user is not None and self.user.is_authenticated and follower == self.user.username:
+            return follower
+
         # ユーザ名に一致するユーザが存在しない場合はバリデーションエラーを発生させる
         if not User.objects.filter(username=follower).exists():
             raise forms.ValidationError("user is not exist")
@@ -0,0 +1,36 @@
+from django.template.loader import render_to_string
+
+from common.holes import register_hole
+from .follow_state import prime_follow_state
+from .forms import FollowForm
+
+
+def prime_follow_buttons(request, args_list):
+    # ページ内の全てのフォローボタンに対するフォロー関係を1回のクエリで取得する
+    prime_follow_state(request.user, []).prime_pks(args[0] for args in args_list)
+
+
+@register_hole('follow_button', prime=prime_follow_buttons)
+def follow_button(request, followee_pk, followee_username, wrapped=False):
+    """
+    閲覧しているユーザのフォロー状態に応じたフォローボタンを描画する,自分自身に対するボタンは表示しない
+
+    Parameters
+    ----------
+    followee_pk : int
+        フォローされるユーザの主キー
+    followee_username : str
+        フォローされるユーザのユーザ名
+    wrapped : bool
+        Trueの場合はフォームをfollow-buttonクラスのdivで囲む
+    """
+    if request.user.username == followee_username:
+        return ''
+
+    context = {
+        'followee_username': followee_username,
+        'follow_status': prime_follow_state(request.user, []).is_follow_pk(followee_pk),
+        'follow_form': FollowForm(initial=dict(follower=request.user.username)),
+        'wrapped': wrapped,
+    }
+    return render_to_string('users/follow_button.html', context, request=request)
@@ -11,4 +11,9 @@ def is_follow(followee, follower):
     if not isinstance(followee, User) or not isinstance(follower, User):
         return False
 
+    # ビューでフォロー関係をまとめて取得している場合はクエリを実行せずに参照する
+    resolver = getattr(followee, '_follow_state', None)
+    if resolver is not None:
+        return resolver.is_follow(follower)
+
     return followee.is_follow(follower)
@@ -0,0 +1,95 @@
+import json
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from articles.models import Article, TimelineEntry
+from authenticate.models import Relation
+from common import counters
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False)
+class BulkFollowViewTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.follower = User.objects.create_user(username='bulk_follower', email='bulk_follower@test.com',
+                                                password='bu1kf0llow')
+        cls.followees = [User.objects.create_user(username='bulk_followee{}'.format(i),
+                                                  email='bulk_followee{}@test.com'.format(i), password='bu1kf0llow')
+                         for i in range(3)]
+        Article.objects.create(author=cls.followees[0], title='bulk_follow_title', content='bulk_follow')
+
+    def setUp(self):
+        self.client.force_login(self.follower)
+
+    def post_bulk(self, payload):
+        return self.client.post(reverse('settings:bulk_follow'), json.dumps(payload), content_type='application/json')
+
+    def results(self, response):
+        return {result['item']: result['status'] for result in response.json()['data']['results']}
+
+    # 複数のユーザをまとめてフォロー・解除し,ユーザごとの結果と件数を返す
+    def test_success_bulk_follow(self):
+        Relation.objects.create(follower=self.follower, followee=self.followees[2])
+        counters.followed(self.follower.pk, self.followees[2].pk, 1)
+
+        names = [followee.username for followee in self.followees]
+        response = self.post_bulk({'follow': names[:2] + ['bulk_notexist', 'bulk_follower'], 'unfollow': names[2:]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.results(response), {'bulk_followee0': 'follow', 'bulk_followee1': 'follow',
+                                                  'bulk_notexist': 'notfound', 'bulk_follower': 'invalid',
+                                                  'bulk_followee2': 'notfollow'})
+        self.assertEqual(set(Relation.objects.filter(follower=self.follower).values_list('followee_id', flat=True)),
+                         {self.followees[0].pk, self.followees[1].pk})
+        self.follower.refresh_from_db()
+        self.assertEqual(self.follower.followee_count, 2)
+        self.assertEqual([User.objects.get(pk=followee.pk).follower_count for followee in self.followees], [1, 1, 0])
+        # フォローしたユーザの最近の記事がタイムラインに書き込まれる
+        self.assertEqual(TimelineEntry.objects.filter(owner=self.follower).count(), 1)
+
+        # 既にフォローしているユーザを再びフォローしても件数は変わらない
+        response = self.post_bulk({'follow': names[:1]})
+        self.assertEqual(self.results(response), {'bulk_followee0': 'follow'})
+        self.follower.refresh_from_db()
+        self.assertEqual(self.follower.followee_count, 2)
+
+        response = self.post_bulk({'unfollow': names})
+        self.assertEqual(set(self.results(response).values()), {'notfollow'})
+        self.follower.refresh_from_db()
+        self.assertEqual(self.follower.followee_count, 0)
+        self.assertFalse(TimelineEntry.objects.filter(owner=self.follower).exists())
+
+    # 対象の数に関わらず実行するクエリの数は一定である
+    def test_success_query_count(self):
+        self.client.get(reverse('articles:articles'))
+        names = [followee.username for followee in self.followees]
+        with self.assertNumQueries(13):
+            self.post_bulk({'follow': names})
+
+    # 不正なJSON・操作・型や,上限を超える対象を指定した場合は400を返す
+    @override_settings(BULK_MAX_ITEMS=2)
+    def test_fail_invalid_request(self):
+        for payload in ([], {'block': ['bulk_followee0']}, {'follow': 'bulk_followee0'}, {'follow': [1]},
+                        {'follow': ['bulk_followee0'], 'unfollow': ['bulk_followee0']},
+                        {'follow': ['bulk_followee0', 'bulk_followee1', 'bulk_followee2']}):
+            with self.subTest(payload=payload):
+                self.assertEqual(self.post_bulk(payload).status_code, 400)
+        response = self.client.post(reverse('settings:bulk_follow'), 'invalid', content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Relation.objects.exists())
+
+    # ログインしていない場合はフォローする事が出来ない
+    def test_fail_nologin(self):
+        self.client.logout()
+        self.assertEqual(self.post_bulk({'follow': ['bulk_followee0']}).status_code, 302)
+
+    # 一括変更のパスはユーザ名を含むパスと重ならず,bulkという名前のユーザも通常通りフォローする事が出来る
+    def test_success_user_named_bulk(self):
+        bulk = User.objects.create_user(username='bulk', email='bulk@test.com', password='bu1kf0llow')
+        response = self.client.post(reverse('users:follow', kwargs={'username': bulk.username}),
+                                    {'follower': self.follower.username}, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(Relation.objects.filter(follower=self.follower, followee=bulk).exists())
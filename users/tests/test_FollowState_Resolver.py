@@ -0,0 +1,61 @@
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from django.urls import reverse
+
+from authenticate.models import Relation
+from ..follow_state import prime_follow_state
+from ..templatetags.is_follow import is_follow
+
+User = get_user_model()
+
+
+@override_settings(AXES_ENABLED=False)
+class FollowStateResolverTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        viewer = User.objects.create_user(username='follow_state_viewer',
+                                          email='follow_state_viewer@test.com',
+                                          password='f0ll0wstate')
+        profile_user = User.objects.create_user(username='follow_state_profile',
+                                                email='follow_state_profile@test.com',
+                                                password='f0ll0wstate')
+        for i in range(9):
+            follower = User.objects.create_user(username='follow_state_{}'.format(i),
+                                                email='follow_state_{}@test.com'.format(i),
+                                                password='f0ll0wstate')
+            Relation.objects.create(follower=follower, followee=profile_user)
+            if i % 2 == 0:
+                Relation.objects.create(follower=viewer, followee=follower)
+
+    # まとめて取得したフォロー関係はクエリを実行せずに参照される
+    def test_success_prime(self):
+        viewer = User.objects.get(username='follow_state_viewer')
+        users = list(User.objects.filter(username__startswith='follow_state_').exclude(pk=viewer.pk))
+
+        with self.assertNumQueries(1):
+            prime_follow_state(viewer, users)
+        with self.assertNumQueries(0):
+            states = {user.username: is_follow(viewer, user) for user in users}
+
+        self.assertTrue(states['follow_state_0'])
+        self.assertFalse(states['follow_state_1'])
+        self.assertFalse(states['follow_state_profile'])
+
+    # フォロワー一覧のクエリ数は表示するユーザ数に依存しない
+    def test_success_constant_queries_per_page(self):
+        viewer = User.objects.get(username='follow_state_viewer')
+        self.client.force_login(viewer)
+        url = reverse('users:followers', kwargs={'username': 'follow_state_profile'})
+
+        with CaptureQueriesContext(connection) as full_page:
+            self.client.get(url)
+
+        Relation.objects.filter(followee__username='follow_state_profile',
+                                follower__username__in=['follow_state_{}'.format(i) for i in range(3, 9)]).delete()
+        with CaptureQueriesContext(connection) as small_page:
+            self.client.get(url)
+
+        self.assertEqual(len(full_page), len(small_page))
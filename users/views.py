@@ -1,14 +1,28 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.db.models import Exists, OuterRef
 from django.http import Http404, HttpResponseBadRequest
 from django.http.response import JsonResponse
-from django.shortcuts import get_object_or_404, redirect
-from django.views.generic import ListView, FormView
-
-
+from django.shortcuts import redirect
+from django.views.generic import ListView, FormView, View
+
+
+from common import counters
+from common.bulk import BulkJsonMixin
+from common.conditional import ConditionalGetMixin
+from common.page_cache import (ARTICLES_TAG, USERS_TAG, HolePunchedPageCacheMixin, invalidate_tags,
+                               user_articles_tag, user_favorites_tag, user_relations_tag, user_tag)
+from common.pagination import CachedCountPaginator, CursorPaginationMixin, bump_count_generation
+from common.replicas import ReplicaReadMixin
+from common.toggles import delete_rows, insert_rows, toggle_row
+from .follow_state import prime_follow_state
 from .forms import FollowForm
+from articles.loaders import only_list_columns
 from articles.models import Article
+from articles.shards import scatter, shard_for_author, using_shard
+from articles.timeline import backfill_timelines
 from authenticate.models import Relation
 
 # Create your views here.
@@ -16,17 +30,27 @@ from authenticate.models import Relation
 User = get_user_model()
 
 
-class PostedArticleListView(ListView):
+def get_profile_user_pk(username):
+    return User.objects.filter(username=username).values_list('pk', flat=True).first()
+
+
+class PostedArticleListView(ReplicaReadMixin, ConditionalGetMixin, HolePunchedPageCacheMixin, CursorPaginationMixin,
+                            ListView):
     template_name = 'users/articles.html'
     model = Article
     paginate_by = 5
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self, *args, **kwargs):
         try:
             author = User.objects.get(username=self.kwargs['username'])
         except ObjectDoesNotExist:
             raise Http404("そのユーザは存在しません")
-        return self.model.objects.filter(author=author)
+        # 投稿者の記事は全て同じ保存先にあるため,その保存先のみから読み込む
+        # 投稿者はプロフィールとして表示するため,記事のカラムのみを読み込む
+        return using_shard(only_list_columns(self.model.objects.filter(author=author), with_author=False),
+                           shard_for_author(author.pk))
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -36,6 +60,11 @@ class PostedArticleListView(ListView):
         except ObjectDoesNotExist:
             raise Http404("そのユーザは存在しません")
 
+        # プロフィールに表示するユーザに対するフォロー関係を取得する
+        # シェルを描画する場合は穴を埋める際にまとめて取得する
+        if not self.hole_shell:
+            prime_follow_state(self.request.user, [context['profile_user']])
+
         if not self.request.user.is_authenticated:
             return context
 
@@ -47,11 +76,25 @@ class PostedArticleListView(ListView):
 
         return context
 
+    def get_etag_tags(self):
+        # ユーザのプロフィール・フォロー数・フォロワー数とユーザが投稿した記事の一覧を表示する
+        profile_user_pk = get_profile_user_pk(self.kwargs['username'])
+        if profile_user_pk is None:
+            return None
+        return [USERS_TAG, user_relations_tag(profile_user_pk), user_articles_tag(profile_user_pk)]
+
+    def get_page_cache_tags(self, context):
+        # ユーザのプロフィール・フォロー数・フォロワー数とユーザが投稿した記事の一覧を表示する
+        profile_user = context['profile_user']
+        return [user_tag(profile_user.pk), user_relations_tag(profile_user.pk), user_articles_tag(profile_user.pk)]
 
-class FavoriteListView(ListView):
+
+class FavoriteListView(ReplicaReadMixin, ConditionalGetMixin, CursorPaginationMixin, ListView):
     template_name = 'users/favorites.html'
     model = Article
     paginate_by = 5
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ('-created_at', '-id')
 
     def get_queryset(self, *args, **kwargs):
         try:
@@ -59,7 +102,8 @@ class FavoriteListView(ListView):
         except ObjectDoesNotExist:
             raise Http404("そのユーザは存在しません")
 
-        return self.model.objects.filter(favorite_users=user).select_related('author')
+        # お気に入りに追加した記事は全ての保存先に散らばるため,保存先ごとの結果を併合する
+        return scatter(only_list_columns(self.model.objects.filter(favorite_users=user)), self.cursor_ordering)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -69,6 +113,9 @@ class FavoriteListView(ListView):
         except ObjectDoesNotExist:
             raise Http404("そのユーザは存在しません")
 
+        # プロフィールに表示するユーザに対するフォロー関係を取得する
+        prime_follow_state(self.request.user, [context['profile_user']])
+
         if not self.request.user.is_authenticated:
             return context
 
@@ -80,11 +127,20 @@ class FavoriteListView(ListView):
 
         return context
 
+    def get_etag_tags(self):
+        # ユーザのプロフィール・フォロー数・フォロワー数とお気に入りに追加した記事の一覧を表示する
+        profile_user_pk = get_profile_user_pk(self.kwargs['username'])
+        if profile_user_pk is None:
+            return None
+        return [USERS_TAG, ARTICLES_TAG, user_relations_tag(profile_user_pk), user_favorites_tag(profile_user_pk)]
+
 
-class FolloweeListView(ListView):
+class FolloweeListView(ReplicaReadMixin, HolePunchedPageCacheMixin, CursorPaginationMixin, ListView):
     template_name = 'users/followees.html'
     model = Relation
     paginate_by = 9
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ('followee__username', 'id')
 
     def get_queryset(self, *args, **kwargs):
         try:
@@ -102,6 +158,12 @@ class FolloweeListView(ListView):
         except ObjectDoesNotExist:
             raise Http404("そのユーザは存在しません")
 
+        # プロフィールと一覧に表示するユーザに対するフォロー関係をまとめて取得する
+        # シェルを描画する場合は穴を埋める際にまとめて取得する
+        if not self.hole_shell:
+            prime_follow_state(self.request.user,
+                               [context['profile_user']] + [relation.followee for relation in context['relation_list']])
+
         if not self.request.user.is_authenticated:
             return context
 
@@ -113,11 +175,19 @@ class FolloweeListView(ListView):
 
         return context
 
+    def get_page_cache_tags(self, context):
+        # ユーザのプロフィール・フォロー数・フォロワー数と一覧に表示するユーザのプロフィールを表示する
+        profile_user = context['profile_user']
+        return ([user_tag(profile_user.pk), user_relations_tag(profile_user.pk)]
+                + [user_tag(relation.followee_id) for relation in context['relation_list']])
+
 
-class FollowerListView(ListView):
+class FollowerListView(ReplicaReadMixin, HolePunchedPageCacheMixin, CursorPaginationMixin, ListView):
     template_name = 'users/followers.html'
     model = Relation
     paginate_by = 9
+    paginator_class = CachedCountPaginator
+    cursor_ordering = ('follower__username', 'id')
 
     def get_queryset(self, *args, **kwargs):
         try:
@@ -135,6 +205,12 @@ class FollowerListView(ListView):
         except ObjectDoesNotExist:
             raise Http404("そのユーザは存在しません")
 
+        # プロフィールと一覧に表示するユーザに対するフォロー関係をまとめて取得する
+        # シェルを描画する場合は穴を埋める際にまとめて取得する
+        if not self.hole_shell:
+            prime_follow_state(self.request.user,
+                               [context['profile_user']] + [relation.follower for relation in context['relation_list']])
+
         # 認証ユーザの場合はFavoriteArticleFormに現在のユーザ名を設定
         username = self.request.user.username
         initial_form_dict = dict(follower=username)
@@ -143,6 +219,12 @@ class FollowerListView(ListView):
 
         return context
 
+    def get_page_cache_tags(self, context):
+        # ユーザのプロフィール・フォロー数・フォロワー数と一覧に表示するユーザのプロフィールを表示する
+        profile_user = context['profile_user']
+        return ([user_tag(profile_user.pk), user_relations_tag(profile_user.pk)]
+                + [user_tag(relation.follower_id) for relation in context['relation_list']])
+
 
 class FollowView(LoginRequiredMixin, FormView):
     form_class = FollowForm
@@ -159,36 +241,41 @@ class FollowView(LoginRequiredMixin, FormView):
         else:
             return self.form_invalid(form)
 
+    def get_form_kwargs(self):
+        # 送信してきたユーザ自身のユーザ名の存在確認を省略するために,フォームにユーザを渡す
+        kwargs = super().get_form_kwargs()
+        kwargs['user'] = self.request.user
+        return kwargs
+
     def form_valid(self, form):
         # Ajaxリクエストでない場合はBadRequestを返す
         if not self.request.is_ajax:
             raise HttpResponseBadRequest()
 
-        # 送信されてきたユーザ名を取得し,送信してきたユーザと同じであるか確認する
+        # 送信されてきたユーザ名が送信してきたユーザと同じであるか確認する
         follower_name = form.cleaned_data['follower']
-        follower = User.objects.get(username=follower_name)
-        if self.request.user != follower:
-            raise HttpResponseBadRequest()
-
-        # フォロー・アンフォロー対象のユーザ名を取得
-        followee_name = self.kwargs['username']
-        followee = get_object_or_404(User, username=followee_name)
+        if self.request.user.username != follower_name:
+            return HttpResponseBadRequest()
+        follower = self.request.user
 
         # フォロー・アンフォローしようとする対象とそれを行うユーザが同一でないか確認する
+        followee_name = self.kwargs['username']
         if followee_name == follower_name:
-            raise HttpResponseBadRequest()
+            return HttpResponseBadRequest()
+
+        # フォロー・アンフォロー対象のユーザは主キーのみを取得する
+        followee_pk = get_profile_user_pk(followee_name)
+        if followee_pk is None:
+            raise Http404("そのユーザは存在しません")
 
         # followerとfolloweeによるRelationオブジェクトが既に存在する場合(フォロー中)は
         # 削除(フォロー解除)し,存在しない場合は作成する(フォローする)
-        status = ''
-        if Relation.objects.filter(follower=follower, followee=followee).exists():
-            relation = Relation.objects.filter(follower=follower, followee=followee).get()
-            relation.delete()
-            status = 'notfollow'
-        else:
-            relation = Relation(follower=follower, followee=followee)
-            relation.save()
-            status = 'follow'
+        # 同時に送信された場合でも,実際に行を変更したリクエストのみが件数を増減させる
+        with transaction.atomic():
+            following, changed = toggle_row(Relation, follower_id=follower.pk, followee_id=followee_pk)
+            if changed:
+                counters.followed(follower.pk, followee_pk, 1 if following else -1)
+        status = 'follow' if following else 'notfollow'
 
         json_response = {
             'data': {
@@ -201,3 +288,57 @@ class FollowView(LoginRequiredMixin, FormView):
     def form_invalid(self, form):
         # 正しく無いデータが送信されてきた場合は500を返す
         return JsonResponse({}, status=500)
+
+
+class BulkFollowView(LoginRequiredMixin, BulkJsonMixin, View):
+    """
+    複数のユーザのフォロー・フォロー解除を1回のリクエストで行う
+
+    {"follow": [ユーザ名, ...], "unfollow": [ユーザ名, ...]} を受け取り,ユーザ名ごとに
+    'follow'・'notfollow'・'notfound'(存在しない)・'invalid'(自分自身)のいずれかを返す
+    """
+    bulk_actions = ('follow', 'unfollow')
+    bulk_item_type = str
+
+    def apply_bulk(self, items):
+        follower = self.request.user
+        names = items['follow'] + items['unfollow']
+
+        with transaction.atomic():
+            # 同じユーザの一括操作を直列化し,ロックを取得してからフォロー状態を確認する
+            # ロックを取得しない1件ずつの切り替えと同時に行われても件数がずれない様に,件数は実際に作成・削除した行から求める
+            list(User.objects.select_for_update().filter(pk=follower.pk).values_list('pk'))
+            # 対象のユーザの主キーと現在フォローしているかを1回のクエリで取得する
+            targets = {username: (pk, following) for username, pk, following in
+                       User.objects.filter(username__in=names)
+                       .annotate(following=Exists(Relation.objects.filter(follower=follower, followee=OuterRef('pk'))))
+                       .values_list('username', 'pk', 'following')}
+
+            statuses = {}
+            follows, unfollows = [], []
+            for action, status, pks in (('follow', 'follow', follows), ('unfollow', 'notfollow', unfollows)):
+                for username in items[action]:
+                    if username not in targets:
+                        statuses[username] = 'notfound'
+                    elif username == follower.username:
+                        statuses[username] = 'invalid'
+                    else:
+                        statuses[username] = status
+                        pk, following = targets[username]
+                        if following != (action == 'follow'):
+                            pks.append(pk)
+
+            created = [relation.followee_id for relation in
+                       insert_rows(Relation, [Relation(follower=follower, followee_id=pk) for pk in follows])]
+            # 削除した行のタイムラインの記事はpost_deleteの受信側が取り除く
+            removed = delete_rows(Relation, 'followee_id', unfollows, follower=follower)
+            counters.followed_many(follower.pk, created, 1)
+            counters.followed_many(follower.pk, removed, -1)
+
+            # 一括で作成した行にはシグナルが送信されないため,タイムラインとキャッシュをまとめて更新する
+            backfill_timelines(follower.pk, created)
+        if created or removed:
+            bump_count_generation(Relation._meta.db_table)
+            invalidate_tags(*[user_relations_tag(pk) for pk in [follower.pk, *created, *removed]])
+
+        return [{'item': username, 'status': statuses[username]} for username in names]